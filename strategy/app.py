@@ -1,11 +1,19 @@
 from utils.transaction import Agent
+from utils.analytics import compute_metrics, format_report, save_metrics, save_equity, save_report
+from utils.journal import Journal, export_position_csv, truncate_journal
+from utils.checkpoint import save_checkpoint, load_checkpoint, clear_checkpoints
+from utils.profiler import NULL_PROFILER
+from utils.fill_simulator import FillSimulator, load_volume_matrix
+from utils.fast_backtest import run_fast_backtest
+from utils.features import FeatureStore
+from utils import plotting
 from strategy_zoo.strategy_v1 import StrategyV1
 from strategy_zoo.strategy_v2 import StrategyV2
+from strategy_zoo.strategy_vx1 import StrategyVX1
 from strategy_zoo.strategy_random import StrategyRandom
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-import datetime
-import os
+from strategy_zoo.base import ArrayStrategyBase, LegacyStrategyAdapter, MarketView, RankThresholdStrategy
+import numpy as np
+import shutil
 
 
 class APP:
@@ -14,168 +22,393 @@ class APP:
     STRATEGY_MAP = {
         'v1': StrategyV1,
         'v2': StrategyV2,
+        'vx1': StrategyVX1,
         'random': StrategyRandom,
     }
     st = {70, 488, 525, 615, 669, 752, 793, 851, 889, 909, 989, 2005, 2024, 2092, 2124, 2168, 2197, 2200, 2251, 2259, 2289, 2316, 2388, 2424, 2425, 2485, 2490, 2528, 2569, 2592, 2602, 2650, 2656, 2721, 2742, 2748, 2808, 2822, 2872, 300029, 300052, 300096, 300097, 300125, 300137, 300147, 300163, 300165, 300175, 300205, 300300, 300313, 300343, 300368, 300376, 300419, 300555, 300600, 600136, 600190, 600287, 600303, 600358, 600360, 600365, 600381, 600568, 600599, 600603, 600608, 600671, 600711, 600777, 600831, 603007, 603377, 603388, 603557, 603828, 603869, 603879, 603959, 688287}
 
-    def __init__(self, result_file_path, strategy_name='v1'):
-        self.agent = Agent(result_file_path)
+    def __init__(self, result_file_path, strategy_name='v1', fetcher=None):
+        """
+        :param result_file_path: 预测结果文件路径
+        :param strategy_name: 策略名称，见 STRATEGY_MAP
+        :param fetcher: 已加载数据的 Fetcher，传入时不再重新加载数据
+        """
+        self.agent = Agent(result_file_path, fetcher=fetcher)
         self.fetcher = self.agent.fetcher
+        self.feature_store = None
         self.set_strategy(strategy_name)
 
-    def set_strategy(self, strategy_name):
-        """设置当前使用的策略"""
+    def set_strategy(self, strategy_name, **params):
+        """
+        设置当前使用的策略，params 为覆盖策略默认值的参数。
+        策略的 features 属性（特征名称 -> 特征定义，见 utils.features.FeatureStore）中的特征会预先计算，
+        每天通过 MarketView.features 传给策略
+        """
         strategy_class = self.STRATEGY_MAP.get(strategy_name, StrategyV1)
-        self.strategy = strategy_class()
+        self.strategy = strategy_class().set_params(**params)
+        if not isinstance(self.strategy, ArrayStrategyBase):
+            # 只实现了旧接口的策略
+            self.strategy = LegacyStrategyAdapter(self.strategy)
+        self.set_features(getattr(self.strategy, 'features', None))
+        return self
+
+    def set_features(self, specs):
+        """
+        设置每天传给策略的滚动特征，已计算过的相同特征不重新计算
+
+        :param specs: dict，特征名称 -> 特征定义，见 utils.features.FeatureStore，为空时不计算特征
+        """
+        if not specs:
+            self.feature_store = None
+            return self
+        old = self.feature_store
+        self.feature_store = FeatureStore(self.fetcher, specs)
+        if old is not None:
+            for name, spec in self.feature_store.specs.items():
+                if old.specs.get(name) == spec and name in old.matrices:
+                    self.feature_store.matrices[name] = old.matrices[name]
+        return self
+
+    def set_fill_simulator(self, enabled=True, volume_cap=None, volume=None):
+        """
+        设置成交模拟：启用后按 A 股规则撮合（涨跌停、停牌、整手、可选的成交量限制，ST 股票使用 5% 涨跌幅），
+        未成交的订单及原因见 agent.rejections
+
+        :param enabled: 为 False 时恢复为按开盘价全部成交
+        :param volume_cap: 单笔成交数量占当天成交量的比例上限，为 None 时不限制
+        :param volume: 成交量矩阵，默认在需要时从行情文件读取，见 utils.fill_simulator.load_volume_matrix
+        """
+        if not enabled:
+            self.agent.fill_simulator = None
+            return self
+        if volume_cap is not None and volume is None:
+            volume = load_volume_matrix(self.fetcher)
+        self.agent.fill_simulator = FillSimulator(self.fetcher, st=self.st, volume=volume, volume_cap=volume_cap)
         return self
 
     def show_pred_result(self, day, k=20, filt_st=True):
         """显示指定日期的预测结果"""
         print('{}预测结果'.format(day))
-        day_result = self.fetcher.get_data_by_date(day)
-        # 准备需要输出的结果，[[排名, 股票代码, 备注]]
+        for i, code, tag in self.get_pred_result(day, k, filt_st):
+            print('{:>4}. 股票代码 {:0>6} {}'.format('-' if i is None else i, code, tag))
+
+    def get_pred_result(self, day, k=20, filt_st=True):
+        """
+        指定日期预测排名前 k 的股票及全部持仓的排名，排名来自 Fetcher 的排名表
+
+        :return: [[排名, 股票代码, 备注]]，按排名排序，当天停牌的持仓排名为 None，排在最后
+        """
+        held = self.agent.portfolio.held()
+        held_codes = self.fetcher.codes[held]
+        held_set = set(held_codes.tolist())
         result_list = []
         # topk股票
-        day_result = day_result.sort_values(by='pred', ascending=False)
-        for i in range(k):
-            code = day_result.index[i][0]
+        for i, code in enumerate(self.fetcher.get_top_codes(day, k).tolist()):
             if filt_st and code in self.st:
                 continue
-            if not code in self.agent.cur_position:
+            if code not in held_set:
                 result_list.append([i, code, ''])
         # 持仓代码
-        for code in self.agent.cur_position:
-            # 查找code在day_result是第几行
-            rank = day_result.index.get_loc((code, day))
-            result_list.append([rank, code, '（持仓）'])
-        for i, code, tag in sorted(result_list, key=lambda item: item[0]):
-            print('{:>4}. 股票代码 {:0>6} {}'.format(i, code, tag))
-
-    def backtest(self, start_money=15_0000, strategy_name=None, filt_st=True):
-        """回测"""
-        os.makedirs('result/position', exist_ok=True)
+        for code, rank in zip(held_codes.tolist(), self.fetcher.get_ranks(held_codes, day).tolist()):
+            if rank < 0:
+                result_list.append([None, code, '（持仓，停牌）'])
+            else:
+                result_list.append([rank, code, '（持仓）'])
+        return sorted(result_list, key=lambda item: (item[0] is None, item[0] or 0))
+
+    def get_holding_rank_history(self, day, window=20):
+        """
+        当前持仓最近 window 个交易日的预测排名
+
+        :return: DataFrame，索引为交易日，列为股票代码，当天无数据的位置为 -1
+        """
+        held_codes = self.fetcher.codes[self.agent.portfolio.held()]
+        return self.fetcher.get_rank_history(held_codes, day, window)
+
+    def backtest(self, start_money=15_0000, strategy_name=None, filt_st=True, save_result=True, export_csv=False,
+                 profiler=None, start_day=None, end_day=None, checkpoint_dir=None, checkpoint_every=None,
+                 resume=False, show_plot=True, plot_batch=None, result_cache=None, refresh_result=False, plot=True):
+        """
+        回测
+
+        :param save_result: 是否打印每日权益并保存持仓成交日志（result/journal）、分析报告和权益曲线图，为 False 时只返回结果
+        :param export_csv: 是否同时导出旧格式的每日持仓文件 result/position/{day}.csv
+        :param profiler: utils.profiler.Profiler，统计各阶段耗时并调用钩子，结束后可用 profiler.save() 导出，默认不埋点
+        :param start_day: 起始日期（含），格式为 'YYYYMMDD'，默认为第一个交易日
+        :param end_day: 结束日期（含），格式为 'YYYYMMDD'，默认为最后一个交易日
+        :param checkpoint_dir: 检查点目录（如 'result/checkpoint'），为 None 时不保存检查点
+        :param checkpoint_every: 每隔多少个交易日保存一次检查点，为 None 时只在回测结束时保存
+        :param resume: 是否从 checkpoint_dir 中最新的检查点继续回测，只处理检查点之后的交易日，
+                       结果与完整回测完全相同。续跑时使用检查点中的策略及其状态，忽略 strategy_name 和 start_money
+        :param show_plot: 是否弹出窗口显示权益曲线，为 False 时只保存图片（无图形界面的服务器上使用）
+        :param plot_batch: utils.plotting.PlotBatch，传入时权益曲线交给后台进程渲染
+        :param plot: 是否绘制权益曲线，为 False 时不导入 matplotlib，也不生成 result/fig.png
+        :param result_cache: utils.result_cache.ResultCache，传入时输入相同的回测直接返回保存的结果（及持仓、日志），
+                             不传入即不使用缓存。使用检查点或 profiler 时不使用缓存
+        :param refresh_result: 是否忽略已缓存的结果，重新回测并覆盖
+        :return: dict，包含 day_list、total_money_list、traded_value_list 和绩效指标 metrics
+        """
         if strategy_name is not None:
             self.set_strategy(strategy_name)
-            
+        if result_cache is not None and profiler is None and checkpoint_dir is None:
+            return self._cached_backtest(result_cache, refresh_result, start_money, filt_st, save_result, export_csv,
+                                         start_day, end_day, show_plot, plot_batch, plot)
+        profiler = profiler or NULL_PROFILER
+
         money_left = start_money
-        strategy = dict()
+        strategy = dict()  # 待执行的订单
+        day_list = []
         total_money_list = []
-        day_list = self.fetcher.date_list
-        for day in day_list:
-            # 交易，执行昨天策略
-            for code in strategy:
-                # 先卖出
-                if strategy[code] < 0:
-                    money_left = self.agent.transaction(code, day, strategy[code], money_left)
-            for code in strategy:
-                # 后买入
-                if strategy[code] > 0:
-                    money_left = self.agent.transaction(code, day, strategy[code], money_left)\
-
-            # 计算总权益
-            total_money = money_left + self.agent.get_cur_capital(day)
-            total_money_list.append(total_money)
-            print(day, '总权益', total_money, '剩余金额', money_left)
-            # 保存当前仓位信息
-            with open(f'result/position/{day}.csv', 'w') as f:
-                txt = '股票代码,当前仓位,开盘价,收盘价,市值\n'
-                for code in self.agent.cur_position:
-                    amount = self.agent.cur_position[code]['amount']
-                    open_ = self.fetcher.get_open_by_code(code, day)
-                    close = self.fetcher.get_close_by_code(code, day)
-                    txt += f'{code},{amount},{round(open_, 2)},{round(close, 2)},{round(amount * open_)}\n'
-                f.write(txt)
-
-            strategy = self.get_strategy(day, money_left, total_money, filt_st=filt_st)
-
-        self.analyze_backtest_result(day_list, total_money_list)
-        self.plot_total_money(day_list, total_money_list)
-
-    def analyze_backtest_result(self, day_list, total_money_list):
-        """
-        分析回测结果，计算总年化、超额年化、最大回撤、最大回撤发生时间段、修复时段。
-        
+        traded_value_list = []
+        resume_day = None
+        state = load_checkpoint(checkpoint_dir) if resume and checkpoint_dir else None
+        if state is not None:
+            resume_day = state['day']
+            start_day = state['start_day']
+            money_left = state['money_left']
+            strategy = state['orders']
+            day_list = state['day_list']
+            total_money_list = state['total_money_list']
+            traded_value_list = state['traded_value_list']
+            self.strategy = state['strategy']
+            self.agent.set_state(state['agent'])
+            if save_result:
+                truncate_journal('result/journal', resume_day)
+        elif checkpoint_dir:
+            clear_checkpoints(checkpoint_dir)
+        journal = Journal('result/journal', append=state is not None) if save_result else None
+
+        checkpoint_day = resume_day  # 最近一次保存检查点的交易日
+        profiler.start(self.fetcher)
+        try:
+            n_days = 0
+            for day, day_data, day_data_window in profiler.iter_phase(
+                    'data', self.fetcher.iter_days(window=20, start_day=resume_day or start_day, end_day=end_day)):
+                if resume_day is not None and day <= resume_day:
+                    continue
+                profiler.day_start(day)
+                # 交易，执行昨天策略，先卖出后买入
+                with profiler.phase('execute'):
+                    money_left = self.agent.execute(strategy, day, money_left)
+                    traded_value_list.append(float(np.abs(self.agent.fills['cost']).sum()))
+                profiler.fills(day, self.agent.fills)
+
+                # 计算总权益
+                with profiler.phase('valuation'):
+                    total_money = money_left + self.agent.get_cur_capital(day)
+                day_list.append(day)
+                total_money_list.append(total_money)
+                if save_result:
+                    with profiler.phase('journal'):
+                        print(day, '总权益', total_money, '剩余金额', money_left)
+                        # 记录当前仓位及成交信息
+                        held = self.agent.portfolio.held()
+                        positions = {
+                            'code': self.fetcher.codes[held],
+                            'amount': self.agent.portfolio.amount[held],
+                            'open': self.fetcher.get_open_by_ordinals(held, day),
+                            'close': self.fetcher.get_close_by_ordinals(held, day),
+                        }
+                        journal.record(day, positions, self.agent.fills)
+
+                with profiler.phase('strategy'):
+                    strategy = self.get_strategy(day, money_left, total_money, filt_st=filt_st,
+                                                 day_data=day_data, day_data_window=day_data_window)
+                profiler.orders(day, strategy)
+                profiler.day_end(day, total_money, money_left)
+
+                n_days += 1
+                if checkpoint_dir and checkpoint_every and n_days % checkpoint_every == 0:
+                    with profiler.phase('checkpoint'):
+                        journal = self._checkpoint(checkpoint_dir, journal, day, start_day, money_left, strategy,
+                                                   day_list, total_money_list, traded_value_list)
+                        checkpoint_day = day
+
+            if checkpoint_dir and day_list and day_list[-1] != checkpoint_day:
+                with profiler.phase('checkpoint'):
+                    journal = self._checkpoint(checkpoint_dir, journal, day_list[-1], start_day, money_left, strategy,
+                                               day_list, total_money_list, traded_value_list)
+            if save_result:
+                with profiler.phase('journal'):
+                    journal.close()
+                if export_csv:
+                    with profiler.phase('export_csv'):
+                        export_position_csv('result/journal', 'result/position', day_list=day_list)
+                with profiler.phase('analyze'):
+                    metrics = self.analyze_backtest_result(day_list, total_money_list, traded_value_list)
+                if plot:
+                    with profiler.phase('plot'):
+                        self.plot_total_money(day_list, total_money_list, show=show_plot, plot_batch=plot_batch)
+            else:
+                metrics = compute_metrics(total_money_list, day_list, traded_value=traded_value_list)
+        finally:
+            profiler.stop()
+        return {
+            'day_list': day_list,
+            'total_money_list': total_money_list,
+            'traded_value_list': traded_value_list,
+            'metrics': metrics,
+        }
+
+    def supports_fast_backtest(self):
+        """当前策略能否使用 fast_backtest"""
+        return (isinstance(self.strategy, RankThresholdStrategy) and self.agent.fill_simulator is None
+                and self.fetcher.dense)
+
+    def fast_backtest(self, start_money=15_0000, strategy_name=None, start_day=None, end_day=None, cross_check=False):
+        """
+        排名阈值类策略（如 StrategyV2）的快速回测，见 utils.fast_backtest。不打印、不保存结果，
+        结果与 backtest(save_result=False) 完全相同
+
+        :param cross_check: 是否再用逐日回测（backtest）运行一次，权益、成交金额或最终持仓不一致时抛出 RuntimeError
+        :return: 与 backtest 相同的 dict
+        """
+        if strategy_name is not None:
+            self.set_strategy(strategy_name)
+        self.fetcher.require_dense('快速回测')
+        if not self.supports_fast_backtest():
+            raise ValueError(f'{type(self.strategy).__name__} 不支持快速回测')
+        initial_state = self.agent.get_state()
+        result = run_fast_backtest(self.fetcher, self.agent, self.strategy, start_money, start_day, end_day)
+        result['metrics'] = compute_metrics(result['total_money_list'], result['day_list'],
+                                            traded_value=result['traded_value_list'])
+        if cross_check:
+            final_state = self.agent.get_state()
+            self.agent.set_state(initial_state)
+            expected = self.backtest(start_money=start_money, save_result=False, start_day=start_day, end_day=end_day)
+            for name in ('day_list', 'total_money_list', 'traded_value_list'):
+                if result[name] != expected[name]:
+                    raise RuntimeError(f'快速回测与逐日回测的 {name} 不一致')
+            state = self.agent.get_state()
+            if any(not np.array_equal(final_state[name], state[name]) for name in ('code', 'amount')):
+                raise RuntimeError('快速回测与逐日回测的最终持仓不一致')
+        return result
+
+    def _cached_backtest(self, result_cache, refresh_result, start_money, filt_st, save_result, export_csv,
+                         start_day, end_day, show_plot, plot_batch, plot):
+        """带结果缓存的 backtest，参数见 backtest"""
+        simulator = self.agent.fill_simulator
+        settings = {
+            'start_money': start_money,
+            'filt_st': filt_st,
+            'start_day': start_day,
+            'end_day': end_day,
+            'fees': [self.agent.yongjin, self.agent.guohufei, self.agent.yinhuashui],
+            'fill_simulator': None if simulator is None else
+            [simulator.volume_cap, simulator.limit_up, simulator.limit_down, simulator.volume],
+            'agent': self.agent.get_state(),
+        }
+        key = result_cache.make_key(self.fetcher, self.strategy, settings)
+        entry = None if key is None or refresh_result else result_cache.get(key)
+        journal = result_cache.get_journal(key) if entry is not None else None
+        if entry is None or (save_result and journal is None):
+            result = self.backtest(start_money=start_money, filt_st=filt_st, save_result=save_result,
+                                   export_csv=export_csv, start_day=start_day, end_day=end_day,
+                                   show_plot=show_plot, plot_batch=plot_batch, plot=plot)
+            if key is not None:
+                result_cache.put(key, {'result': result, 'agent': self.agent.get_state(), 'strategy': self.strategy},
+                                 journal_dir='result/journal' if save_result else None)
+            return result
+
+        self.agent.set_state(entry['agent'])
+        self.strategy = entry['strategy']
+        result = entry['result']
+        if save_result:
+            shutil.rmtree('result/journal', ignore_errors=True)
+            shutil.copytree(journal, 'result/journal')
+            if export_csv:
+                export_position_csv('result/journal', 'result/position', day_list=result['day_list'])
+            self.analyze_backtest_result(result['day_list'], result['total_money_list'], result['traded_value_list'])
+            if plot:
+                self.plot_total_money(result['day_list'], result['total_money_list'], show=show_plot,
+                                      plot_batch=plot_batch)
+        return result
+
+    def _checkpoint(self, checkpoint_dir, journal, day, start_day, money_left, orders,
+                    day_list, total_money_list, traded_value_list):
+        """保存检查点，并在检查点处结束当前日志文件，之后的日志写入新文件，以便续跑时丢弃"""
+        if journal is not None:
+            journal.close()
+        save_checkpoint(checkpoint_dir, {
+            'day': day,
+            'start_day': start_day,
+            'money_left': money_left,
+            'orders': orders,
+            'day_list': day_list,
+            'total_money_list': total_money_list,
+            'traded_value_list': traded_value_list,
+            'strategy': self.strategy,
+            'agent': self.agent.get_state(),
+        })
+        if journal is not None:
+            journal = Journal(journal.dirname, journal.chunk_days, journal.compression, append=True)
+        return journal
+
+    def analyze_backtest_result(self, day_list, total_money_list, traded_value_list=None):
+        """
+        分析回测结果，计算总年化、最大回撤、最大回撤发生时间段、修复时段、夏普比率等指标，
+        文本报告保存到 result/result.txt，指标保存到 result/metrics.json，每日权益保存到 result/equity.csv。
+
         :param day_list: 日期列表
         :param total_money_list: 总权益列表
+        :param traded_value_list: 每日成交金额列表，可选
         """
-        import numpy as np
-        from datetime import datetime
-        
-        # 转换日期列表为 datetime 对象
-        dates = [datetime.strptime(day, '%Y%m%d') for day in day_list]
-        # 计算总天数
-        total_days = (dates[-1] - dates[0]).days
-        
-        # 计算总年化收益率
-        start_value = total_money_list[0]
-        end_value = total_money_list[-1]
-        total_return = ((end_value / start_value) - 1) * 100
-        total_annual_return = ((end_value / start_value) ** (365 / total_days) - 1) * 100
-        
-        # 计算最大回撤
-        cumulative_returns = np.array(total_money_list)
-        running_max = np.maximum.accumulate(cumulative_returns)
-        drawdown = (cumulative_returns - running_max) / running_max
-        max_drawdown = np.min(drawdown) * 100
-        
-        # 最大回撤发生时间段
-        max_dd_start_index = np.argmax(running_max)
-        max_drawdown = 0
-        max_dd_start_index = 0
-        max_dd_end_index = 0
-        for i in range(len(cumulative_returns)):
-            for j in range(i, len(cumulative_returns)):
-                drawdown = (cumulative_returns[i] - cumulative_returns[j]) / cumulative_returns[i]
-                if drawdown > max_drawdown:
-                    max_drawdown = drawdown
-                    max_dd_start_index = i
-                    max_dd_end_index = j
-        
-        max_drawdown = max_drawdown * 100
-        max_dd_start_date = day_list[max_dd_start_index]
-        max_dd_end_date = day_list[max_dd_end_index]
-        
-        # 修复时段（假设修复是指回到最大回撤前的最高点）
-        recovery_index = np.argmax(cumulative_returns[max_dd_end_index:] >= cumulative_returns[max_dd_start_index])
-        if recovery_index > 0:
-            recovery_date = day_list[max_dd_end_index + recovery_index]
-        else:
-            recovery_date = "未修复"
-        
-        txt = f"回测时间段: {day_list[0]} 至 {day_list[-1]}\n"
-        txt += f"总收益率: {total_return:.2f}%\n"
-        txt += f"年化收益率: {total_annual_return:.2f}%\n"
-        txt += f"最大回撤: {max_drawdown:.2f}%\n"
-        txt += f"最大回撤发生时间段: {max_dd_start_date} 至 {max_dd_end_date}\n"
-        txt += f"修复时段: {max_dd_end_date} 至 {recovery_date}\n"
-        with open('result/result.txt', 'w') as f:
-            f.write(txt)
+        metrics = compute_metrics(total_money_list, day_list, traded_value=traded_value_list)
+        txt = format_report(metrics)
+        save_report(txt, 'result/result.txt')
+        save_metrics(metrics, 'result/metrics.json')
+        save_equity('result/equity.csv', day_list, total_money_list, traded_value_list)
         print(txt)
+        return metrics
 
-    def get_strategy(self, day, money_left, total_money, filt_st=True):
-        cur_position = self.agent.cur_position.copy()
-        day_data = self.fetcher.get_data_by_date(day)
-        day_data_window = self.fetcher.get_data_by_date(day, window=20)
-        return self.strategy.get_strategy(cur_position, day_data, day_data_window, money_left, total_money)
-        
-
-    def plot_total_money(self, day_list, total_money_list):
-        fig, ax = plt.subplots(figsize=(12, 6))
-        # 添加网格线
-        ax.grid(True)
+    def get_strategy(self, day, money_left, total_money, filt_st=True, day_data=None, day_data_window=None):
+        """
+        生成下一交易日的订单
 
-        ax.plot(day_list, total_money_list)
+        :return: (股票代码数组, 交易数量数组)
+        """
+        if day_data is None:
+            day_data = self.fetcher.get_data_by_date(day)
+        if day_data_window is None:
+            day_data_window = self.fetcher.get_data_by_date(day, window=20)
+        market = self.get_market_view(day, money_left, total_money, day_data, day_data_window)
+        return self.strategy.get_orders(market)
 
-        # 动态调整 x 轴刻度间隔
-        num_days = len(day_list)
-        interval = num_days // 15
+    def get_market_view(self, day, money_left, total_money, day_data, day_data_window):
+        """构建向量化策略的输入"""
+        ords, open_, close, pred = self.fetcher.get_day_arrays(day)
+        portfolio = self.agent.portfolio
+        held = portfolio.held()
+        return MarketView(
+            day=day,
+            codes=self.fetcher.codes[ords],
+            pred=pred,
+            open=open_,
+            close=close,
+            amount=portfolio.amount[ords],
+            buy_price=portfolio.cost_basis[ords],
+            held_codes=self.fetcher.codes[held],
+            held_amount=portfolio.amount[held],
+            money_left=money_left,
+            principal=total_money,
+            day_result=day_data,
+            day_data_window=day_data_window,
+            order=self.fetcher.get_day_order(day),
+            rank=self.fetcher.get_day_ranks(day),
+            features=None if self.feature_store is None else self.feature_store.get_day(day, ords),
+        )
 
-        ax.xaxis.set_major_locator(mdates.DayLocator(interval=interval))
+    def plot_total_money(self, day_list, total_money_list, show=True, plot_batch=None):
+        """
+        绘制权益曲线，保存到 result/fig.png
 
-        # 自动旋转 x 轴标签以防止重叠
-        fig.autofmt_xdate()
-        plt.savefig('result/fig.png')
-        plt.show()
+        :param show: 是否弹出窗口显示，为 False 时只保存图片，不需要图形界面
+        :param plot_batch: utils.plotting.PlotBatch，传入时交给后台进程渲染，立即返回
+        """
+        if plot_batch is not None:
+            plot_batch.submit(day_list, total_money_list, 'result/fig.png')
+        else:
+            plotting.plot_total_money(day_list, total_money_list, 'result/fig.png', show=show)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,164 @@
+"""
+性能基准测试：在不同规模的模拟数据上测量数据加载、切片、价格查询、交易、策略和回测的耗时
+
+python benchmark.py --scales small medium --output result/benchmark/new.json --compare result/benchmark/old.json
+"""
+from app import APP
+from utils import fetcher as fetcher_module
+from utils.fetcher import Fetcher
+from utils.transaction import Agent
+from utils.analytics import compute_metrics
+from utils.synthetic import write_dataset
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+SCALES = {
+    'small': {'n_codes': 300, 'n_days': 120},
+    'medium': {'n_codes': 1500, 'n_days': 250},
+    'large': {'n_codes': 5000, 'n_days': 750},
+}
+
+
+def timeit(func, repeat=3, number=1):
+    """返回 repeat 次测量中单次调用的最短耗时（秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def run_scale(n_codes, n_days, workdir, repeat=3):
+    """在一个规模上运行全部基准，返回 {基准名: 秒}"""
+    stock_path, pred_path = write_dataset(workdir, n_codes=n_codes, n_days=n_days)
+    fetcher_module.stock_data_path = stock_path
+    cache_dir = os.path.join(workdir, 'cache')
+    results = {}
+
+    results['fetcher_load'] = timeit(lambda: Fetcher(pred_path, use_cache=False), repeat=repeat)
+    Fetcher(pred_path, cache_dir=cache_dir, refresh_cache=True)
+    results['fetcher_load_cached'] = timeit(lambda: Fetcher(pred_path, cache_dir=cache_dir), repeat=repeat)
+
+    fetcher = Fetcher(pred_path, use_cache=False)
+    days = fetcher.date_list
+    rng = random.Random(0)
+    sample_days = [rng.choice(days) for _ in range(200)]
+    sample_codes = [rng.choice(fetcher.codes.tolist()) for _ in range(200)]
+
+    results['get_data_by_date'] = timeit(lambda: [fetcher.get_data_by_date(d) for d in sample_days], repeat) / 200
+    results['get_data_by_date_window20'] = timeit(
+        lambda: [fetcher.get_data_by_date(d, window=20) for d in sample_days], repeat) / 200
+    results['get_close_by_code'] = timeit(
+        lambda: [fetcher.get_close_by_code(c, d) for c, d in zip(sample_codes, sample_days)], repeat) / 200
+
+    # 持有 200 只股票时的交易和估值
+    day = days[len(days) // 2]
+    day_codes = fetcher.get_data_by_date(day).index.get_level_values('code').to_numpy()
+    held = day_codes[:200]
+    orders = {code: 100 for code in held.tolist()}
+
+    agent = Agent(None, fetcher=fetcher)
+    agent.execute(orders, day, 1e12)
+    scratch = Agent(None, fetcher=fetcher)
+    results['transaction'] = timeit(lambda: [scratch.transaction(c, day, 100, 1e12) for c in held.tolist()], repeat) / 200
+    results['execute_200_orders'] = timeit(lambda: scratch.execute(orders, day, 1e12), repeat, number=5)
+    results['get_cur_capital_200'] = timeit(lambda: agent.get_cur_capital(day), repeat, number=20)
+
+    for name in ['v1', 'v2', 'vx1', 'random']:
+        app = APP(None, name, fetcher=fetcher)
+        app.agent = agent
+        day_data = fetcher.get_data_by_date(day)
+        window = fetcher.get_data_by_date(day, window=20)
+        results[f'strategy_{name}'] = timeit(
+            lambda: app.get_strategy(day, 1e6, 1e8, day_data=day_data, day_data_window=window), repeat, number=5)
+
+    curve = 1e7 * np.cumprod(1 + np.random.default_rng(0).normal(0, 0.01, len(days)))
+    results['analyze'] = timeit(lambda: compute_metrics(curve, days), repeat, number=5)
+
+    results['backtest_v1'] = timeit(lambda: APP(None, 'v1', fetcher=fetcher).backtest(
+        start_money=1000_0000, save_result=False), repeat=1)
+    results['backtest_v2'] = timeit(lambda: APP(None, 'v2', fetcher=fetcher).backtest(
+        start_money=1000_0000, save_result=False), repeat=1)
+    fetcher.build_rank_table()
+    results['fast_backtest_v2'] = timeit(lambda: APP(None, 'v2', fetcher=fetcher).fast_backtest(
+        start_money=1000_0000), repeat=repeat)
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'commit': commit,
+        'time': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+    }
+
+
+def compare(current, previous, threshold=1.2):
+    """打印与上一次结果的耗时比值，返回变慢超过 threshold 倍的基准"""
+    regressions = []
+    for scale, results in current['results'].items():
+        old = previous['results'].get(scale, {})
+        for name, seconds in results.items():
+            if name not in old:
+                continue
+            ratio = seconds / old[name]
+            flag = ' <-- 变慢' if ratio > threshold else ''
+            print(f'{scale:>8} {name:<28} {old[name]:.6f}s -> {seconds:.6f}s  x{ratio:.2f}{flag}')
+            if ratio > threshold:
+                regressions.append((scale, name, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='性能基准测试')
+    parser.add_argument('--scales', nargs='+', default=['small', 'medium'], choices=list(SCALES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=None, help='结果 JSON 文件，默认为 result/benchmark/{时间}.json')
+    parser.add_argument('--compare', default=None, help='用于对比的历史结果 JSON 文件')
+    parser.add_argument('--threshold', type=float, default=1.2, help='耗时超过历史结果该倍数时视为性能回退')
+    args = parser.parse_args()
+
+    report = {'environment': environment(), 'scales': {s: SCALES[s] for s in args.scales}, 'results': {}}
+    original_path = fetcher_module.stock_data_path
+    try:
+        for scale in args.scales:
+            with tempfile.TemporaryDirectory() as workdir:
+                report['results'][scale] = run_scale(workdir=workdir, repeat=args.repeat, **SCALES[scale])
+            for name, seconds in report['results'][scale].items():
+                print(f'{scale:>8} {name:<28} {seconds:.6f}s')
+    finally:
+        fetcher_module.stock_data_path = original_path
+
+    output = args.output or os.path.join('result', 'benchmark', datetime.datetime.now().strftime('%Y%m%d%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print('结果已保存到', output)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
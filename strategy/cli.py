@@ -0,0 +1,137 @@
+"""
+命令行入口，不弹出图形窗口，适合在服务器或定时任务中使用
+
+python cli.py backtest --strategy v2 --start-money 10000000 --param sell_count=30
+python cli.py show-pred --day 20240105 -k 20 --position-dir position
+python cli.py analyze result/equity.csv
+python cli.py plot result/equity.csv other/equity.csv
+
+各子命令只在执行时导入所需模块：analyze 只依赖 numpy，plot 只在渲染时导入 matplotlib，
+backtest/show-pred 才加载 pandas 和数据。
+"""
+import argparse
+import json
+import os
+import sys
+
+
+def _parse_param(text):
+    """解析 name=value 形式的策略参数，value 按 JSON 解析，解析失败时作为字符串"""
+    name, _, value = text.partition('=')
+    try:
+        value = json.loads(value)
+    except ValueError:
+        pass
+    return name, value
+
+
+def cmd_backtest(args):
+    from app import APP
+    from utils.plotting import PlotBatch
+    from utils.profiler import Profiler
+    from utils.result_cache import ResultCache
+    app = APP(args.result_file)
+    app.set_strategy(args.strategy, **dict(args.param))
+    if args.realistic_fills or args.volume_cap is not None:
+        app.set_fill_simulator(volume_cap=args.volume_cap)
+    profiler = Profiler() if args.profile else None
+    batch = None if args.no_plot else PlotBatch()
+    try:
+        app.backtest(start_money=args.start_money, filt_st=not args.no_filt_st, save_result=True,
+                     export_csv=args.export_csv, profiler=profiler, start_day=args.start_day, end_day=args.end_day,
+                     checkpoint_dir=args.checkpoint_dir, checkpoint_every=args.checkpoint_every, resume=args.resume,
+                     show_plot=False, plot_batch=batch, plot=not args.no_plot,
+                     result_cache=ResultCache(args.result_cache) if args.result_cache else None,
+                     refresh_result=args.refresh_result)
+    finally:
+        if batch is not None:
+            batch.close()
+    if profiler is not None:
+        print(profiler.format_summary())
+        profiler.save()
+
+
+def cmd_show_pred(args):
+    from app import APP
+    app = APP(args.result_file)
+    day = args.day or app.fetcher.date_list[-1]
+    if args.position_dir:
+        app.agent.load_position(day, args.position_dir)
+    app.show_pred_result(day, args.k, filt_st=not args.no_filt_st)
+
+
+def cmd_analyze(args):
+    from utils.analytics import compute_metrics, format_report, load_equity
+    for path in args.equity_files:
+        day_list, total_money_list, traded_value_list = load_equity(path)
+        metrics = compute_metrics(total_money_list, day_list, traded_value=traded_value_list)
+        print(path)
+        print(format_report(metrics))
+
+
+def cmd_plot(args):
+    from utils.analytics import load_equity
+    from utils.plotting import PlotBatch, plot_total_money
+    paths = [os.path.splitext(path)[0] + '.png' for path in args.equity_files]
+    if len(args.equity_files) == 1:
+        plot_total_money(*load_equity(args.equity_files[0])[:2], paths[0])
+    else:
+        with PlotBatch(args.processes) as batch:
+            for path, fig_path in zip(args.equity_files, paths):
+                batch.submit(*load_equity(path)[:2], fig_path)
+    for fig_path in paths:
+        print(fig_path)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='回测命令行工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    p = subparsers.add_parser('backtest', help='回测，结果保存到 result/')
+    p.add_argument('--result-file', default='../data/result.csv', help='预测结果文件')
+    p.add_argument('--strategy', default='v1', help='策略名称，见 APP.STRATEGY_MAP')
+    p.add_argument('--param', type=_parse_param, action='append', default=[], metavar='NAME=VALUE',
+                   help='策略参数，可重复指定')
+    p.add_argument('--start-money', type=float, default=15_0000)
+    p.add_argument('--start-day', default=None)
+    p.add_argument('--end-day', default=None)
+    p.add_argument('--no-filt-st', action='store_true', help='不过滤 ST 股票')
+    p.add_argument('--no-plot', action='store_true', help='不绘制权益曲线，不导入 matplotlib')
+    p.add_argument('--export-csv', action='store_true', help='导出每日持仓 CSV')
+    p.add_argument('--realistic-fills', action='store_true', help='按涨跌停、停牌、整手规则撮合')
+    p.add_argument('--volume-cap', type=float, default=None, help='单笔成交数量占当天成交量的比例上限，隐含 --realistic-fills')
+    p.add_argument('--checkpoint-dir', default=None)
+    p.add_argument('--checkpoint-every', type=int, default=None)
+    p.add_argument('--resume', action='store_true', help='从最新的检查点继续回测')
+    p.add_argument('--profile', action='store_true', help='统计各阶段耗时，保存到 result/profile')
+    p.add_argument('--result-cache', default=None, metavar='DIR',
+                   help='回测结果缓存目录（如 cache/results），输入相同时直接使用保存的结果')
+    p.add_argument('--refresh-result', action='store_true', help='忽略已缓存的结果，重新回测')
+    p.set_defaults(func=cmd_backtest)
+
+    p = subparsers.add_parser('show-pred', help='显示指定日期的预测排名')
+    p.add_argument('--result-file', default='../data/result.csv', help='预测结果文件')
+    p.add_argument('--day', default=None, help='日期，默认为最后一个交易日')
+    p.add_argument('-k', type=int, default=20)
+    p.add_argument('--position-dir', default=None, help='持仓文件目录，指定后同时显示持仓的排名')
+    p.add_argument('--no-filt-st', action='store_true', help='不过滤 ST 股票')
+    p.set_defaults(func=cmd_show_pred)
+
+    p = subparsers.add_parser('analyze', help='根据保存的每日权益计算绩效指标')
+    p.add_argument('equity_files', nargs='+', help='backtest 保存的 equity.csv')
+    p.set_defaults(func=cmd_analyze)
+
+    p = subparsers.add_parser('plot', help='根据保存的每日权益绘制权益曲线，图片与输入文件同名')
+    p.add_argument('equity_files', nargs='+', help='backtest 保存的 equity.csv')
+    p.add_argument('--processes', type=int, default=None, help='后台渲染进程数')
+    p.set_defaults(func=cmd_plot)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+多模型对比：同一策略分别在多个模型的预测结果上回测，行情数据只读取一次
+
+python models.py ../data/result_a.csv ../data/result_b.csv --strategy v1
+"""
+from app import APP
+from utils.multi_fetcher import MultiFetcher
+from utils.shared_data import SharedArrays
+from multiprocessing import Pool
+import argparse
+import os
+import pandas as pd
+
+# 子进程中共享的数据，由 _init_worker 设置
+_shared = None
+_multi = None
+
+
+def _init_worker(spec):
+    global _shared, _multi
+    _shared = SharedArrays.attach(spec)
+    _multi = MultiFetcher.from_arrays(_shared.arrays)
+
+
+def _backtest(multi, task):
+    model, strategy_name, params, start_money, filt_st, start_day, end_day = task
+    app = APP(None, fetcher=multi.get_fetcher(model))
+    app.set_strategy(strategy_name, **params)
+    result = app.backtest(start_money=start_money, filt_st=filt_st, save_result=False,
+                          start_day=start_day, end_day=end_day)
+    return model, result
+
+
+def _run_one(task):
+    return _backtest(_multi, task)
+
+
+def run_models(result_file_paths, strategy_name, params=None, start_money=15_0000, filt_st=True,
+               start_day=None, end_day=None, processes=None, multi=None):
+    """
+    :param result_file_paths: 见 MultiFetcher
+    :param strategy_name: 策略名称，见 APP.STRATEGY_MAP
+    :param params: 覆盖策略默认值的参数
+    :param processes: 进程数，默认为 CPU 核数与模型数的较小值，为 1 时在当前进程中依次回测
+    :param multi: 已加载数据的 MultiFetcher，传入时不再重新加载数据
+    :return: (DataFrame，每行为一个模型的回测指标；DataFrame，每列为一个模型的每日总权益)
+    """
+    if multi is None:
+        multi = MultiFetcher(result_file_paths)
+    tasks = [(model, strategy_name, params or {}, start_money, filt_st, start_day, end_day) for model in multi.models]
+    processes = processes or min(os.cpu_count(), len(tasks))
+    if processes == 1:
+        results = [_backtest(multi, task) for task in tasks]
+    else:
+        with SharedArrays.publish(multi.to_arrays()) as shared:
+            with Pool(processes, initializer=_init_worker, initargs=(shared.spec,)) as pool:
+                results = pool.map(_run_one, tasks)
+    table = pd.DataFrame([{'model': model, **result['metrics']} for model, result in results])
+    equity = pd.DataFrame({model: pd.Series(result['total_money_list'], index=result['day_list'])
+                           for model, result in results})
+    return table, equity
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='多模型对比回测')
+    parser.add_argument('result_files', nargs='+', help='各模型的预测结果文件')
+    parser.add_argument('--strategy', default='v1')
+    parser.add_argument('--start-money', type=float, default=1000_0000)
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+    table, equity = run_models(args.result_files, args.strategy, start_money=args.start_money,
+                               processes=args.processes)
+    os.makedirs('result', exist_ok=True)
+    table.to_csv('result/models.csv', index=False)
+    equity.to_csv('result/models_equity.csv', index_label='day')
+    print(table.to_string())
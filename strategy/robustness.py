@@ -0,0 +1,105 @@
+"""
+起点稳健性检验：从历史上每个月（或每隔 N 个交易日）的第一个交易日开始分别回测同一个策略，
+统计各起点的收益、回撤和夏普比率的分布
+
+python robustness.py
+"""
+from sweep import run_tasks
+from utils.fetcher import Fetcher
+import os
+import numpy as np
+import pandas as pd
+
+# 参与汇总的指标
+SUMMARY_METRICS = ['total_return', 'annual_return', 'max_drawdown', 'sharpe', 'sortino', 'calmar']
+
+
+def get_start_days(date_list, every='month', min_days=20):
+    """
+    生成回测起点
+
+    :param date_list: 交易日列表
+    :param every: 'month' 表示每个月的第一个交易日，整数 N 表示每隔 N 个交易日
+    :param min_days: 起点之后至少保留的交易日数，过晚的起点被丢弃
+    :return: 起点日期列表
+    """
+    last = len(date_list) - min_days
+    if every == 'month':
+        starts = [i for i, day in enumerate(date_list) if i == 0 or day[:6] != date_list[i - 1][:6]]
+    else:
+        starts = range(0, len(date_list), int(every))
+    return [date_list[i] for i in starts if i <= last]
+
+
+def run_robustness(result_file_path, strategy_name, params=None, every='month', horizon=None, start_money=15_0000,
+                   filt_st=True, min_days=20, processes=None, fetcher=None):
+    """
+    从多个起点并行回测。数据和预测排名表只计算一次，放入共享内存供所有进程使用
+
+    :param result_file_path: 预测结果文件路径
+    :param strategy_name: 策略名称，见 APP.STRATEGY_MAP
+    :param params: 覆盖策略默认值的参数
+    :param every: 起点间隔，见 get_start_days
+    :param horizon: 每次回测的交易日数，默认回测到最后一个交易日
+    :param start_money: 初始资金
+    :param min_days: 每次回测至少包含的交易日数
+    :param processes: 进程数，默认为 CPU 核数
+    :param fetcher: 已加载数据的 Fetcher，传入时不再重新加载数据
+    :return: DataFrame，每行为一个起点的回测指标，按起点排序
+    """
+    if fetcher is None:
+        fetcher = Fetcher(result_file_path)
+    fetcher.build_rank_table()
+    date_list = fetcher.date_list
+    tasks = []
+    for start_day in get_start_days(date_list, every, min_days):
+        end_day = None
+        if horizon is not None:
+            end_day = date_list[min(date_list.index(start_day) + horizon, len(date_list)) - 1]
+        tasks.append((strategy_name, params or {}, start_money, filt_st, start_day, end_day))
+    rows = [{'start_day': task[4], **metrics} for task, metrics in run_tasks(fetcher, tasks, processes)]
+    return pd.DataFrame(rows).sort_values('start_day', ignore_index=True)
+
+
+def summarize(table):
+    """
+    各指标在不同起点间的分布
+
+    :param table: run_robustness 的返回值
+    :return: DataFrame，行为指标，列为均值、标准差、最小值、分位数、最大值及为正的比例
+    """
+    rows = {}
+    for name in SUMMARY_METRICS:
+        values = table[name].to_numpy(dtype=np.float64)
+        rows[name] = {
+            'mean': values.mean(),
+            'std': values.std(ddof=1) if len(values) > 1 else 0.0,
+            'min': values.min(),
+            'p10': np.percentile(values, 10),
+            'p50': np.percentile(values, 50),
+            'p90': np.percentile(values, 90),
+            'max': values.max(),
+            'positive': (values > 0).mean(),
+        }
+    return pd.DataFrame(rows).T
+
+
+def format_report(table):
+    summary = summarize(table)
+    txt = f'起点数：{len(table)}，起点范围：{table["start_day"].iloc[0]} ~ {table["start_day"].iloc[-1]}\n'
+    txt += summary.to_string(float_format=lambda v: f'{v:.4f}') + '\n'
+    worst = table.loc[table['total_return'].idxmin()]
+    best = table.loc[table['total_return'].idxmax()]
+    txt += f'收益最差的起点：{worst["start_day"]}，总收益 {worst["total_return"]:.2%}，最大回撤 {worst["max_drawdown"]:.2%}\n'
+    txt += f'收益最好的起点：{best["start_day"]}，总收益 {best["total_return"]:.2%}，最大回撤 {best["max_drawdown"]:.2%}\n'
+    return txt
+
+
+if __name__ == '__main__':
+    table = run_robustness('../data/result.csv', 'v1', every='month', horizon=250, start_money=1000_0000)
+    os.makedirs('result', exist_ok=True)
+    table.to_csv('result/robustness.csv', index=False)
+    txt = format_report(table)
+    with open('result/robustness.txt', 'w') as f:
+        f.write(txt)
+    print(txt)
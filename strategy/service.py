@@ -0,0 +1,198 @@
+"""
+常驻的信号服务：数据只加载一次并保留在内存中，通过本地 HTTP（或 Unix socket）提供预测排名和次日订单
+
+python service.py --port 8765
+python service.py --unix /tmp/signal.sock
+
+接口（均返回 JSON）：
+GET  /health                                   已加载的交易日范围
+GET  /top?day=20240105&k=20&filt_st=1          预测排名前 k 的股票及持仓排名，持仓通过 POST 传入时使用 POST
+POST /top     {"day", "k", "filt_st", "position" 或 "position_dir"}
+POST /orders  {"day", "strategy", "params", "money_left", "total_money", "position" 或 "position_dir"}
+POST /append  {"stock": [{code, day, open, close}], "pred": [{SecurityID, time, pred}]}
+              或 {"stock_path": 行情文件, "pred_path": 预测文件}，追加新交易日的数据
+
+position 为 {股票代码: 持仓数量}，position_dir 为 Agent.load_position 使用的持仓文件目录。
+"""
+from app import APP
+from utils.fetcher import Fetcher
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from urllib.parse import urlparse, parse_qs
+import argparse
+import copy
+import json
+import os
+import threading
+import time
+import pandas as pd
+
+
+class SignalService:
+    """
+    持有常驻内存的 Fetcher。追加数据时构建新的 Fetcher 后整体替换引用（写时复制），
+    每个请求开始时取得当前 Fetcher 的引用并只使用它，因此读请求不需要加锁，也不会读到更新了一半的数据。
+    /orders 使用过的策略及其滚动特征按 (策略名称, 参数) 保留，策略或参数不变时不重新计算特征
+    """
+
+    def __init__(self, fetcher):
+        self.fetcher = fetcher.build_rank_table()
+        self._update_lock = threading.Lock()
+        # (策略名称, 参数 JSON) -> (Fetcher, 未使用过的策略对象, FeatureStore 或 None)
+        self._strategies = {}
+
+    def _get_app(self, day, body):
+        """基于当前 Fetcher 构建 APP，并设置请求中的持仓"""
+        fetcher = self.fetcher
+        day = str(day).replace('-', '') if day is not None else fetcher.date_list[-1]
+        app = APP(None, fetcher=fetcher)
+        if body.get('position') is not None:
+            app.agent.set_position({int(code): {'amount': int(amount)} for code, amount in body['position'].items()})
+        elif body.get('position_dir') is not None:
+            app.agent.load_position(day, body['position_dir'])
+        return app, day
+
+    def health(self, body):
+        fetcher = self.fetcher
+        return {'first_day': fetcher.date_list[0], 'last_day': fetcher.date_list[-1],
+                'n_days': len(fetcher.date_list), 'n_codes': len(fetcher.codes)}
+
+    def top(self, body):
+        app, day = self._get_app(body.get('day'), body)
+        result = app.get_pred_result(day, k=int(body.get('k', 20)), filt_st=_to_bool(body.get('filt_st', True)))
+        return {'day': day, 'result': [{'rank': rank, 'code': code, 'holding': bool(tag), 'suspended': rank is None}
+                                       for rank, code, tag in result]}
+
+    def _set_strategy(self, app, strategy_name, params):
+        """设置 APP 的策略，相同策略和参数的滚动特征只在第一次（或数据更新后）计算"""
+        key = (strategy_name, json.dumps(params, sort_keys=True))
+        cached = self._strategies.get(key)
+        if cached is None or cached[0] is not app.fetcher:
+            app.set_strategy(strategy_name, **params)
+            cached = (app.fetcher, copy.deepcopy(app.strategy), app.feature_store)
+            self._strategies[key] = cached
+        # 策略可能有状态（如调仓计数器），每个请求使用初始状态的副本
+        app.strategy = copy.deepcopy(cached[1])
+        app.feature_store = cached[2]
+
+    def orders(self, body):
+        app, day = self._get_app(body.get('day'), body)
+        self._set_strategy(app, body.get('strategy', 'v1'), body.get('params', {}))
+        money_left = float(body.get('money_left', 0))
+        total_money = body.get('total_money')
+        if total_money is None:
+            total_money = money_left + app.agent.get_cur_capital(day)
+        codes, amounts = app.get_strategy(day, money_left, float(total_money), filt_st=_to_bool(body.get('filt_st', True)))
+        return {'day': day, 'orders': [{'code': code, 'amount': amount}
+                                       for code, amount in zip(codes.tolist(), amounts.tolist())]}
+
+    def append(self, body):
+        if 'stock_path' in body:
+            stock_df = pd.read_parquet(body['stock_path'])
+            pred_df = pd.read_csv(body['pred_path'])
+        else:
+            stock_df = pd.DataFrame(body['stock'])
+            pred_df = pd.DataFrame(body['pred'])
+        if stock_df.empty or pred_df.empty:
+            return {'appended_days': [], **self.health(body)}
+        # 更新之间互斥；构建新 Fetcher 期间读请求继续使用旧 Fetcher
+        with self._update_lock:
+            old = self.fetcher
+            fetcher = old.append_days(stock_df, pred_df)
+            # 已计算的滚动特征只计算新增的交易日
+            self._strategies = {key: (fetcher, strategy, None if store is None else store.append(fetcher))
+                                for key, (owner, strategy, store) in self._strategies.items() if owner is old}
+            self.fetcher = fetcher
+        return {'appended_days': self.fetcher.date_list[len(old.date_list):], **self.health(body)}
+
+    ROUTES = {
+        ('GET', '/health'): health,
+        ('GET', '/top'): top,
+        ('POST', '/top'): top,
+        ('POST', '/orders'): orders,
+        ('POST', '/append'): append,
+    }
+
+    def handle(self, method, path, body):
+        """
+        :return: (HTTP 状态码, 返回的 dict)
+        """
+        route = self.ROUTES.get((method, path))
+        if route is None:
+            return 404, {'error': f'未知接口 {method} {path}'}
+        try:
+            return 200, route(self, body)
+        except (KeyError, ValueError, TypeError, IndexError, AttributeError, OSError) as e:
+            return 400, {'error': f'{type(e).__name__}: {e}'}
+
+
+def _to_bool(value):
+    if isinstance(value, str):
+        return value.lower() not in ('0', 'false', 'no', '')
+    return bool(value)
+
+
+class Handler(BaseHTTPRequestHandler):
+    service = None
+
+    def _respond(self, method):
+        url = urlparse(self.path)
+        body = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        start = time.perf_counter()
+        try:
+            data = json.loads(self.rfile.read(length)) if length else {}
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            status, result = 400, {'error': f'请求体不是合法的 JSON: {e}'}
+        else:
+            if isinstance(data, dict):
+                body.update(data)
+                status, result = self.service.handle(method, url.path, body)
+            else:
+                status, result = 400, {'error': '请求体必须是 JSON 对象'}
+        result['elapsed_ms'] = (time.perf_counter() - start) * 1000
+        data = json.dumps(result, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._respond('GET')
+
+    def do_POST(self):
+        self._respond('POST')
+
+    def address_string(self):
+        # Unix socket 的客户端地址为空
+        return self.client_address[0] if self.client_address else 'unix'
+
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service, port=8765, unix_socket=None):
+    handler = type('SignalHandler', (Handler,), {'service': service})
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        return ThreadingUnixHTTPServer(unix_socket, handler)
+    return ThreadingHTTPServer(('127.0.0.1', port), handler)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='常驻信号服务')
+    parser.add_argument('--result-file', default='../data/result.csv', help='预测结果文件')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', default=None, help='Unix socket 路径，指定后不监听 TCP 端口')
+    args = parser.parse_args()
+    server = make_server(SignalService(Fetcher(args.result_file)), args.port, args.unix)
+    print('信号服务已启动', args.unix or f'http://127.0.0.1:{args.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
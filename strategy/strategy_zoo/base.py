@@ -1,4 +1,6 @@
 import math
+import numpy as np
+from utils.ranking import sort_by_pred
 
 class StrategyBase:
     """定义策略基类，后续可以在这个基础上进行修改"""
@@ -6,6 +8,22 @@ class StrategyBase:
     def __init__(self):
         ...
 
+    def set_params(self, **params):
+        """覆盖策略参数，参数名必须是策略已有的属性"""
+        for name, value in params.items():
+            if not hasattr(self, name):
+                raise AttributeError(f'{type(self).__name__} 没有参数 {name}')
+            setattr(self, name, value)
+        return self
+
+    def get_params(self):
+        """策略的全部参数及状态（实例属性），用于结果缓存的键"""
+        return dict(vars(self))
+
+    def is_deterministic(self):
+        """相同输入下回测结果是否总是相同，不确定的策略的回测结果不缓存"""
+        return True
+
     def get_strategy(self, cur_position, day_result, day_data_window, money_left=0, principal=15_0000):
         """
         输入仓位数据及股票预测排名数据
@@ -19,4 +37,183 @@ class StrategyBase:
         strategy: dict，键为交易的股票代码，值为交易数量，值大于0代表买入，小于0代表卖出
         """
         ...
-    
\ No newline at end of file
+
+
+class MarketView:
+    """
+    向量化策略接口的输入，当天所有股票的数据为按股票代码升序排列、相互对齐的数组
+    day: 交易日，格式为 'YYYYMMDD'
+    codes: 股票代码
+    pred, open, close: 预测收益率、开盘价、收盘价
+    order: 按 pred 从大到小排序的下标，codes[order[0]] 为预测排名第一的股票
+    rank: 每只股票的预测排名，从 0 开始
+    order 和 rank 可由调用方传入预先计算的结果（如 Fetcher 的排名表），否则由 pred 计算
+    amount: 当前持仓数量，未持仓为 0
+    buy_price: 持仓平均买入价，未持仓为 0
+    held_codes, held_amount: 全部持仓的股票代码及数量（包括当天停牌的股票），按建仓顺序排列
+    money_left: 剩余资金
+    principal: 总权益
+    day_result, day_data_window: 与旧接口相同的 DataFrame，供需要回看窗口的策略使用
+    features: utils.features.FeatureView，策略声明了 features 时为当天预先计算的滚动特征，features[name] 与 codes 对齐
+    """
+
+    def __init__(self, day, codes, pred, open, close, amount, buy_price, held_codes, held_amount,
+                 money_left, principal, day_result=None, day_data_window=None, order=None, rank=None,
+                 features=None):
+        self.day = day
+        self.codes = codes
+        self.pred = pred
+        self.open = open
+        self.close = close
+        self.amount = amount
+        self.buy_price = buy_price
+        self.held_codes = held_codes
+        self.held_amount = held_amount
+        self.money_left = money_left
+        self.principal = principal
+        self.day_result = day_result
+        self.day_data_window = day_data_window
+        self.features = features
+        self.order = sort_by_pred(pred) if order is None else order
+        if rank is None:
+            rank = np.empty(len(codes), dtype=np.int64)
+            rank[self.order] = np.arange(len(codes))
+        self.rank = rank
+
+    @classmethod
+    def from_frames(cls, cur_position, day_result, day_data_window, money_left, principal):
+        """由旧接口的参数构建 MarketView"""
+        day_result = day_result.sort_index(level='code')
+        codes = day_result.index.get_level_values('code').to_numpy()
+        position = [cur_position.get(code, {}) for code in codes.tolist()]
+        held_codes = np.array(list(cur_position), dtype=np.int64)
+        return cls(
+            day=day_result.index.get_level_values('day')[0] if len(day_result) else None,
+            codes=codes,
+            pred=day_result['pred'].to_numpy(),
+            open=day_result['open'].to_numpy(),
+            close=day_result['close'].to_numpy(),
+            amount=np.array([p.get('amount', 0) for p in position], dtype=np.int64),
+            buy_price=np.array([p.get('buy_price', 0) for p in position], dtype=np.float64),
+            held_codes=held_codes,
+            held_amount=np.array([cur_position[code]['amount'] for code in held_codes.tolist()], dtype=np.int64),
+            money_left=money_left,
+            principal=principal,
+            day_result=day_result,
+            day_data_window=day_data_window,
+        )
+
+    def get_held_index(self):
+        """当天有数据的持仓股票在 codes 中的下标，按 held_codes 的顺序排列"""
+        if not len(self.codes):
+            return np.zeros(0, dtype=np.int64)
+        index = np.minimum(np.searchsorted(self.codes, self.held_codes), len(self.codes) - 1)
+        return index[self.codes[index] == self.held_codes]
+
+    @property
+    def cur_position(self):
+        """旧接口形式的持仓 dict"""
+        return {code: {'amount': amount} for code, amount in zip(self.held_codes.tolist(), self.held_amount.tolist())}
+
+
+class ArrayStrategyBase(StrategyBase):
+    """
+    向量化策略基类。子类实现 get_orders，基于数组做决策，不再逐行遍历 DataFrame。
+    get_strategy 保留旧接口，内部转换为 MarketView 后调用 get_orders。
+    """
+
+    def get_orders(self, market):
+        """
+        输入 MarketView，输出订单 (股票代码数组, 交易数量数组)，数量大于0代表买入，小于0代表卖出。
+        执行时先按顺序执行全部卖出，再按顺序执行全部买入
+        """
+        return empty_orders()
+
+    def get_strategy(self, cur_position, day_result, day_data_window, money_left=0, principal=15_0000):
+        market = MarketView.from_frames(cur_position, day_result, day_data_window, money_left, principal)
+        codes, amounts = self.get_orders(market)
+        return dict(zip(codes.tolist(), amounts.tolist()))
+
+
+class RankThresholdStrategy(ArrayStrategyBase):
+    """
+    只根据当天预测排名决策的策略：卖出排名不低于 get_sell_rank() 的持仓，
+    从排名前 get_buy_count() 的未持仓股票中按排名依次买入，买入数量由 size_buys 决定。
+    决策只依赖排名、收盘价、持仓和资金，可以用 utils.fast_backtest 在预先计算的 (交易日, 股票) 矩阵上回测
+    """
+
+    def get_sell_rank(self):
+        """排名（从 0 开始）不低于该值的持仓全部卖出"""
+        raise NotImplementedError
+
+    def get_buy_count(self):
+        """买入候选为排名前 get_buy_count() 的未持仓股票"""
+        raise NotImplementedError
+
+    def size_buys(self, money_left, prices):
+        """
+        :param money_left: 卖出后（按收盘价估算）的剩余资金
+        :param prices: 按排名排列的买入候选的收盘价数组
+        :return: (买入的候选下标列表, 买入数量列表)
+        """
+        raise NotImplementedError
+
+    def get_orders(self, market):
+        # 按持仓顺序卖出，卖出所得按同样的顺序累加
+        held = market.get_held_index()
+        sell = held[(market.amount[held] > 0) & (market.rank[held] >= self.get_sell_rank())]
+        sell_amount = market.amount[sell]
+        money_left = np.cumsum(np.concatenate(([market.money_left], sell_amount * market.close[sell])))[-1].item()
+
+        buy_list = market.order[:self.get_buy_count()]
+        buy_candidates = buy_list[market.amount[buy_list] == 0]
+        picked, buy_amount = self.size_buys(money_left, market.close[buy_candidates])
+        return (np.concatenate((market.codes[sell], market.codes[buy_candidates[np.array(picked, dtype=np.int64)]])),
+                np.concatenate((-sell_amount, np.array(buy_amount, dtype=np.int64))))
+
+
+class LegacyStrategyAdapter(ArrayStrategyBase):
+    """让只实现了旧接口 get_strategy 的策略以向量化接口运行"""
+
+    def __init__(self, strategy):
+        super().__init__()
+        self.strategy = strategy
+
+    def get_params(self):
+        return {'strategy': type(self.strategy).__qualname__, **vars(self.strategy)}
+
+    def is_deterministic(self):
+        # 未继承 StrategyBase 的策略无法判断，视为不确定
+        is_deterministic = getattr(self.strategy, 'is_deterministic', None)
+        return is_deterministic is not None and is_deterministic()
+
+    def get_orders(self, market):
+        strategy = self.strategy.get_strategy(market.cur_position, market.day_result, market.day_data_window,
+                                              market.money_left, market.principal)
+        return (np.fromiter(strategy.keys(), dtype=np.int64, count=len(strategy)),
+                np.fromiter(strategy.values(), dtype=np.float64, count=len(strategy)).astype(np.int64))
+
+
+def empty_orders():
+    return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+
+def buy_by_rank(codes, price, amount, banned, money_left, max_buy, min_buy):
+    """
+    按排名顺序依次买入未持仓的股票，每只买入不超过 max_buy 元的整手数量，
+    买入金额低于 min_buy 的跳过，剩余资金低于 max_buy 时停止
+
+    :param codes, price, amount, banned: 按排名排序的股票代码、价格、当前持仓、是否禁止买入
+    :return: (股票代码数组, 买入数量数组)
+    """
+    candidates = np.flatnonzero((amount == 0) & (price > 0) & ~banned)
+    # 剩余资金不低于 max_buy 时 floor(money_left / price) >= floor(max_buy / price)，买入数量只取决于 max_buy
+    buy_amount = np.floor(max_buy / price[candidates]) // 100 * 100
+    cost = buy_amount * price[candidates]
+    keep = cost >= min_buy
+    candidates, buy_amount, cost = candidates[keep], buy_amount[keep], cost[keep]
+    # 每笔买入前的剩余资金，逐笔扣减
+    before = np.cumsum(np.concatenate(([money_left], -cost)))[:-1]
+    stop = np.flatnonzero(before < max_buy)
+    n = stop[0] if len(stop) else len(candidates)
+    return codes[candidates[:n]], buy_amount[:n].astype(np.int64)
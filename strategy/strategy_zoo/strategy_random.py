@@ -1,30 +1,65 @@
-from .base import StrategyBase
+from .base import ArrayStrategyBase
+import numpy as np
 import random
 
-class StrategyRandom(StrategyBase):
+class StrategyRandom(ArrayStrategyBase):
     """自定义策略实现"""
 
-    def get_strategy(self, cur_position, day_result, day_data_window, money_left=0, principal=15_0000):
+    def __init__(self):
+        super().__init__()
+        self.seed = None  # 随机种子，为 None 时使用全局的 random 模块
+        self.rng = random
+
+    def set_params(self, **params):
+        super().set_params(**params)
+        self.rng = random if self.seed is None else random.Random(self.seed)
+        return self
+
+    def is_deterministic(self):
+        # 未指定种子时使用全局的 random 模块，结果不可复现
+        return self.seed is not None
+
+    def get_params(self):
+        # 随机数生成器以其当前状态代替，同一个策略对象多次回测时状态不同
+        params = super().get_params()
+        params['rng'] = None if self.rng is random else self.rng.getstate()
+        return params
+
+    def __getstate__(self):
+        # random 模块不能序列化，全局随机状态由检查点单独保存
+        state = self.__dict__.copy()
+        if state['rng'] is random:
+            state['rng'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.rng is None:
+            self.rng = random
+
+    def get_orders(self, market):
         strategy = {}
+        money_left = market.money_left
+        principal = market.principal
+        # 当天有数据的股票的收盘价
+        close = dict(zip(market.codes.tolist(), market.close.tolist()))
         # 随机卖出30支
-        holding_codes = list(cur_position.keys())
-        random.shuffle(holding_codes)
-        for code in holding_codes[:30]:
-            amount = cur_position[code]['amount']
-            try:
-                price = day_result.loc[(code, ), 'close'].item()
-            except Exception:
+        holding = list(zip(market.held_codes.tolist(), market.held_amount.tolist()))
+        self.rng.shuffle(holding)
+        for code, amount in holding[:30]:
+            if code not in close:
                 continue
             strategy[code] = -amount
-            money_left += amount * price
+            money_left += amount * close[code]
         # 随机买入200支股票
-        codes = day_result.index.get_level_values(0).tolist()
-        random.shuffle(codes)
+        codes = market.codes.tolist()
+        self.rng.shuffle(codes)
         while money_left > 1_0000:
             code = codes.pop()
-            price = day_result.loc[(code, ), 'close'].item()
+            price = close[code]
             amount = principal / 200 / price
             amount = max(amount // 100 * 100, 100)  # 整手交易
             strategy[code] = amount
             money_left -= amount * price
-        return strategy
+        return (np.fromiter(strategy.keys(), dtype=np.int64, count=len(strategy)),
+                np.fromiter(strategy.values(), dtype=np.float64, count=len(strategy)).astype(np.int64))
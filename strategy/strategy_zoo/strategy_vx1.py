@@ -1,7 +1,7 @@
-from .base import StrategyBase
-import math
+from .base import ArrayStrategyBase, buy_by_rank, empty_orders
+import numpy as np
 
-class StrategyVX1(StrategyBase):
+class StrategyVX1(ArrayStrategyBase):
     """自定义策略实现"""
     
     def __init__(self):
@@ -17,62 +17,45 @@ class StrategyVX1(StrategyBase):
         self.stop_loss_ratio = 0.85    # 止损比例
         self.take_profit_ratio = 1.30 # 止盈比例
 
+    def set_params(self, **params):
+        super().set_params(**params)
+        self.counter = self.rebalance_freq - 1  # 调仓频率可能被修改，重置计数器
+        return self
+
     def is_banned(self, code):
         """检查股票是否在禁用列表中"""
         return code in self.banned_codes
 
-    def get_strategy(self, stocks, money_left=None, principal=None):
-        principal = principal or self.principal
+    def get_orders(self, market):
+        principal = market.principal or self.principal
         self.counter += 1
         if self.counter < self.rebalance_freq:
-            return {}  # 未到调仓日
+            return empty_orders()  # 未到调仓日
         
         self.counter = 0  # 重置计数器
-        strategy = {}
+
         # 1. 按排名排序股票
-        sorted_stocks = sorted(stocks.items(), key=lambda x: x[1]['rank'])
-        
+        order = market.order
+        codes = market.codes[order]
+        amount = market.amount[order]
+        price = market.close[order]
+        cost_price = market.buy_price[order]
+        rank = np.arange(len(order))
+        holding = amount > 0
+
         # 2.a 卖出策略1：止损检查与止盈检查
-        for code, stock in sorted_stocks:
-            if stock['amount'] > 0:
-                current_price = stock['price']
-                cost_price = stock['buy_price']
-                
-                # 止损检查
-                if current_price <= cost_price * self.stop_loss_ratio:
-                    strategy[code] = -stock['amount']
-                    money_left += stock['amount'] * current_price
-                
-                # 止盈检查
-                elif current_price >= cost_price * self.take_profit_ratio:
-                    strategy[code] = -stock['amount']
-                    money_left += stock['amount'] * current_price
-                        
+        stop_loss = holding & (price <= cost_price * self.stop_loss_ratio)
+        take_profit = holding & ~stop_loss & (price >= cost_price * self.take_profit_ratio)
+        first = np.flatnonzero(stop_loss | take_profit)
+
         # 2.b  卖出策略2：卖出排名最靠后的持仓股票(不超过实际持仓数量且排名>=min_sell_rank)，且不操作已经止损止盈过的
-        holding_stocks = [s for s in sorted_stocks 
-                         if s[1]['amount'] > 0 and s[1]['rank'] >= self.min_sell_rank and strategy.get(s[0]) is None ]
-        sell_num = min(self.sell_count, len(holding_stocks))
-        if sell_num > 0:
-            for code, _ in holding_stocks[-sell_num:]:
-                sell_amount = stocks[code]['amount']
-                strategy[code] = -sell_amount
-                money_left += sell_amount * stocks[code]['price']
+        rest = np.flatnonzero(holding & (rank >= self.min_sell_rank) & ~stop_loss & ~take_profit)
+        second = rest[len(rest) - min(self.sell_count, len(rest)):]
+        sell = np.concatenate((first, second))
+        money_left = np.cumsum(np.concatenate(([market.money_left], amount[sell] * price[sell])))[-1]
 
         # 3. 买入策略
-        for code, stock in sorted_stocks:
-            if money_left < self.max_buy_per_stock * principal:
-                break
-            price = stock['price']
-            if (stock['amount'] == 0 and
-                price > 0 and
-                not self.is_banned(code)):
-                
-                max_amount = min(math.floor(money_left / price),
-                                math.floor(self.max_buy_per_stock * principal / price))
-                max_amount = max_amount // 100 * 100  # 调整为100的倍数
-                
-                cost = max_amount * price
-                if cost >= self.min_buy_value * principal:
-                    strategy[code] = max_amount
-                    money_left -= cost
-        return strategy
+        banned = np.isin(codes, list(self.banned_codes))
+        buy_codes, buy_amount = buy_by_rank(codes, price, amount, banned, money_left,
+                                            self.max_buy_per_stock * principal, self.min_buy_value * principal)
+        return np.concatenate((codes[sell], buy_codes)), np.concatenate((-amount[sell], buy_amount))
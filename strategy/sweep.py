@@ -0,0 +1,92 @@
+from app import APP
+from utils.fetcher import Fetcher
+from utils.shared_data import SharedArrays
+from multiprocessing import Pool
+import itertools
+import os
+import pandas as pd
+
+# 子进程中共享的数据，由 _init_worker 设置
+_shared = None
+_fetcher = None
+_fast = False
+
+
+def expand_grid(grid):
+    """
+    将参数网格展开为参数组合列表
+
+    :param grid: dict，键为参数名，值为候选值列表；或已展开的参数组合列表
+    :return: list[dict]
+    """
+    if isinstance(grid, dict):
+        names = list(grid)
+        return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+    return [dict(params) for params in grid]
+
+
+def _init_worker(spec, fast=False):
+    global _shared, _fetcher, _fast
+    _shared = SharedArrays.attach(spec)
+    _fetcher = Fetcher.from_arrays(_shared.arrays)
+    _fast = fast
+
+
+def _run_one(task):
+    strategy_name, params, start_money, filt_st, start_day, end_day = task
+    app = APP(None, fetcher=_fetcher)
+    app.set_strategy(strategy_name, **params)
+    if _fast and app.supports_fast_backtest():
+        result = app.fast_backtest(start_money=start_money, start_day=start_day, end_day=end_day)
+    else:
+        result = app.backtest(start_money=start_money, filt_st=filt_st, save_result=False,
+                              start_day=start_day, end_day=end_day)
+    return task, result['metrics']
+
+
+def run_tasks(fetcher, tasks, processes=None, fast=False):
+    """
+    数据放入共享内存，在进程池中并行回测。调用前执行 fetcher.build_rank_table()，各进程可共用预测排名表
+
+    :param tasks: (策略名称, 参数, 初始资金, filt_st, 起始日期, 结束日期) 列表
+    :param fast: 支持快速回测的策略（见 APP.fast_backtest）是否使用快速回测，结果相同
+    :return: 生成器，按完成顺序产出 (task, 回测指标)
+    """
+    with SharedArrays.publish(fetcher.to_arrays()) as shared:
+        with Pool(processes or os.cpu_count(), initializer=_init_worker, initargs=(shared.spec, fast)) as pool:
+            yield from pool.imap_unordered(_run_one, tasks)
+
+
+def run_sweep(result_file_path, strategy_name, grid, start_money=15_0000, filt_st=True,
+              processes=None, fetcher=None, fast=True):
+    """
+    参数扫描：数据只加载一次并放入共享内存，各参数组合在进程池中并行回测
+
+    :param result_file_path: 预测结果文件路径
+    :param strategy_name: 策略名称，见 APP.STRATEGY_MAP
+    :param grid: 参数网格或参数组合列表，见 expand_grid
+    :param start_money: 初始资金
+    :param processes: 进程数，默认为 CPU 核数
+    :param fetcher: 已加载数据的 Fetcher，传入时不再重新加载数据
+    :param fast: 策略支持时使用快速回测，见 APP.fast_backtest
+    :return: DataFrame，每行为一组参数及其回测指标
+    """
+    if fetcher is None:
+        fetcher = Fetcher(result_file_path)
+    fetcher.build_rank_table()
+    tasks = [(strategy_name, params, start_money, filt_st, None, None) for params in expand_grid(grid)]
+    rows = [{**task[1], **metrics} for task, metrics in run_tasks(fetcher, tasks, processes, fast)]
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    grid = {
+        'sell_count': [10, 30, 50],
+        'max_buy_per_stock': [1 / 100, 1 / 200],
+        'min_sell_rank': [200, 400],
+        'rebalance_freq': [1, 5],
+    }
+    table = run_sweep('../data/result.csv', 'v1', grid, start_money=1000_0000)
+    os.makedirs('result', exist_ok=True)
+    table.to_csv('result/sweep.csv', index=False)
+    print(table.sort_values('sharpe', ascending=False).to_string())
@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+# 与运行 strategy/ 下的脚本时相同，以 strategy/ 为导入根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import fetcher as fetcher_module
+from utils.fetcher import Fetcher
+from utils.synthetic import write_dataset
+
+
+@pytest.fixture(scope='session')
+def dataset(tmp_path_factory):
+    """模拟行情和预测数据，行情文件路径写入 utils.fetcher.stock_data_path，返回预测结果文件路径"""
+    stock_path, pred_path = write_dataset(str(tmp_path_factory.mktemp('data')), seed=1, n_codes=300, n_days=60)
+    original = fetcher_module.stock_data_path
+    fetcher_module.stock_data_path = stock_path
+    yield pred_path
+    fetcher_module.stock_data_path = original
+
+
+@pytest.fixture(scope='session')
+def fetcher(dataset):
+    return Fetcher(dataset, use_cache=False)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """回测结果写入 result/ 等相对路径，在临时目录中运行"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,103 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.analytics import compute_metrics, drawdown_stats, format_report
+
+
+def baseline_drawdown(equity):
+    """原 analyze_backtest_result 的 O(n^2) 最大回撤计算，返回 (最大回撤, 起点, 最低点, 修复位置或 None)"""
+    max_drawdown, start, end = 0, 0, 0
+    for i in range(len(equity)):
+        for j in range(i, len(equity)):
+            drawdown = (equity[i] - equity[j]) / equity[i]
+            if drawdown > max_drawdown:
+                max_drawdown, start, end = drawdown, i, j
+    recovery = np.argmax(np.asarray(equity[end:]) >= equity[start])
+    return max_drawdown, start, end, end + recovery if recovery > 0 else None
+
+
+def _days(n):
+    return pd.bdate_range('2021-01-04', periods=n).strftime('%Y%m%d').tolist()
+
+
+def _curves():
+    rng = np.random.default_rng(0)
+    curves = [np.cumprod(1 + rng.normal(0.0005, 0.02, 80)) * 1e6 for _ in range(20)]
+    # 取整后有相同的高点和低点
+    curves += [np.round(np.cumprod(1 + rng.normal(0, 0.03, 60)) * 10) for _ in range(20)]
+    curves += [np.linspace(1, 2, 30), np.linspace(2, 1, 30), np.full(10, 5.0), np.array([3.0, 1.0, 3.0, 1.0, 2.0])]
+    return curves
+
+
+@pytest.mark.parametrize('equity', _curves())
+def test_drawdown_matches_baseline(equity):
+    expected, start, end, recovery = baseline_drawdown(equity)
+    stats = drawdown_stats(equity)
+    assert stats['max_drawdown'] == pytest.approx(expected, rel=1e-12, abs=0)
+    assert (stats['peak_index'], stats['trough_index']) == (start, end)
+    assert stats['recovery_index'] == (-1 if recovery is None else recovery)
+
+
+def test_metrics_match_baseline_report():
+    equity = _curves()[0]
+    days = _days(len(equity))
+    metrics = compute_metrics(equity, days)
+    total_days = (pd.Timestamp(days[-1]) - pd.Timestamp(days[0])).days
+    assert metrics['total_return'] == pytest.approx(equity[-1] / equity[0] - 1, rel=1e-12)
+    assert metrics['annual_return'] == pytest.approx((equity[-1] / equity[0]) ** (365 / total_days) - 1, rel=1e-12)
+    _, start, end, recovery = baseline_drawdown(equity)
+    assert (metrics['max_drawdown_start'], metrics['max_drawdown_end']) == (days[start], days[end])
+    assert metrics['recovery_date'] == ('' if recovery is None else days[recovery])
+
+
+def test_hand_computed_metrics():
+    equity = [100.0, 120.0, 90.0, 95.0, 130.0, 110.0]
+    days = ['20240102', '20240103', '20240104', '20240105', '20240108', '20240109']
+    metrics = compute_metrics(equity, days, traded_value=[0, 60, 0, 19, 0, 11])
+    returns = np.array([0.2, -0.25, 95 / 90 - 1, 130 / 95 - 1, 110 / 130 - 1])
+    assert metrics['max_drawdown'] == pytest.approx(0.25)
+    assert metrics['max_drawdown_start'] == '20240103'
+    assert metrics['max_drawdown_end'] == '20240104'
+    assert metrics['recovery_date'] == '20240108'
+    assert metrics['total_return'] == pytest.approx(0.1)
+    assert metrics['annual_return'] == pytest.approx(1.1 ** (365 / 7) - 1)
+    assert metrics['win_rate'] == pytest.approx(3 / 5)
+    assert metrics['volatility'] == pytest.approx(returns.std(ddof=1) * math.sqrt(252))
+    assert metrics['sharpe'] == pytest.approx(returns.mean() / returns.std(ddof=1) * math.sqrt(252))
+    assert metrics['calmar'] == pytest.approx(metrics['annual_return'] / 0.25)
+    assert metrics['turnover'] == pytest.approx(np.mean([0, 0.5, 0, 0.2, 0, 0.1]))
+    report = format_report(metrics)
+    assert '最大回撤: 25.00%' in report
+    assert '修复时段: 20240104 至 20240108' in report
+
+
+def test_flat_and_single_day_curves():
+    flat = compute_metrics([100.0] * 5, _days(5))
+    assert flat['max_drawdown'] == 0
+    assert flat['total_return'] == 0
+    assert flat['recovery_date'] == ''
+    assert flat['max_drawdown_start'] == flat['max_drawdown_end'] == _days(5)[0]
+    assert '未修复' in format_report(flat)
+
+    single = compute_metrics([100.0], ['20240102'])
+    assert single['total_return'] == 0
+    assert single['max_drawdown'] == 0
+    assert math.isnan(single['annual_return'])
+    assert math.isnan(single['volatility'])
+    assert math.isnan(single['win_rate'])
+
+
+def test_batch_matches_single_curves():
+    curves = np.array([c for c in _curves() if len(c) == 80])
+    days = _days(curves.shape[1])
+    batch = compute_metrics(curves, days)
+    for i, equity in enumerate(curves):
+        single = compute_metrics(equity, days)
+        for name, value in single.items():
+            if isinstance(value, str):
+                assert batch[name][i] == value, name
+            else:
+                np.testing.assert_allclose(batch[name][i], value, rtol=1e-12, err_msg=name)
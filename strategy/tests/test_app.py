@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+
+from app import APP
+from utils import fetcher as fetcher_module
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_backtest_creates_result_dir(fetcher, workdir):
+    app = APP(None, fetcher=fetcher)
+    app.backtest(start_money=1000_0000, show_plot=False, plot=False)
+    for name in ('result.txt', 'metrics.json', 'equity.csv'):
+        assert (workdir / 'result' / name).exists()
+    assert not (workdir / 'result' / 'fig.png').exists()
+
+
+def test_no_plot_does_not_import_matplotlib(dataset, workdir):
+    script = (
+        'import sys\n'
+        'from utils import fetcher\n'
+        f'fetcher.stock_data_path = {fetcher_module.stock_data_path!r}\n'
+        'import cli\n'
+        f'cli.main(["backtest", "--result-file", {dataset!r}, "--no-plot"])\n'
+        'assert not any(name.startswith("matplotlib") for name in sys.modules)\n'
+    )
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    subprocess.run([sys.executable, '-c', script], check=True, env=env, stdout=subprocess.DEVNULL)
+    assert (workdir / 'result' / 'equity.csv').exists()
+    assert not (workdir / 'result' / 'fig.png').exists()
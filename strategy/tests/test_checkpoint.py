@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import APP
+from utils.checkpoint import list_checkpoints
+from utils.journal import read_journal
+
+
+def _backtest(fetcher, strategy_name, params, **kwargs):
+    app = APP(None, strategy_name, fetcher=fetcher).set_strategy(strategy_name, **params)
+    return app, app.backtest(start_money=1000_0000, show_plot=False, plot=False, **kwargs)
+
+
+def _read_journals():
+    return {table: read_journal('result/journal', table) for table in ('positions', 'fills')}
+
+
+@pytest.mark.parametrize('strategy_name, params', [
+    ('v1', {'rebalance_freq': 3}),  # 调仓计数器 counter 是策略状态
+    ('random', {'seed': 7}),
+    ('v2', {}),
+])
+def test_resume_matches_full_replay(fetcher, tmp_path, monkeypatch, strategy_name, params):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('full')
+    monkeypatch.chdir('full')
+    full_app, full = _backtest(fetcher, strategy_name, params)
+    full_journal = _read_journals()
+
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('resumed')
+    monkeypatch.chdir('resumed')
+    # 前 32 个交易日，每 7 个交易日及结束时保存检查点
+    _backtest(fetcher, strategy_name, params, end_day=fetcher.date_list[31],
+              checkpoint_dir='result/checkpoint', checkpoint_every=7)
+    assert list_checkpoints('result/checkpoint') == [fetcher.date_list[i] for i in (20, 27, 31)]
+    # 模拟最近两个检查点丢失（日志已写入）：续跑从第 21 个交易日的检查点开始，
+    # 第 22 天和第 29 天开始的日志文件都应被丢弃，续跑只重新生成前者
+    for i in (27, 31):
+        os.remove(os.path.join('result/checkpoint', f'{fetcher.date_list[i]}.pkl'))
+    assert f'part-{fetcher.date_list[28]}.parquet' in os.listdir('result/journal/positions')
+
+    app = APP(None, 'v1', fetcher=fetcher)
+    resumed = app.backtest(show_plot=False, plot=False, checkpoint_dir='result/checkpoint', resume=True)
+
+    for name in ('day_list', 'total_money_list', 'traded_value_list', 'metrics'):
+        assert resumed[name] == full[name], name
+    assert resumed['day_list'] == fetcher.date_list
+    state, expected_state = app.agent.get_state(), full_app.agent.get_state()
+    for name in expected_state:
+        np.testing.assert_array_equal(state[name], expected_state[name], err_msg=name)
+    assert type(app.strategy) is type(full_app.strategy)
+    if strategy_name == 'v1':
+        assert app.strategy.counter == full_app.strategy.counter
+    if strategy_name == 'random':
+        assert app.strategy.rng.getstate() == full_app.strategy.rng.getstate()
+
+    journal = _read_journals()
+    for table, expected in full_journal.items():
+        pd.testing.assert_frame_equal(journal[table], expected)
+    assert not journal['positions'].duplicated(['day', 'code']).any()
+    with open('result/result.txt') as f, open(tmp_path / 'full' / 'result' / 'result.txt') as g:
+        assert f.read() == g.read()
+
+
+def test_resume_without_checkpoint_runs_from_start(fetcher, workdir):
+    _, full = _backtest(fetcher, 'v2', {}, save_result=False)
+    _, result = _backtest(fetcher, 'v2', {}, save_result=False, checkpoint_dir='result/checkpoint', resume=True)
+    assert result['total_money_list'] == full['total_money_list']
+    assert list_checkpoints('result/checkpoint') == [fetcher.date_list[-1]]
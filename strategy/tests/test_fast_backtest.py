@@ -0,0 +1,32 @@
+import pytest
+
+from app import APP
+
+
+@pytest.mark.parametrize('params', [{}, {'top_buy_count': 20, 'middle_hold_count': 60}])
+@pytest.mark.parametrize('start_money', [15_0000, 1000_0000])
+def test_fast_backtest_matches_loop(fetcher, params, start_money):
+    app = APP(None, 'v2', fetcher=fetcher).set_strategy('v2', **params)
+    result = app.fast_backtest(start_money=start_money, cross_check=True)
+    assert len(result['total_money_list']) == len(fetcher.date_list)
+
+
+def test_fast_backtest_date_range(fetcher):
+    days = fetcher.date_list
+    app = APP(None, 'v2', fetcher=fetcher)
+    result = app.fast_backtest(start_money=1000_0000, start_day=days[10], end_day=days[40], cross_check=True)
+    assert result['day_list'] == days[10:41]
+
+
+def test_cross_check_detects_mismatch(fetcher, monkeypatch):
+    app = APP(None, 'v2', fetcher=fetcher)
+    original = app.backtest
+
+    def backtest(**kwargs):
+        result = original(**kwargs)
+        result['total_money_list'][-1] += 1
+        return result
+
+    monkeypatch.setattr(app, 'backtest', backtest)
+    with pytest.raises(RuntimeError):
+        app.fast_backtest(start_money=1000_0000, cross_check=True)
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import features
+from utils import fetcher as fetcher_module
+from utils.features import FeatureStore
+from utils.fetcher import Fetcher
+
+SPECS = {
+    'ma5': {'kind': 'mean', 'column': 'close', 'window': 5},
+    'vol10': {'kind': 'std', 'column': 'close', 'window': 10},
+    'open_vol5': {'kind': 'std', 'column': 'open', 'window': 5, 'min_periods': 3},
+    'ret5': {'kind': 'return', 'column': 'close', 'window': 5},
+    'pred_ma5': {'kind': 'mean', 'column': 'pred', 'window': 5, 'min_periods': 1},
+    'pred_std5': {'kind': 'std', 'column': 'pred', 'window': 5, 'min_periods': 2},
+    'pred_ret3': {'kind': 'return', 'column': 'pred', 'window': 3},
+    'rank_change5': {'kind': 'diff', 'column': 'rank', 'window': 5},
+    'rank_ma5': {'kind': 'mean', 'column': 'rank', 'window': 5, 'min_periods': 1},
+}
+
+
+@pytest.fixture(scope='module')
+def split(dataset, fetcher):
+    """前 40 个交易日的 Fetcher，以及之后交易日的行情和预测数据"""
+    last_day = fetcher.date_list[39]
+    head = Fetcher(dataset, use_cache=False, end_day=last_day)
+    stock_df = pd.read_parquet(fetcher_module.stock_data_path)
+    pred_df = pd.read_csv(dataset)
+    return head, stock_df[stock_df['day'] > int(last_day)], pred_df[pred_df['time'] > int(last_day)]
+
+
+def _aligned(store, fetcher, name):
+    """按 fetcher 的股票序号排列的特征矩阵"""
+    matrix = np.full((len(store.fetcher.date_list), len(fetcher.codes)), np.nan)
+    matrix[:, np.searchsorted(fetcher.codes, store.fetcher.codes)] = store.get_matrix(name)
+    return matrix
+
+
+def test_no_look_ahead(fetcher, split):
+    head = split[0]
+    full = FeatureStore(fetcher, SPECS).compute_all()
+    partial = FeatureStore(head, SPECS).compute_all()
+    for name in SPECS:
+        np.testing.assert_array_equal(_aligned(partial, fetcher, name), full.get_matrix(name)[:len(head.date_list)],
+                                      err_msg=name)
+
+
+def test_append_matches_full_compute(fetcher, split):
+    head, stock_df, pred_df = split
+    full = FeatureStore(fetcher, SPECS).compute_all()
+    appended = FeatureStore(head, SPECS).compute_all().append(head.append_days(stock_df, pred_df))
+    assert appended.fetcher.date_list == fetcher.date_list
+    for name in SPECS:
+        np.testing.assert_array_equal(_aligned(appended, fetcher, name), full.get_matrix(name), err_msg=name)
+
+
+def test_std_matches_pandas(fetcher):
+    store = FeatureStore(fetcher, {'vol10': {'kind': 'std', 'column': 'close', 'window': 10, 'min_periods': 2}})
+    expected = pd.DataFrame(fetcher.close_matrix).rolling(10, min_periods=2).std().to_numpy()
+    np.testing.assert_allclose(store.get_matrix('vol10'), expected, rtol=1e-9, atol=1e-12)
+
+
+def _naive_rolling_sum(x, window):
+    total, count = np.zeros(x.shape), np.zeros(x.shape, dtype=np.int64)
+    for d in range(len(x)):
+        rows = x[max(0, d - window + 1):d + 1]
+        total[d] = np.nansum(rows, axis=0)
+        count[d] = (~np.isnan(rows)).sum(axis=0)
+    return total, count
+
+
+@pytest.mark.parametrize('window', [1, 5, 8])
+@pytest.mark.parametrize('offset', [0, 3, 8])
+def test_rolling_sum_matches_loop(window, offset, monkeypatch):
+    monkeypatch.setattr(features, 'ROLLING_BLOCK', 8)
+    rng = np.random.default_rng(window)
+    x = rng.normal(size=(40, 6))
+    x[rng.random(x.shape) < 0.2] = np.nan
+    total, count = features.rolling_sum(x, window, offset)
+    expected_total, expected_count = _naive_rolling_sum(x, window)
+    np.testing.assert_array_equal(count, expected_count)
+    np.testing.assert_allclose(total, expected_total, rtol=1e-12, atol=1e-12)
+
+
+def test_block_boundaries_keep_append_exact(fetcher, split, monkeypatch):
+    """累计和分段较短、跨越追加位置时，追加和部分历史的结果仍与一次计算全部历史相同"""
+    monkeypatch.setattr(features, 'ROLLING_BLOCK', 8)
+    head, stock_df, pred_df = split
+    full = FeatureStore(fetcher, SPECS).compute_all()
+    partial = FeatureStore(head, SPECS).compute_all()
+    appended = partial.append(head.append_days(stock_df, pred_df))
+    for name in SPECS:
+        np.testing.assert_array_equal(_aligned(appended, fetcher, name), full.get_matrix(name), err_msg=name)
+        np.testing.assert_array_equal(_aligned(partial, fetcher, name), full.get_matrix(name)[:len(head.date_list)],
+                                      err_msg=name)
+    expected = pd.DataFrame(fetcher.close_matrix).rolling(10).std().to_numpy()
+    np.testing.assert_allclose(full.get_matrix('vol10'), expected, rtol=1e-9, atol=1e-12)
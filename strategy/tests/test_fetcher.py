@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import fetcher as fetcher_module
+from utils.fetcher import Fetcher
+from utils.multi_fetcher import MultiFetcher
+
+
+@pytest.fixture(scope='module')
+def new_days(dataset, fetcher):
+    """第 40 个交易日之后的行情和预测数据"""
+    last_day = fetcher.date_list[39]
+    stock_df = pd.read_parquet(fetcher_module.stock_data_path)
+    pred_df = pd.read_csv(dataset)
+    return last_day, stock_df[stock_df['day'] > int(last_day)], pred_df[pred_df['time'] > int(last_day)]
+
+
+def _assert_same_arrays(actual, expected):
+    a, e = actual.to_arrays(), expected.to_arrays()
+    assert sorted(a) == sorted(e)
+    for name in e:
+        np.testing.assert_array_equal(a[name], e[name], err_msg=name)
+        assert a[name].dtype == e[name].dtype, name
+
+
+@pytest.mark.parametrize('with_rank', [False, True])
+@pytest.mark.parametrize('new_codes', [False, True])
+def test_append_days_matches_full_build(dataset, fetcher, new_days, with_rank, new_codes):
+    last_day, stock_df, pred_df = new_days
+    # 排除部分股票加载前 40 个交易日，追加的数据中这些股票为新增股票代码
+    head = Fetcher(dataset, use_cache=False, end_day=last_day,
+                   exclude_codes=list(fetcher.codes[::7]) if new_codes else None)
+    assert (len(head.codes) < len(fetcher.codes)) == new_codes
+    if with_rank:
+        head.build_rank_table()
+    appended = head.append_days(stock_df, pred_df)
+    assert len(appended.codes) == len(fetcher.codes)
+
+    # 由同样的行重新构建全部矩阵和排名表
+    arrays = appended.to_arrays()
+    expected = Fetcher.from_arrays(Fetcher._assemble_arrays(
+        arrays['days'], arrays['codes'], arrays['row_day'], arrays['row_code'], arrays['values']))
+    if with_rank:
+        expected.build_rank_table()
+    _assert_same_arrays(appended, expected)
+    if not new_codes:
+        if with_rank:
+            fetcher.build_rank_table()
+        _assert_same_arrays(appended, Fetcher.from_arrays(
+            {k: v for k, v in fetcher.to_arrays().items() if k in arrays}))
+
+
+def test_append_days_rejects_existing_days(fetcher, new_days):
+    with pytest.raises(ValueError):
+        fetcher.append_days(new_days[1], new_days[2])
+
+
+@pytest.fixture(scope='module')
+def model_files(dataset, tmp_path_factory):
+    """三个模型的预测文件：完整、缺少部分行和交易日、含重复行和行情中没有的股票和交易日"""
+    dirname = tmp_path_factory.mktemp('models')
+    pred = pd.read_csv(dataset)
+    rng = np.random.default_rng(5)
+    days = np.sort(pred['time'].unique())
+    partial = pred[(rng.random(len(pred)) > 0.3) & ~pred['time'].isin(days[::9])].copy()
+    partial['pred'] = rng.normal(size=len(partial))
+    extra = pd.DataFrame({'SecurityID': [999999, pred['SecurityID'].iloc[0]], 'time': [days[3], 20991231],
+                          'pred': [1.0, 2.0]})
+    duplicated = pd.concat([pred.iloc[::2], extra, pred.iloc[:500].assign(pred=lambda df: df['pred'] + 1)])
+    paths = {}
+    for name, df in (('full', pred), ('partial', partial), ('duplicated', duplicated)):
+        paths[name] = str(dirname / f'{name}.csv')
+        df.to_csv(paths[name], index=False)
+    return paths
+
+
+def test_multi_fetcher_matches_fetcher(model_files, tmp_path):
+    multi = MultiFetcher(model_files, cache_dir=str(tmp_path))
+    cached = MultiFetcher(list(model_files.values()), cache_dir=str(tmp_path))
+    assert multi.models == cached.models == list(model_files)
+    matrix = multi.get_pred_matrix()
+    for k, (name, path) in enumerate(model_files.items()):
+        expected = Fetcher(path, use_cache=False)
+        _assert_same_arrays(multi.get_fetcher(name), expected)
+        _assert_same_arrays(cached.get_fetcher(k), expected)
+        assert multi.get_fetcher(name) is multi.get_fetcher(k)
+        # 预测值矩阵按 MultiFetcher 的交易日和股票序号对齐
+        days = pd.Index(multi.date_list).get_indexer(expected.date_list)
+        codes = np.searchsorted(multi.codes, expected.codes)
+        rows = matrix[days[expected.row_day], codes[expected.row_code], k]
+        np.testing.assert_array_equal(rows, expected.arrays['values'][:, 2])
+        assert np.isnan(matrix[..., k]).sum() == matrix[..., k].size - len(expected.row_day)
+
+
+def _slice(fetcher, start_day=None, end_day=None, codes=None, exclude_codes=None):
+    """从未过滤的 Fetcher 中取出满足条件的行，重新编号交易日和股票"""
+    days = fetcher.arrays['days'].astype(np.int64)[fetcher.row_day]
+    row_codes = fetcher.codes[fetcher.row_code]
+    keep = np.ones(len(days), dtype=bool)
+    if start_day is not None:
+        keep &= days >= int(start_day)
+    if end_day is not None:
+        keep &= days <= int(end_day)
+    if codes is not None:
+        keep &= np.isin(row_codes, codes)
+    if exclude_codes is not None:
+        keep &= ~np.isin(row_codes, exclude_codes)
+    day_ords, row_day = np.unique(fetcher.row_day[keep], return_inverse=True)
+    code_ords, row_code = np.unique(fetcher.row_code[keep], return_inverse=True)
+    return Fetcher.from_arrays(Fetcher._assemble_arrays(
+        fetcher.arrays['days'][day_ords], fetcher.codes[code_ords], row_day.astype(np.int32),
+        row_code.astype(np.int32), fetcher.arrays['values'][keep]))
+
+
+@pytest.mark.parametrize('day_type', ['int', 'str'])
+def test_load_filters_match_slicing(dataset, fetcher, tmp_path, monkeypatch, day_type):
+    if day_type == 'str':
+        stock = pd.read_parquet(fetcher_module.stock_data_path)
+        stock['day'] = pd.to_datetime(stock['day'].astype(str)).dt.strftime('%Y-%m-%d')
+        path = str(tmp_path / 'stock_data.parquet')
+        stock.to_parquet(path, index=False)
+        monkeypatch.setattr(fetcher_module, 'stock_data_path', path)
+    # 记录交给 parquet 读取器的过滤条件
+    read_parquet = pd.read_parquet
+    pushed = []
+
+    def spy(*args, filters=None, **kwargs):
+        pushed.append(filters)
+        return read_parquet(*args, filters=filters, **kwargs)
+
+    monkeypatch.setattr(pd, 'read_parquet', spy)
+    days, codes = fetcher.date_list, fetcher.codes.tolist()
+    cases = [
+        {'start_day': days[10]},
+        {'end_day': days[30]},
+        {'start_day': days[5], 'end_day': days[20], 'codes': codes[::3]},
+        {'exclude_codes': codes[::4]},
+        {'start_day': f'{days[7][:4]}-{days[7][4:6]}-{days[7][6:]}', 'codes': codes[:50], 'exclude_codes': codes[:10]},
+    ]
+    for filters in cases:
+        pushed.clear()
+        loaded = Fetcher(dataset, use_cache=False, **filters)
+        expected = _slice(fetcher, **{k: v.replace('-', '') if isinstance(v, str) else v
+                                      for k, v in filters.items()})
+        _assert_same_arrays(loaded, expected)
+        pushed_columns = {predicate[0] for predicate in pushed[0] or []}
+        assert ('day' in pushed_columns) == (day_type == 'int' and ('start_day' in filters or 'end_day' in filters))
+        assert ('code' in pushed_columns) == ('codes' in filters or 'exclude_codes' in filters)
+
+
+def test_filtered_cache_is_separate(dataset, fetcher, tmp_path):
+    filtered = Fetcher(dataset, cache_dir=str(tmp_path), start_day=fetcher.date_list[30])
+    full = Fetcher(dataset, cache_dir=str(tmp_path))
+    assert len(filtered.date_list) == len(fetcher.date_list) - 30
+    assert full.date_list == fetcher.date_list
+    _assert_same_arrays(Fetcher(dataset, cache_dir=str(tmp_path), start_day=fetcher.date_list[30]), filtered)
@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.fetcher import Fetcher
+from utils.fill_simulator import (FillSimulator, get_limit_pct, load_volume_matrix, REJECT_REASONS, OK, UNKNOWN,
+                                  SUSPENDED, LIMIT_UP, LIMIT_DOWN, LOT, VOLUME)
+from utils.transaction import Agent
+
+DAYS = ['20240102', '20240103', '20240104']
+ST = {600001}
+# 第 0 天收盘价均为 10.00，第 1 天的开盘价：
+OPEN_DAY1 = {
+    300001: 11.00,  # 创业板，涨停价 12.00，未涨停
+    300002: 12.00,  # 创业板涨停
+    600000: 11.00,  # 主板涨停（10%）
+    600001: 10.50,  # ST 涨停（5%）
+    600003: 9.00,   # 主板跌停
+    688001: 12.00,  # 科创板涨停
+    # 600002 第 1 天停牌
+}
+CODES = sorted(set(OPEN_DAY1) | {600002})
+
+
+@pytest.fixture(scope='module')
+def market():
+    """3 个交易日的手工行情：第 0 天全部为 10.00，第 1 天见 OPEN_DAY1，第 2 天开盘价等于第 1 天收盘价"""
+    rows = []
+    for code in CODES:
+        rows.append((0, code, 10.0, 10.0))
+        if code in OPEN_DAY1:
+            rows.append((1, code, OPEN_DAY1[code], OPEN_DAY1[code]))
+        rows.append((2, code, OPEN_DAY1.get(code, 10.0), 10.0))
+    rows.sort()
+    day_ord = np.array([r[0] for r in rows], dtype=np.int32)
+    code_ord = np.searchsorted(CODES, [r[1] for r in rows]).astype(np.int32)
+    values = np.array([[r[2], r[3], 0.0] for r in rows])
+    return Fetcher.from_arrays(Fetcher._assemble_arrays(np.array(DAYS), np.array(CODES, dtype=np.int64),
+                                                        day_ord, code_ord, values))
+
+
+def _simulate(simulator, market, orders, day, held=None):
+    codes = np.array([code for code, _ in orders])
+    amounts = np.array([amount for _, amount in orders], dtype=np.int64)
+    held = np.zeros(len(orders), dtype=np.int64) if held is None else np.asarray(held)
+    filled, prices, reasons = simulator.simulate(market.get_code_ordinals(codes), amounts, day, held)
+    return filled.tolist(), prices, reasons.tolist()
+
+
+def test_limit_pct():
+    pct = get_limit_pct([600000, 300001, 301001, 688001, 689001, 600001, 300002, 1], st={600001, 300002})
+    np.testing.assert_allclose(pct, [0.1, 0.2, 0.2, 0.2, 0.2, 0.05, 0.2, 0.1])
+
+
+def test_limit_prices(market):
+    simulator = FillSimulator(market, st=ST)
+    c = market.get_code_ordinals(np.array([600000, 300001, 688001, 600001]))
+    np.testing.assert_allclose(simulator.limit_up[1, c], [11.0, 12.0, 12.0, 10.5])
+    np.testing.assert_allclose(simulator.limit_down[1, c], [9.0, 8.0, 8.0, 9.5])
+    # 第一天没有前收盘价，不检查涨跌停
+    assert np.isnan(simulator.limit_up[0]).all()
+
+
+def test_limit_up_and_down(market):
+    simulator = FillSimulator(market, st=ST)
+    orders = [(600000, 100), (300001, 100), (300002, 100), (688001, 100), (600001, 100), (600003, 100),
+              (600000, -100), (600003, -100)]
+    filled, prices, reasons = _simulate(simulator, market, orders, DAYS[1], held=[0] * 6 + [100, 100])
+    assert reasons == [LIMIT_UP, OK, LIMIT_UP, LIMIT_UP, LIMIT_UP, OK, OK, LIMIT_DOWN]
+    assert filled == [0, 100, 0, 0, 0, 100, -100, 0]
+    np.testing.assert_allclose(prices[:2], [11.0, 11.0])
+
+
+def test_suspended_and_unknown(market):
+    simulator = FillSimulator(market, st=ST)
+    filled, prices, reasons = _simulate(simulator, market, [(600002, 100), (123456, 100), (600002, -100)], DAYS[1],
+                                        held=[0, 0, 100])
+    assert reasons == [SUSPENDED, UNKNOWN, SUSPENDED]
+    assert filled == [0, 0, 0]
+    assert np.isnan(prices).all()
+
+
+def test_lots(market):
+    simulator = FillSimulator(market, st=ST)
+    orders = [(600000, 250), (600001, 50), (600002, -150), (600003, -150), (300001, -30)]
+    filled, _, reasons = _simulate(simulator, market, orders, DAYS[2], held=[0, 0, 150, 300, 30])
+    # 一次卖出全部持仓时允许零股
+    assert filled == [200, 0, -150, -100, -30]
+    assert reasons == [LOT, LOT, OK, LOT, OK]
+
+
+def test_volume_cap(market):
+    volume = np.full(market.open_matrix.shape, 1000.0)
+    simulator = FillSimulator(market, st=ST, volume=volume, volume_cap=0.25)  # 每笔最多 250 股，取整为 200 股
+    orders = [(600000, 500), (600001, 150), (600003, -1000), (600002, 200)]
+    filled, _, reasons = _simulate(simulator, market, orders, DAYS[2], held=[0, 0, 1000, 0])
+    assert filled == [200, 100, -200, 200]
+    assert reasons == [VOLUME, LOT, VOLUME, OK]
+    with pytest.raises(ValueError):
+        FillSimulator(market, volume_cap=0.25)
+
+
+def test_reason_priority(market):
+    """同时满足多个原因时：未知代码 > 停牌 > 涨跌停 > 成交量 > 整手"""
+    volume = np.full(market.open_matrix.shape, 1000.0)
+    simulator = FillSimulator(market, st=ST, volume=volume, volume_cap=0.25)
+    orders = [(600000, 550), (600002, 550), (123456, 550), (600003, -550), (600001, 550)]
+    filled, _, reasons = _simulate(simulator, market, orders, DAYS[1], held=[0, 0, 0, 1000, 0])
+    assert reasons == [LIMIT_UP, SUSPENDED, UNKNOWN, LIMIT_DOWN, LIMIT_UP]
+    assert filled == [0, 0, 0, 0, 0]
+    filled, _, reasons = _simulate(simulator, market, [(300001, 550)], DAYS[1])
+    assert (filled, reasons) == ([200], [VOLUME])
+
+
+def test_load_volume_matrix(market, tmp_path):
+    path = str(tmp_path / 'stock_data.parquet')
+    pd.DataFrame({
+        'code': [600000, 600003, 999999, 600000],
+        'day': [20240102, 20240104, 20240102, 20231229],  # 未知股票和不在交易日表中的交易日被忽略
+        'volume': [500, 800, 100, 100],
+    }).to_parquet(path, index=False)
+    volume = load_volume_matrix(market, path)
+    expected = np.zeros(market.open_matrix.shape)
+    expected[0, market.code_index[600000]] = 500
+    expected[2, market.code_index[600003]] = 800
+    np.testing.assert_array_equal(volume, expected)
+
+
+def test_agent_records_rejections(market):
+    agent = Agent(None, fetcher=market)
+    agent.set_position({600003: {'amount': 100}})
+    agent.fill_simulator = FillSimulator(market, st=ST)
+    money = agent.execute({600003: -100, 600000: 100, 300001: 150, 600002: 100}, DAYS[1], 1_000_000)
+    assert agent.fills['code'].tolist() == [300001]
+    assert agent.fills['amount'].tolist() == [100]
+    assert dict(zip(agent.rejections['code'].tolist(), zip(agent.rejections['amount'].tolist(),
+                                                            agent.rejections['reason'].tolist()))) == {
+        600003: (-100, REJECT_REASONS[LIMIT_DOWN]),
+        600000: (100, REJECT_REASONS[LIMIT_UP]),
+        300001: (50, REJECT_REASONS[LOT]),
+        600002: (100, REJECT_REASONS[SUSPENDED]),
+    }
+    assert money == pytest.approx(1_000_000 - 100 * 11.0 - 5 - 100 * 11.0 * agent.guohufei)
+    assert agent.cur_position[600003]['amount'] == 100
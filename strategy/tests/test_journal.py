@@ -0,0 +1,138 @@
+import os
+
+import numpy as np
+import pyarrow.parquet as pq
+
+from app import APP
+from utils.journal import Journal, read_journal, truncate_journal, export_position_csv
+
+DAYS = ['20240102', '20240103', '20240104', '20240105', '20240108']
+
+
+def _record(journal, day, codes, amounts):
+    codes = np.asarray(codes, dtype=np.int64)
+    positions = {
+        'code': codes,
+        'amount': np.asarray(amounts, dtype=np.int64),
+        'open': codes / 1e5,
+        'close': codes / 1e5 + 0.5,
+    }
+    fills = {
+        'code': codes[:1],
+        'amount': np.asarray(amounts[:1], dtype=np.int64),
+        'price': codes[:1] / 1e5,
+        'cost': codes[:1] / 1e3,
+        'fee': np.full(min(len(codes), 1), 5.0),
+    }
+    journal.record(day, positions, fills)
+
+
+def _parts(dirname, table='positions'):
+    return sorted(os.listdir(os.path.join(dirname, table)))
+
+
+def test_close_flushes_buffered_days(tmp_path):
+    dirname = str(tmp_path / 'journal')
+    journal = Journal(dirname, chunk_days=2)
+    for day in DAYS:
+        _record(journal, day, [600001, 300001], [200, 100])
+    # 最后一天还在缓冲区中，close 时写入
+    journal.close()
+    df = read_journal(dirname)
+    assert df['day'].tolist() == [day for day in DAYS for _ in range(2)]
+    path = os.path.join(dirname, 'positions', f'part-{DAYS[0]}.parquet')
+    assert pq.ParquetFile(path).num_row_groups == 3
+    assert read_journal(dirname, 'fills')['code'].tolist() == [600001] * len(DAYS)
+
+
+def test_context_manager_and_record_order(tmp_path):
+    dirname = str(tmp_path / 'journal')
+    with Journal(dirname) as journal:
+        _record(journal, DAYS[0], [600001, 300001, 1], [200, 100, 300])
+        _record(journal, DAYS[1], [], [])
+        _record(journal, DAYS[2], [1, 600001], [300, 200])
+    df = read_journal(dirname)
+    # 同一天内保持记录的顺序（持仓的建仓顺序）
+    assert list(zip(df['day'], df['code'])) == [(DAYS[0], 600001), (DAYS[0], 300001), (DAYS[0], 1),
+                                                (DAYS[2], 1), (DAYS[2], 600001)]
+    assert df['close'].tolist() == (df['code'] / 1e5 + 0.5).tolist()
+
+
+def test_append_and_truncate(tmp_path):
+    dirname = str(tmp_path / 'journal')
+    with Journal(dirname) as journal:
+        for day in DAYS[:2]:
+            _record(journal, day, [600001], [100])
+    with Journal(dirname, append=True) as journal:
+        for day in DAYS[2:4]:
+            _record(journal, day, [600001], [200])
+    with Journal(dirname, append=True) as journal:
+        _record(journal, DAYS[4], [600001], [300])
+    assert _parts(dirname) == [f'part-{day}.parquet' for day in (DAYS[0], DAYS[2], DAYS[4])]
+    assert read_journal(dirname)['amount'].tolist() == [100, 100, 200, 200, 300]
+
+    # 丢弃起始日期晚于 DAYS[2] 的文件，起始日期为 DAYS[2] 的文件保留
+    truncate_journal(dirname, DAYS[2])
+    for table in ('positions', 'fills'):
+        assert _parts(dirname, table) == [f'part-{day}.parquet' for day in DAYS[:3:2]]
+    assert read_journal(dirname)['day'].tolist() == DAYS[:4]
+
+    # append=False 清空已有日志
+    with Journal(dirname) as journal:
+        _record(journal, DAYS[4], [1], [1])
+    assert _parts(dirname) == [f'part-{DAYS[4]}.parquet']
+
+
+def test_read_filters(tmp_path):
+    dirname = str(tmp_path / 'journal')
+    with Journal(dirname, chunk_days=2) as journal:
+        for day in DAYS:
+            _record(journal, day, [1, 300001, 600001], [100, 200, 300])
+    df = read_journal(dirname, start_day=DAYS[1], end_day=DAYS[3], codes=[600001, 1])
+    assert list(zip(df['day'], df['code'])) == [(day, code) for day in DAYS[1:4] for code in (1, 600001)]
+    df = read_journal(dirname, 'fills', codes=(2, 700000))
+    assert df.empty
+    df = read_journal(dirname, codes=(2, 700000))
+    assert df['code'].tolist() == [300001, 600001] * len(DAYS)
+
+
+def _write_old_position_csv(app, start_money, out_dir):
+    """原 backtest 的逐笔执行和每日持仓文件写法，作为导出格式的参考"""
+    os.makedirs(out_dir, exist_ok=True)
+    money_left = start_money
+    strategy = {}
+    for day in app.fetcher.date_list:
+        for code, amount in strategy.items():
+            if amount < 0:
+                money_left = app.agent.transaction(code, day, amount, money_left)
+        for code, amount in strategy.items():
+            if amount > 0:
+                money_left = app.agent.transaction(code, day, amount, money_left)
+        capital = 0
+        with open(os.path.join(out_dir, f'{day}.csv'), 'w') as f:
+            txt = '股票代码,当前仓位,开盘价,收盘价,市值\n'
+            for code in app.agent.cur_position:
+                amount = app.agent.cur_position[code]['amount']
+                open_ = app.fetcher.get_open_by_code(code, day)
+                close = app.fetcher.get_close_by_code(code, day)
+                capital += amount * close
+                txt += f'{code},{amount},{round(open_, 2)},{round(close, 2)},{round(amount * open_)}\n'
+            f.write(txt)
+        codes, amounts = app.get_strategy(day, money_left, money_left + capital)
+        strategy = dict(zip(codes.tolist(), amounts.tolist()))
+
+
+def test_export_matches_old_position_csv(fetcher, workdir):
+    APP(None, 'random', fetcher=fetcher).set_strategy('random', seed=3).backtest(
+        start_money=1000_0000, export_csv=True, show_plot=False, plot=False)
+    _write_old_position_csv(APP(None, 'random', fetcher=fetcher).set_strategy('random', seed=3), 1000_0000, 'old')
+    assert sorted(os.listdir('result/position')) == sorted(os.listdir('old')) == [f'{d}.csv' for d in fetcher.date_list]
+    for name in os.listdir('old'):
+        with open(os.path.join('result/position', name)) as f, open(os.path.join('old', name)) as g:
+            assert f.read() == g.read(), name
+
+    # 只导出部分日期；不给出 day_list 时只导出有持仓的交易日
+    export_position_csv('result/journal', 'part', start_day=fetcher.date_list[10], end_day=fetcher.date_list[12])
+    assert sorted(os.listdir('part')) == [f'{d}.csv' for d in fetcher.date_list[10:13]]
+    export_position_csv('result/journal', 'held')
+    assert f'{fetcher.date_list[0]}.csv' not in os.listdir('held')
@@ -0,0 +1,69 @@
+import importlib.util
+import os
+import shutil
+import sys
+
+import pytest
+
+from utils import result_cache
+from utils.result_cache import ResultCache, get_source_hashes
+from strategy_zoo.strategy_v2 import StrategyV2
+
+
+def test_key_covers_base_classes_and_engine():
+    hashes = get_source_hashes(StrategyV2())
+    for path in ('strategy_zoo/strategy_v2.py', 'strategy_zoo/base.py', 'utils/transaction.py',
+                 'utils/portfolio.py', 'utils/fetcher.py', 'app.py'):
+        assert path in hashes
+
+
+def _load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_key_changes_when_base_class_changes(fetcher, tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, 'ROOT', str(tmp_path))
+    base_path = tmp_path / 'cache_test_base.py'
+    base_path.write_text('from strategy_zoo.base import RankThresholdStrategy\n'
+                         'class Base(RankThresholdStrategy):\n    pass\n')
+    child_path = tmp_path / 'cache_test_child.py'
+    child_path.write_text('from cache_test_base import Base\nclass Child(Base):\n    pass\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    _load_module('cache_test_base', base_path)
+    child = _load_module('cache_test_child', child_path).Child()
+
+    cache = ResultCache(str(tmp_path / 'results'))
+    key = cache.make_key(fetcher, child, {'start_money': 1})
+    assert cache.make_key(fetcher, child, {'start_money': 1}) == key
+    base_path.write_text(base_path.read_text() + '# 修改基类所在文件\n')
+    assert cache.make_key(fetcher, child, {'start_money': 1}) != key
+    monkeypatch.delitem(sys.modules, 'cache_test_base')
+    monkeypatch.delitem(sys.modules, 'cache_test_child')
+
+
+def test_engine_files_cover_backtest_modules():
+    for path in result_cache.ENGINE_FILES:
+        assert os.path.exists(os.path.join(result_cache.ROOT, path)), path
+    for path in ('utils/analytics.py', 'utils/journal.py', 'utils/data_cache.py'):
+        assert path in result_cache.ENGINE_FILES
+
+
+@pytest.mark.parametrize('path', ['utils/analytics.py', 'utils/journal.py', 'utils/transaction.py'])
+def test_key_changes_when_engine_file_changes(fetcher, tmp_path, monkeypatch, path):
+    # 在 ROOT 的副本中修改一个引擎源文件
+    root = tmp_path / 'root'
+    for name in result_cache.ENGINE_FILES:
+        os.makedirs(root / os.path.dirname(name), exist_ok=True)
+        shutil.copy(os.path.join(result_cache.ROOT, name), root / name)
+    monkeypatch.setattr(result_cache, 'ROOT', str(root))
+    cache = ResultCache(str(tmp_path / 'results'))
+    strategy = StrategyV2()
+    key = cache.make_key(fetcher, strategy, {'start_money': 1})
+    assert cache.make_key(fetcher, strategy, {'start_money': 1}) == key
+    with open(root / path, 'a') as f:
+        f.write('# 修改引擎源文件\n')
+    assert cache.make_key(fetcher, strategy, {'start_money': 1}) != key
@@ -0,0 +1,67 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from app import APP
+from service import SignalService, make_server
+from strategy_zoo.strategy_v2 import StrategyV2
+
+
+class StrategyWithFeatures(StrategyV2):
+    def __init__(self):
+        super().__init__()
+        self.features = {'ma5': {'kind': 'mean', 'column': 'close', 'window': 5}}
+
+    def get_orders(self, market):
+        assert len(market.features['ma5']) == len(market.codes)
+        return super().get_orders(market)
+
+
+@pytest.fixture
+def service(fetcher):
+    return SignalService(fetcher)
+
+
+@pytest.fixture
+def server(service):
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _post(server, path, data):
+    conn = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=10)
+    conn.request('POST', path, body=data, headers={'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def test_unknown_param_returns_400(service):
+    status, result = service.handle('POST', '/orders', {'strategy': 'v2', 'params': {'no_such_param': 1}})
+    assert status == 400
+    assert 'AttributeError' in result['error']
+
+
+def test_malformed_body_returns_400(server):
+    assert _post(server, '/orders', b'{"strategy": ')[0] == 400
+    assert _post(server, '/orders', b'[1, 2]')[0] == 400
+    status, result = _post(server, '/orders', json.dumps({'strategy': 'v2', 'money_left': 1000_0000}).encode())
+    assert status == 200
+    assert result['orders']
+
+
+def test_orders_reuse_features(service, monkeypatch):
+    monkeypatch.setitem(APP.STRATEGY_MAP, 'features', StrategyWithFeatures)
+    body = {'strategy': 'features', 'money_left': 1000_0000}
+    first = service.orders(body)
+    store = service._strategies[('features', '{}')][2]
+    assert 'ma5' in store.matrices
+    assert service.orders(body) == first
+    assert service._strategies[('features', '{}')][2] is store
+    service.orders({**body, 'params': {'top_buy_count': 10}})
+    assert service._strategies[('features', '{"top_buy_count": 10}')][2] is not store
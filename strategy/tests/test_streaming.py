@@ -0,0 +1,87 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import APP
+from utils import fetcher as fetcher_module
+from utils.fetcher import Fetcher
+from utils.streaming import StreamingFetcher
+from strategy_zoo.strategy_v2 import StrategyV2
+
+
+class StrategyWithFeatures(StrategyV2):
+    def __init__(self):
+        super().__init__()
+        self.features = {'ma5': {'kind': 'mean', 'column': 'close', 'window': 5}}
+
+
+@pytest.fixture(scope='module')
+def streaming(dataset):
+    return StreamingFetcher(dataset, chunk_days=16)
+
+
+def test_backtest_matches_fetcher(fetcher, streaming):
+    expected = APP(None, 'v2', fetcher=fetcher).backtest(start_money=1000_0000, save_result=False)
+    result = APP(None, 'v2', fetcher=streaming).backtest(start_money=1000_0000, save_result=False)
+    assert result['total_money_list'] == expected['total_money_list']
+
+
+def test_dense_only_features_raise(streaming, monkeypatch):
+    app = APP(None, 'v2', fetcher=streaming)
+    assert not app.supports_fast_backtest()
+    with pytest.raises(NotImplementedError, match='成交模拟'):
+        app.set_fill_simulator()
+    with pytest.raises(NotImplementedError, match='成交模拟'):
+        app.set_fill_simulator(volume_cap=0.1)
+    with pytest.raises(NotImplementedError, match='快速回测'):
+        app.fast_backtest(start_money=1000_0000)
+    monkeypatch.setitem(APP.STRATEGY_MAP, 'features', StrategyWithFeatures)
+    with pytest.raises(NotImplementedError, match='滚动特征'):
+        app.set_strategy('features')
+
+
+def _rewrite_stock_data(tmp_path, monkeypatch, day_type, sort_by_code):
+    """将模拟行情数据改写为指定交易日类型（和按股票排序、每个 row group 很小）的 parquet，并指向它"""
+    stock = pd.read_parquet(fetcher_module.stock_data_path)
+    days = pd.to_datetime(stock['day'].astype(str))
+    if day_type == 'str':
+        stock['day'] = days.dt.strftime('%Y-%m-%d')
+    elif day_type == 'date':
+        stock['day'] = days.dt.date
+    if sort_by_code:
+        stock = stock.sort_values(['code', 'day'], kind='stable')
+    path = str(tmp_path / 'stock_data.parquet')
+    stock.to_parquet(path, index=False, row_group_size=500 if sort_by_code else 100_000)
+    monkeypatch.setattr(fetcher_module, 'stock_data_path', path)
+    return path
+
+
+@pytest.mark.parametrize('day_type, sort_by_code', [('str', False), ('date', False), ('int', True), ('str', True)])
+def test_stock_data_layouts(dataset, tmp_path, monkeypatch, day_type, sort_by_code):
+    path = _rewrite_stock_data(tmp_path, monkeypatch, day_type, sort_by_code)
+    expected = APP(None, 'v2', fetcher=Fetcher(dataset, use_cache=False)).backtest(
+        start_money=1000_0000, save_result=False)
+    streaming = StreamingFetcher(dataset, chunk_days=16, spill_dir=str(tmp_path))
+    result = APP(None, 'v2', fetcher=streaming).backtest(start_money=1000_0000, save_result=False)
+    assert result['total_money_list'] == expected['total_money_list']
+
+    stock_path, groups = streaming._stock_source
+    if sort_by_code:
+        # 按股票排序时转存为按批划分的临时文件，每个 row group 只属于一批交易日
+        assert stock_path != path
+        starts = np.array(streaming.date_list[::streaming.chunk_days], dtype=np.int64)
+        batch = np.searchsorted(starts, groups[:, 1:], side='right') - 1
+        np.testing.assert_array_equal(batch[:, 0], batch[:, 1])
+    else:
+        assert stock_path == path
+
+
+def test_spill_files_removed(dataset, tmp_path, monkeypatch):
+    _rewrite_stock_data(tmp_path, monkeypatch, 'int', True)
+    streaming = StreamingFetcher(dataset, chunk_days=16, spill_dir=str(tmp_path))
+    spill_paths = list(streaming._spill_paths)
+    assert len(spill_paths) == 2 and all(os.path.exists(p) for p in spill_paths)
+    del streaming
+    assert not any(os.path.exists(p) for p in spill_paths)
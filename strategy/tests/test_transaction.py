@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from app import APP
+from strategy_zoo.strategy_v2 import StrategyV2
+
+
+class StrategyWithZeroOrders(StrategyV2):
+    """在 StrategyV2 的订单之外，对其余持仓股票下数量为 0 的订单"""
+
+    def get_orders(self, market):
+        codes, amounts = super().get_orders(market)
+        zero = market.held_codes[~np.isin(market.held_codes, codes)]
+        return np.concatenate((codes, zero)), np.concatenate((amounts, np.zeros(len(zero), dtype=np.int64)))
+
+
+def run_per_order(app, start_money):
+    """逐笔调用 Agent.transaction 执行订单、按持仓顺序逐只累加市值的参考回测"""
+    money_left = start_money
+    strategy = {}
+    total_money_list = []
+    for day in app.fetcher.date_list:
+        for code, amount in strategy.items():
+            if amount <= 0:  # 数量为 0 的订单也逐笔调用 transaction
+                money_left = app.agent.transaction(code, day, amount, money_left)
+        for code, amount in strategy.items():
+            if amount > 0:
+                money_left = app.agent.transaction(code, day, amount, money_left)
+        capital = 0
+        for code, position in app.agent.cur_position.items():
+            capital += position['amount'] * app.fetcher.get_close_by_code(code, day)
+        total_money = money_left + capital
+        total_money_list.append(total_money)
+        codes, amounts = app.get_strategy(day, money_left, total_money)
+        strategy = dict(zip(codes.tolist(), amounts.tolist()))
+    return total_money_list
+
+
+@pytest.mark.parametrize('strategy_name, params', [
+    ('v1', {}),
+    ('v2', {}),
+    ('vx1', {}),
+    ('random', {'seed': 7}),
+    ('zero', {}),
+])
+def test_execute_matches_per_order_path(fetcher, monkeypatch, strategy_name, params):
+    monkeypatch.setitem(APP.STRATEGY_MAP, 'zero', StrategyWithZeroOrders)
+    batch = APP(None, strategy_name, fetcher=fetcher).set_strategy(strategy_name, **params)
+    result = batch.backtest(start_money=1000_0000, save_result=False)
+
+    reference = APP(None, strategy_name, fetcher=fetcher).set_strategy(strategy_name, **params)
+    total_money_list = run_per_order(reference, 1000_0000)
+
+    assert result['total_money_list'] == total_money_list
+    # 持仓数量及持仓顺序都相同
+    assert list(batch.agent.cur_position.items()) == list(reference.agent.cur_position.items())
+
+
+def test_held_order_follows_fills(fetcher):
+    app = APP(None, fetcher=fetcher)
+    day = fetcher.date_list[1]
+    a, b, c = fetcher.codes[[5, 1, 3]].tolist()
+    money = app.agent.execute({a: 100, b: 200, c: 300}, day, 1000_0000)
+    money = app.agent.execute({b: -200, a: 100}, day, money)
+    app.agent.execute({b: 100}, day, money)
+    assert list(app.agent.cur_position) == [a, c, b]
+    assert app.agent.cur_position[a] == {'amount': 200}
+
+
+def test_zero_amount_orders_are_ignored(fetcher):
+    app = APP(None, fetcher=fetcher)
+    day = fetcher.date_list[1]
+    a, b = fetcher.codes[[5, 1]].tolist()
+    money = app.agent.execute({a: 100}, day, 1000_0000)
+    assert app.agent.execute({a: 0, b: 0}, day, money) == money
+    assert len(app.agent.fills['code']) == len(app.agent.rejections['code']) == 0
+    for code in (a, b):
+        assert app.agent.transaction(code, day, 0, money) == money
+    assert app.agent.cur_position == {a: {'amount': 100}}
@@ -0,0 +1,166 @@
+import numpy as np
+from datetime import datetime
+import csv
+import json
+import os
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+def drawdown_stats(equity):
+    """
+    计算最大回撤及其发生时间段和修复时间，单次线性扫描
+
+    :param equity: 权益曲线，形状为 (n_days,) 或 (n_curves, n_days)
+    :return: dict，包含 max_drawdown（比例）、peak_index、trough_index、recovery_index（未修复为 -1），
+             输入为一维时各项为标量，二维时为长度 n_curves 的数组
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    curves = np.atleast_2d(equity)
+    n_days = curves.shape[1]
+    rows = np.arange(curves.shape[0])
+    steps = np.arange(n_days)
+
+    running_max = np.maximum.accumulate(curves, axis=1)
+    drawdown = (running_max - curves) / running_max
+    trough = np.argmax(drawdown, axis=1)
+    max_drawdown = drawdown[rows, trough]
+    # 回撤起点为最低点之前第一次达到该最高点的位置
+    peak_value = running_max[rows, trough]
+    peak = np.argmax((curves == peak_value[:, None]) & (steps <= trough[:, None]), axis=1)
+    # 修复时间为最低点之后第一次回到起点权益的位置
+    recovered = (curves >= peak_value[:, None]) & (steps > trough[:, None])
+    recovery = np.where(recovered.any(axis=1), np.argmax(recovered, axis=1), -1)
+    recovery[max_drawdown <= 0] = -1
+
+    result = {
+        'max_drawdown': max_drawdown,
+        'peak_index': peak,
+        'trough_index': trough,
+        'recovery_index': recovery,
+    }
+    if equity.ndim == 1:
+        result = {k: v[0].item() for k, v in result.items()}
+    return result
+
+
+def compute_metrics(equity, day_list, traded_value=None, risk_free=0.0):
+    """
+    计算回测绩效指标
+
+    :param equity: 权益曲线，形状为 (n_days,) 或 (n_curves, n_days)
+    :param day_list: 与权益曲线对齐的日期列表，格式为 'YYYYMMDD'
+    :param traded_value: 每日成交金额，形状与 equity 相同，用于计算换手率，可选
+    :param risk_free: 年化无风险利率，用于计算夏普比率和索提诺比率
+    :return: dict，输入为一维时各项为标量，二维时为长度 n_curves 的数组
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    curves = np.atleast_2d(equity)
+    total_days = (datetime.strptime(day_list[-1], '%Y%m%d') - datetime.strptime(day_list[0], '%Y%m%d')).days
+
+    ratio = curves[:, -1] / curves[:, 0]
+    total_return = ratio - 1
+    annual_return = ratio ** (365 / total_days) - 1 if total_days > 0 else np.full(len(curves), np.nan)
+
+    returns = curves[:, 1:] / curves[:, :-1] - 1
+    excess = returns - risk_free / TRADING_DAYS_PER_YEAR
+    nan = np.full(len(curves), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # 只有一天时没有日收益率，相关指标为 NaN
+        daily_std = returns.std(axis=1, ddof=1) if returns.shape[1] > 1 else nan
+        downside = np.sqrt(np.mean(np.minimum(excess, 0) ** 2, axis=1)) if returns.shape[1] else nan
+        mean_excess = excess.mean(axis=1) if returns.shape[1] else nan
+        sharpe = mean_excess / daily_std * np.sqrt(TRADING_DAYS_PER_YEAR)
+        sortino = mean_excess / downside * np.sqrt(TRADING_DAYS_PER_YEAR)
+        win_rate = (returns > 0).mean(axis=1) if returns.shape[1] else nan
+
+        dd = drawdown_stats(curves)
+        calmar = annual_return / dd['max_drawdown']
+        if traded_value is not None:
+            turnover = (np.atleast_2d(np.asarray(traded_value, dtype=np.float64)) / curves).mean(axis=1)
+        else:
+            turnover = np.full(len(curves), np.nan)
+
+    day_array = np.asarray(day_list)
+    result = {
+        'start_date': np.full(len(curves), day_list[0]),
+        'end_date': np.full(len(curves), day_list[-1]),
+        'total_return': total_return,
+        'annual_return': annual_return,
+        'volatility': daily_std * np.sqrt(TRADING_DAYS_PER_YEAR),
+        'sharpe': sharpe,
+        'sortino': sortino,
+        'max_drawdown': dd['max_drawdown'],
+        'calmar': calmar,
+        'max_drawdown_start': day_array[dd['peak_index']],
+        'max_drawdown_end': day_array[dd['trough_index']],
+        'recovery_date': np.where(dd['recovery_index'] >= 0, day_array[dd['recovery_index']], ''),
+        'turnover': turnover,
+        'win_rate': win_rate,
+    }
+    if equity.ndim == 1:
+        result = {k: v[0].item() for k, v in result.items()}
+    return result
+
+
+def format_report(metrics):
+    """将单条权益曲线的绩效指标格式化为文本报告"""
+    txt = f"回测时间段: {metrics['start_date']} 至 {metrics['end_date']}\n"
+    txt += f"总收益率: {metrics['total_return'] * 100:.2f}%\n"
+    txt += f"年化收益率: {metrics['annual_return'] * 100:.2f}%\n"
+    txt += f"最大回撤: {metrics['max_drawdown'] * 100:.2f}%\n"
+    txt += f"最大回撤发生时间段: {metrics['max_drawdown_start']} 至 {metrics['max_drawdown_end']}\n"
+    txt += f"修复时段: {metrics['max_drawdown_end']} 至 {metrics['recovery_date'] or '未修复'}\n"
+    txt += f"年化波动率: {metrics['volatility'] * 100:.2f}%\n"
+    txt += f"夏普比率: {metrics['sharpe']:.2f}\n"
+    txt += f"索提诺比率: {metrics['sortino']:.2f}\n"
+    txt += f"卡玛比率: {metrics['calmar']:.2f}\n"
+    txt += f"日均换手率: {metrics['turnover'] * 100:.2f}%\n"
+    txt += f"日胜率: {metrics['win_rate'] * 100:.2f}%\n"
+    return txt
+
+
+def _make_parent_dir(path):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+
+def save_report(txt, path):
+    """保存 format_report 生成的文本报告"""
+    _make_parent_dir(path)
+    with open(path, 'w') as f:
+        f.write(txt)
+
+
+def save_metrics(metrics, path):
+    """将绩效指标保存为 JSON 文件，批量结果中的数组保存为列表"""
+    data = {k: v.tolist() if isinstance(v, np.ndarray) else v for k, v in metrics.items()}
+    _make_parent_dir(path)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, allow_nan=True)
+
+
+def save_equity(path, day_list, total_money_list, traded_value_list=None):
+    """将每日总权益（及成交金额）保存为 CSV 文件，供 analyze/plot 子命令使用"""
+    _make_parent_dir(path)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['day', 'total_money', 'traded_value'])
+        if traded_value_list is None:
+            traded_value_list = [''] * len(day_list)
+        writer.writerows(zip(day_list, total_money_list, traded_value_list))
+
+
+def load_equity(path):
+    """
+    读取 save_equity 保存的文件
+
+    :return: (day_list, total_money_list, traded_value_list)，没有成交金额时 traded_value_list 为 None
+    """
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    day_list = [row['day'] for row in rows]
+    total_money_list = [float(row['total_money']) for row in rows]
+    traded = [row.get('traded_value') for row in rows]
+    traded_value_list = [float(v) for v in traded] if rows and all(traded) else None
+    return day_list, total_money_list, traded_value_list
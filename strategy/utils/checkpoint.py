@@ -0,0 +1,64 @@
+import os
+import pickle
+import random
+import numpy as np
+
+# 检查点格式版本，格式变化时递增
+VERSION = 1
+
+
+def save_checkpoint(dirname, state, keep=3):
+    """
+    保存检查点到 {dirname}/{state['day']}.pkl，先写临时文件再替换，中途崩溃不会留下不完整的检查点
+
+    :param state: 回测状态 dict，必须包含 day
+    :param keep: 保留最近的检查点个数
+    """
+    os.makedirs(dirname, exist_ok=True)
+    state = {
+        'version': VERSION,
+        'random_state': random.getstate(),
+        'np_random_state': np.random.get_state(),
+        **state,
+    }
+    path = os.path.join(dirname, f'{state["day"]}.pkl')
+    with open(path + '.tmp', 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + '.tmp', path)
+    for day in list_checkpoints(dirname)[:-keep]:
+        os.remove(os.path.join(dirname, f'{day}.pkl'))
+    return path
+
+
+def list_checkpoints(dirname):
+    """按日期升序返回已有检查点的日期"""
+    if not os.path.isdir(dirname):
+        return []
+    return sorted(name[:-4] for name in os.listdir(dirname) if name.endswith('.pkl'))
+
+
+def clear_checkpoints(dirname):
+    """删除全部检查点"""
+    for day in list_checkpoints(dirname):
+        os.remove(os.path.join(dirname, f'{day}.pkl'))
+
+
+def load_checkpoint(dirname, day=None):
+    """
+    读取检查点并恢复全局随机状态
+
+    :param day: 检查点日期，默认为最新的检查点
+    :return: 回测状态 dict，没有检查点时返回 None
+    """
+    if day is None:
+        days = list_checkpoints(dirname)
+        if not days:
+            return None
+        day = days[-1]
+    with open(os.path.join(dirname, f'{day}.pkl'), 'rb') as f:
+        state = pickle.load(f)
+    if state.get('version') != VERSION:
+        raise ValueError(f'检查点 {day} 的格式版本为 {state.get("version")}，当前版本为 {VERSION}')
+    random.setstate(state['random_state'])
+    np.random.set_state(state['np_random_state'])
+    return state
@@ -0,0 +1,77 @@
+import numpy as np
+import hashlib
+import json
+import os
+import shutil
+
+
+def get_file_fingerprint(paths):
+    """数据源文件的 (路径, 大小, 修改时间) 列表"""
+    result = []
+    for p in paths:
+        p = os.path.abspath(p)
+        stat = os.stat(p)
+        result.append([p, stat.st_size, stat.st_mtime_ns])
+    return result
+
+
+class DataCache:
+    """
+    合并后数据集的磁盘缓存。
+
+    每个数组保存为一个 .npy 文件，读取时以内存映射方式打开，无需完整反序列化。
+    缓存目录由数据源文件的绝对路径决定，meta.json 中记录数据源文件的大小和修改时间，
+    数据源变化后缓存视为过期，由调用方重新构建。
+    """
+    version = 1
+
+    def __init__(self, cache_dir, source_paths, extra=None):
+        """
+        :param cache_dir: 缓存根目录
+        :param source_paths: 数据源文件路径列表
+        :param extra: 其他影响缓存内容的参数，需可 JSON 序列化
+        """
+        self.source_paths = [os.path.abspath(p) for p in source_paths]
+        key = json.dumps([self.version, self.source_paths, extra], sort_keys=True)
+        self.path = os.path.join(cache_dir, hashlib.sha1(key.encode()).hexdigest()[:16])
+        # 构建缓存前记录数据源状态，构建期间数据源发生变化时缓存会在下次读取时失效
+        self.fingerprint = self._get_fingerprint()
+
+    def _get_fingerprint(self):
+        return get_file_fingerprint(self.source_paths)
+
+    def load(self):
+        """
+        读取缓存
+
+        :return: 数组字典，缓存不存在或已过期时返回 None
+        """
+        meta_path = os.path.join(self.path, 'meta.json')
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('fingerprint') != self.fingerprint:
+            return None
+        try:
+            return {name: np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+                    for name in meta['arrays']}
+        except (OSError, ValueError):
+            return None
+
+    def save(self, arrays):
+        """
+        写入缓存，先写入临时目录再整体替换，避免读到写了一半的缓存
+
+        :param arrays: 数组字典
+        """
+        tmp_path = f'{self.path}.tmp{os.getpid()}'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_path, f'{name}.npy'), np.ascontiguousarray(array))
+        with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'fingerprint': self.fingerprint, 'arrays': list(arrays)}, f)
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(tmp_path, self.path)
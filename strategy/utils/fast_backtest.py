@@ -0,0 +1,85 @@
+import numpy as np
+
+
+def get_top_matrix(fetcher, k, lo=0, hi=None):
+    """
+    每个交易日预测排名前 k 的股票序号
+
+    :return: (hi - lo, k) 的数组，当天股票不足 k 只时末尾为 -1
+    """
+    fetcher.build_rank_table()
+    hi = len(fetcher.date_list) if hi is None else hi
+    offsets = fetcher.day_offsets
+    starts = offsets[lo:hi]
+    counts = offsets[lo + 1:hi + 1] - starts
+    valid = np.arange(k) < counts[:, None]
+    rows = starts[:, None] + np.arange(k)
+    rows = np.where(valid, rows, 0)
+    if len(fetcher.day_order):
+        ords = fetcher.row_code[starts[:, None] + fetcher.day_order[rows]]
+    else:
+        ords = np.zeros(rows.shape, dtype=np.int32)
+    return np.where(valid, ords, -1)
+
+
+def run_fast_backtest(fetcher, agent, strategy, start_money=15_0000, start_day=None, end_day=None):
+    """
+    排名阈值类策略（strategy_zoo.base.RankThresholdStrategy）的快速回测。
+
+    卖出信号（排名矩阵与阈值比较）和每天的买入候选（排名前 k 的股票序号）对全部历史一次计算为 (交易日, 股票) 矩阵，
+    价格直接取自 Fetcher 的开盘价/收盘价矩阵。由于买入数量取决于当天的剩余资金，交易日之间仍需按顺序推进，
+    但每天只对持仓和前 k 只股票做数组运算，不再构建 DataFrame 切片、MarketView 和订单 dict。
+    成交、费用和估值的计算与 APP.backtest（不使用成交模拟时）逐步相同，结果完全一致。
+
+    :param fetcher: Fetcher
+    :param agent: Agent，使用其持仓和费率，回测结束后持仓为最终持仓
+    :param strategy: RankThresholdStrategy
+    :return: dict，包含 day_list、total_money_list、traded_value_list
+    """
+    fetcher.require_dense('快速回测')
+    if agent.fill_simulator is not None:
+        raise ValueError('快速回测不支持成交模拟')
+    lo, hi = fetcher.get_day_range(start_day, end_day)
+    sell_signal = fetcher.build_rank_table().rank_matrix[lo:hi] >= strategy.get_sell_rank()
+    top = get_top_matrix(fetcher, strategy.get_buy_count(), lo, hi)
+
+    portfolio = agent.portfolio
+    money_left = start_money
+    ords = amounts = np.zeros(0, dtype=np.int64)  # 待执行的订单
+    total_money_list = []
+    traded_value_list = []
+    for i, d in enumerate(range(lo, hi)):
+        # 执行昨天的订单，先卖出后买入，与 Agent.execute 相同
+        prices = fetcher.ffill_open[d, ords]
+        costs, _ = agent._cal_costs(prices, amounts)
+        held = portfolio.amount[ords]
+        sell = np.flatnonzero((amounts < 0) & (held > 0) & (held + amounts >= 0) & ~np.isnan(costs))
+        money_left = np.cumsum(np.concatenate(([money_left], -costs[sell])))[-1].item()
+        portfolio.apply(ords[sell], amounts[sell], prices[sell])
+        buy = np.flatnonzero(amounts > 0)
+        accepted, money_left = agent._accept_buys(money_left, costs[buy])
+        buy = buy[accepted]
+        portfolio.apply(ords[buy], amounts[buy], prices[buy])
+        traded_value_list.append(float(np.abs(costs[np.concatenate((sell, buy))]).sum()))
+
+        # 计算总权益
+        held = portfolio.held()
+        total_money = money_left + portfolio.value(fetcher.ffill_close[d, held], held)
+        total_money_list.append(total_money)
+
+        # 生成订单，与 RankThresholdStrategy.get_orders 相同
+        sell = held[(portfolio.amount[held] > 0) & sell_signal[i, held]]
+        sell_amount = portfolio.amount[sell]
+        close = fetcher.close_matrix[d]
+        money = np.cumsum(np.concatenate(([money_left], sell_amount * close[sell])))[-1].item()
+        candidates = top[i][top[i] >= 0]
+        candidates = candidates[portfolio.amount[candidates] == 0]
+        picked, buy_amount = strategy.size_buys(money, close[candidates])
+        ords = np.concatenate((sell, candidates[np.array(picked, dtype=np.int64)]))
+        amounts = np.concatenate((-sell_amount, np.array(buy_amount, dtype=np.int64)))
+
+    return {
+        'day_list': fetcher.date_list[lo:hi],
+        'total_money_list': total_money_list,
+        'traded_value_list': traded_value_list,
+    }
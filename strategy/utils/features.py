@@ -0,0 +1,269 @@
+import numpy as np
+
+# 滚动求和的累计和每隔 ROLLING_BLOCK 个交易日（按交易日序号的绝对位置）重新开始：
+# 误差不随历史长度累积，且追加交易日时从所在的块开始计算即可得到与一次计算全部历史相同的结果
+ROLLING_BLOCK = 256
+# 平方和超过与均值之差的平方和的 STD_CANCELLATION 倍时，feature_std 改为直接计算
+STD_CANCELLATION = 1e3
+
+
+def _block_size(window):
+    return max(ROLLING_BLOCK, window)
+
+
+def _runs(n, window, offset):
+    """
+    累计和的分段：第 0 行及绝对位置 offset + 行号为分段长度整数倍的行开始新的一段
+
+    :return: (每段的起始行, 每行所在段的序号)
+    """
+    block = _block_size(window)
+    starts = np.arange((-offset) % block, n, block)
+    if n and (not len(starts) or starts[0]):
+        starts = np.concatenate(([0], starts))
+    return starts, np.searchsorted(starts, np.arange(n), side='right') - 1
+
+
+def _rolling_parts(values, window, starts, run):
+    """
+    对分段累计和做差分得到滚动和。窗口不超过分段长度，最多跨两段，结果拆为窗口在当天所在段内的部分
+    和在上一段内的部分（不跨段时为 0）
+
+    :param values: 不含 NaN 的矩阵
+    :return: (当前段部分, 上一段部分, 每行窗口第一天所在段的序号)
+    """
+    sums = np.empty_like(values)
+    for lo, hi in zip(starts, np.append(starts[1:], len(values))):
+        np.cumsum(values[lo:hi], axis=0, out=sums[lo:hi])
+    first = np.maximum(np.arange(len(values)) - window + 1, 0)
+    first_run = run[first]
+    # 窗口第一天之前同一段的累计和，窗口从段首开始时为 0
+    before = np.where((first > starts[first_run])[:, None], sums[np.maximum(first - 1, 0)], 0)
+    cross = (first_run < run)[:, None]
+    current = np.where(cross, sums, sums - before)
+    tail = np.where(cross, sums[np.maximum(starts[run] - 1, 0)] - before, 0)
+    return current, tail, first_run
+
+
+def rolling_sum(x, window, offset=0):
+    """
+    沿交易日方向（axis 0）的滚动求和及有效值个数，NaN 不计入。
+    对分段累计和做差分，每个特征的计算量为 O(交易日数 * 股票数)，与 window 无关
+
+    :param offset: x 第 0 行的交易日序号，决定分段位置
+    :return: (滚动和, 有效值个数)，形状与 x 相同，前 window - 1 行为不足 window 天的部分窗口
+    """
+    starts, run = _runs(len(x), window, offset)
+    valid = ~np.isnan(x)
+    current, tail, _ = _rolling_parts(np.where(valid, x, 0.0), window, starts, run)
+    current_count, tail_count, _ = _rolling_parts(valid.astype(np.int64), window, starts, run)
+    return current + tail, current_count + tail_count
+
+
+def rolling_lookback(window, **_):
+    """滚动求和的回看天数：最早的窗口所在的整段都需要读取"""
+    return window + _block_size(window) - 2
+
+
+def feature_mean(x, window, min_periods=None, offset=0, **_):
+    """window 个交易日内有效值的均值，有效值少于 min_periods（默认为 window）时为 NaN"""
+    total, count = rolling_sum(x, window, offset)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count >= (min_periods or window), total / count, np.nan)
+
+
+def feature_std(x, window, min_periods=None, ffill=None, offset=0, **_):
+    """
+    window 个交易日内有效值的样本标准差，由滚动和与滚动平方和计算。
+    为减小相减时的舍入误差，先减去每段起始处的前向填充值（该值不依赖段内之后的数据），
+    误差仍可能较大的少数位置（标准差远小于与该值之差）对窗口内的数据直接计算
+    """
+    starts, run = _runs(len(x), window, offset)
+    if ffill is None:
+        reference = np.zeros((len(starts),) + x.shape[1:])
+    else:
+        reference = np.nan_to_num(np.asarray(ffill[starts], dtype=np.float64), nan=0.0)
+    valid = ~np.isnan(x)
+    centered = np.where(valid, x - reference[run], 0.0)
+    current, tail, first_run = _rolling_parts(centered, window, starts, run)
+    current_sq, tail_sq, _ = _rolling_parts(centered * centered, window, starts, run)
+    current_count, tail_count, _ = _rolling_parts(valid.astype(np.int64), window, starts, run)
+    # 上一段的部分减去的是上一段的参考值，换算为减去当前段的参考值
+    delta = reference[run] - reference[first_run]
+    count = current_count + tail_count
+    total = current + tail - tail_count * delta
+    squares = current_sq + tail_sq - 2 * delta * tail + tail_count * delta * delta
+    scale = current_sq + tail_sq + tail_count * delta * delta
+    with np.errstate(invalid='ignore', divide='ignore'):
+        deviation = np.maximum(squares - total * total / count, 0)
+        # 与均值之差的平方和远小于平方和时，相减的舍入误差被放大，这些位置直接对窗口内的数据两遍计算
+        rows, cols = np.nonzero((count >= 2) & (deviation * STD_CANCELLATION < scale))
+        if len(rows):
+            lags = rows[:, None] + np.arange(1 - window, 1)
+            values = np.where(lags >= 0, x[np.maximum(lags, 0), cols[:, None]], np.nan)
+            values = values - np.nanmean(values, axis=1, keepdims=True)
+            deviation[rows, cols] = np.nansum(values * values, axis=1)
+        return np.where(count >= max(min_periods or window, 2), np.sqrt(deviation / (count - 1)), np.nan)
+
+
+def feature_return(x, window, ffill=None, **_):
+    """相对 window 个交易日之前（停牌时为之前最近一个有效值）的收益率，当天无数据时为 NaN"""
+    result = np.full(x.shape, np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result[window:] = x[window:] / ffill[:-window] - 1
+    return result
+
+
+def feature_diff(x, window, ffill=None, **_):
+    """与 window 个交易日之前的差，如排名变化"""
+    result = np.full(x.shape, np.nan)
+    result[window:] = x[window:] - x[:-window]
+    return result
+
+
+# 特征类型：名称 -> (计算函数, 回看的交易日数)。计算函数输入 (交易日, 股票) 矩阵，返回同形状的矩阵，
+# 第 d 行只能依赖第 d - 回看天数 到第 d 行，这样追加交易日时只需计算新的行
+FEATURE_KINDS = {
+    'mean': (feature_mean, rolling_lookback),
+    'std': (feature_std, rolling_lookback),
+    'return': (feature_return, lambda window, **_: window),
+    'diff': (feature_diff, lambda window, **_: window),
+}
+
+
+class FeatureStore:
+    """
+    基于 Fetcher 的 (交易日, 股票) 矩阵预先计算全部历史的滚动特征，每个特征保存为与 Fetcher 的价格矩阵对齐的矩阵，
+    下标为 (交易日序号, 股票序号)，策略每天通过 get_day 取得当天的一行，不再从 day_data_window 重复计算。
+
+    特征以声明方式注册，如：
+    {
+        'ma20': {'kind': 'mean', 'column': 'close', 'window': 20},
+        'vol20': {'kind': 'std', 'column': 'close', 'window': 20},
+        'ret5': {'kind': 'return', 'column': 'close', 'window': 5},
+        'pred_ma5': {'kind': 'mean', 'column': 'pred', 'window': 5, 'min_periods': 1},
+        'rank_change5': {'kind': 'diff', 'column': 'rank', 'window': 5},
+    }
+    column 为 open、close、pred 或 rank（当天无数据时为 NaN），kind 见 FEATURE_KINDS。
+    特征在第一次使用时计算。注意每个特征占用 交易日数 * 股票数 * 8 字节的内存。
+    """
+
+    def __init__(self, fetcher, specs=None):
+        """
+        :param fetcher: Fetcher
+        :param specs: dict，特征名称 -> 特征定义，也可之后调用 register 添加
+        """
+        fetcher.require_dense('滚动特征')
+        self.fetcher = fetcher
+        self.specs = {}
+        self.matrices = {}
+        for name, spec in (specs or {}).items():
+            self.register(name, **spec)
+
+    def register(self, name, kind, column='close', window=20, **params):
+        """
+        注册一个特征
+
+        :param kind: 特征类型，见 FEATURE_KINDS
+        :param column: 输入列，open、close、pred 或 rank
+        :param window: 窗口的交易日数
+        :param params: 特征类型的其他参数，如 min_periods
+        """
+        if kind not in FEATURE_KINDS:
+            raise KeyError(f'未知的特征类型 {kind}，可选 {list(FEATURE_KINDS)}')
+        if column not in ('open', 'close', 'pred', 'rank'):
+            raise KeyError(f'未知的输入列 {column}')
+        self.specs[name] = {'kind': kind, 'column': column, 'window': window, **params}
+        self.matrices.pop(name, None)
+        return self
+
+    def _get_inputs(self, column, lo, hi):
+        """
+        第 lo 到 hi - 1 个交易日的输入矩阵及其前向填充矩阵。
+        前向填充按全部历史进行（Fetcher 的 last_valid_day），与 lo 无关，停牌股票的值也与一次计算全部历史相同
+        """
+        fetcher = self.fetcher
+        if column == 'open':
+            return fetcher.open_matrix[lo:hi], fetcher.ffill_open[lo:hi]
+        if column == 'close':
+            return fetcher.close_matrix[lo:hi], fetcher.ffill_close[lo:hi]
+        last = fetcher.last_valid_day[lo:hi]
+        source = np.maximum(last, 0)
+        cols = np.arange(len(fetcher.codes))
+        if column == 'rank':
+            ranks = fetcher.build_rank_table().rank_matrix[source, cols]
+            ffill = np.where((last >= 0) & (ranks >= 0), ranks, np.nan)
+        else:
+            # 数据按 (交易日, 股票) 排序，由最近一个有数据的交易日和股票序号二分查找所在的行
+            n_codes = len(fetcher.codes)
+            keys = fetcher.row_day.astype(np.int64) * n_codes + fetcher.row_code
+            rows = np.minimum(np.searchsorted(keys, source.astype(np.int64) * n_codes + cols), max(len(keys) - 1, 0))
+            ffill = np.where(last >= 0, fetcher.arrays['values'][:, 2][rows] if len(keys) else np.nan, np.nan)
+        # 当天有数据的位置即最近一个有数据的交易日为当天的位置
+        x = np.where(last == np.arange(lo, hi)[:, None], ffill, np.nan)
+        return x, ffill
+
+    def _compute(self, name, lo, hi):
+        """计算特征在第 lo 到 hi - 1 个交易日的值，只读取需要回看的交易日"""
+        spec = dict(self.specs[name])
+        func, lookback = FEATURE_KINDS[spec.pop('kind')]
+        column = spec.pop('column')
+        start = max(0, lo - lookback(**spec))
+        x, ffill = self._get_inputs(column, start, hi)
+        return func(np.asarray(x, dtype=np.float64), ffill=ffill, offset=start, **spec)[lo - start:]
+
+    def get_matrix(self, name):
+        """特征的 (交易日序号, 股票序号) 矩阵，第一次调用时计算全部历史"""
+        if name not in self.matrices:
+            self.matrices[name] = self._compute(name, 0, len(self.fetcher.date_list))
+        return self.matrices[name]
+
+    def compute_all(self):
+        for name in self.specs:
+            self.get_matrix(name)
+        return self
+
+    def get_day(self, day, ords=None):
+        """
+        当天的特征视图
+
+        :param day: 交易日，格式为 'YYYYMMDD'
+        :param ords: 股票序号数组，如 MarketView 对应的股票序号，view[name] 按其对齐
+        """
+        return FeatureView(self, self.fetcher.day_index[day], ords)
+
+    def append(self, fetcher):
+        """
+        fetcher 为当前 fetcher.append_days 得到的新 Fetcher，返回基于新 Fetcher 的 FeatureStore，
+        已计算的特征只计算新增的交易日（新增股票代码时按新的股票序号重新排列已有的列）
+        """
+        store = FeatureStore(fetcher, self.specs)
+        n_old = len(self.fetcher.date_list)
+        columns = np.searchsorted(fetcher.codes, self.fetcher.codes)
+        for name, matrix in self.matrices.items():
+            old = np.full((n_old, len(fetcher.codes)), np.nan)
+            old[:, columns] = matrix
+            store.matrices[name] = np.concatenate((old, store._compute(name, n_old, len(fetcher.date_list))))
+        return store
+
+
+class FeatureView:
+    """
+    某个交易日的特征：view.row(name) 为按股票序号排列的一行（长度为股票总数，矩阵的视图，不复制），
+    view[name] 为按构建时传入的股票序号取出的值（与 MarketView 的数组对齐），未传入时同 row
+    """
+
+    def __init__(self, store, d, ords=None):
+        self.store = store
+        self.d = d
+        self.ords = ords
+
+    def row(self, name):
+        return self.store.get_matrix(name)[self.d]
+
+    def __getitem__(self, name):
+        row = self.row(name)
+        return row if self.ords is None else row[self.ords]
+
+    def __contains__(self, name):
+        return name in self.store.specs
@@ -1,38 +1,366 @@
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 from datetime import datetime
+import bisect
+import hashlib
+import json
+from .data_cache import DataCache, get_file_fingerprint
+from .ranking import build_rank_table
+
+# stock_data 项目中 `python tools/download_data.py --mode 4` 导出的文件
+stock_data_path = '../../stock_data/data/stock_data.parquet'
 
 
 class Fetcher:
-    def __init__(self, result_file_path):
-        self.stock_data = self._get_stock_data()
-        self.pred_result = self._get_pred_result(result_file_path)
-        self.combined_data = self._merge_data()
-        self.date_list = sorted(self.combined_data.index.get_level_values('day').unique())
-
-    def _get_stock_data(self):
-        df = pd.read_parquet('../../stock_data/data/stock_data.parquet')
-        df['day'] = df['day'].astype(str)
+    columns = ['open', 'close', 'pred']
+    dense = True  # 是否保存全部交易日的 (交易日, 股票) 矩阵，流式读取的 StreamingFetcher 为 False
+
+    def __init__(self, result_file_path, use_cache=True, refresh_cache=False, cache_dir='cache', dtype=np.float64,
+                 start_day=None, end_day=None, codes=None, exclude_codes=None, csv_chunksize=1_000_000):
+        """
+        :param result_file_path: 预测结果文件路径
+        :param use_cache: 是否使用合并后数据的磁盘缓存，为 False 时既不读取也不写入缓存
+        :param refresh_cache: 是否忽略已有缓存并重新构建
+        :param cache_dir: 缓存目录
+        :param dtype: 价格和预测值的存储类型，np.float32 可将数值数组的内存减半，但价格和排名可能与 float64 有细微差别
+        :param start_day: 只加载该日期（含，格式为 'YYYYMMDD'）之后的数据，需要回看窗口时应相应提前
+        :param end_day: 只加载该日期（含）之前的数据
+        :param codes: 只加载这些股票代码的数据
+        :param exclude_codes: 不加载这些股票代码的数据，如 APP.st
+        :param csv_chunksize: 指定了过滤条件时，分块读取预测文件的行数
+        """
+        self.dtype = np.dtype(dtype)
+        filters = {
+            'start_day': None if start_day is None else int(str(start_day).replace('-', '')),
+            'end_day': None if end_day is None else int(str(end_day).replace('-', '')),
+            'codes': None if codes is None else sorted(int(code) for code in codes),
+            'exclude_codes': None if exclude_codes is None else sorted(int(code) for code in exclude_codes),
+        }
+        filtered = any(value is not None for value in filters.values())
+        arrays = None
+        if use_cache:
+            extra = {} if self.dtype == np.float64 else {'dtype': self.dtype.name}
+            if filtered:
+                extra['filters'] = filters
+            cache = DataCache(cache_dir, [stock_data_path, result_file_path], extra=extra or None)
+            if not refresh_cache:
+                arrays = cache.load()
+        if arrays is None:
+            stock_data = self._get_stock_data(filters)
+            pred_result = self._get_pred_result(result_file_path, filters if filtered else None, csv_chunksize)
+            arrays = self._build_arrays(self._merge_data(stock_data, pred_result))
+            if use_cache:
+                cache.save(arrays)
+        self._set_arrays(arrays)
+        self._fingerprint = json.dumps([get_file_fingerprint([stock_data_path, result_file_path]), self.dtype.name,
+                                        filters if filtered else None])
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """由 to_arrays 导出的数组字典构建 Fetcher，数组不会被复制"""
+        fetcher = cls.__new__(cls)
+        fetcher._set_arrays(arrays)
+        return fetcher
+
+    def to_arrays(self):
+        """导出构成 Fetcher 的全部数组"""
+        return dict(self.arrays)
+
+    def get_fingerprint(self):
+        """
+        数据的指纹，数据不同时指纹不同，用于结果缓存的键：
+        由数据文件加载时为数据源文件的 (路径, 大小, 修改时间)，由数组构建时为数组内容的哈希（第一次调用时计算）
+        """
+        if self._fingerprint is None:
+            digest = hashlib.sha1()
+            for name in ('days', 'codes', 'row_day', 'row_code', 'values'):
+                digest.update(np.ascontiguousarray(self.arrays[name]).tobytes())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def append_days(self, stock_df, pred_df):
+        """
+        追加新交易日的行情和预测数据，不重新读取数据文件。返回新的 Fetcher，当前 Fetcher 不变，
+        正在使用当前 Fetcher 的调用方不受影响。结果与重新加载追加后的数据文件相同。
+        价格矩阵、前向填充和排名表只计算新交易日的行，已有的行直接复制（新增股票代码时按新的股票序号重新排列列）
+
+        :param stock_df: 新的行情数据，格式与 stock_data.parquet 相同（code, day, open, close 列）
+        :param pred_df: 新的预测数据，格式与预测结果文件相同（SecurityID, time, pred 列）
+        :return: 新的 Fetcher
+        """
+        merged = self._merge_data(self._prepare_stock_data(stock_df.copy()), self._prepare_pred_result(pred_df.copy()))
+        index = merged.index
+        day_numbers = index.get_level_values('day').to_numpy()
+        new_days = np.unique(day_numbers)
+        if len(new_days) and self.date_list and str(new_days[0]) <= self.date_list[-1]:
+            raise ValueError(f'只能追加 {self.date_list[-1]} 之后的交易日，收到 {new_days[0]}')
+        new_codes = index.get_level_values('code').to_numpy()
+        codes = np.union1d(self.codes, new_codes)
+        # 已有股票在新股票代码表中的序号，新增股票代码时已有的行和矩阵的列按它重新映射
+        columns = np.searchsorted(codes, self.codes)
+        widened = len(codes) != len(self.codes)
+        n_days, n_rows = len(self.date_list), len(self.row_day)
+
+        # 新交易日的数据单独组成一块，交易日序号从 0 开始
+        block_row_day = np.searchsorted(new_days, day_numbers).astype(np.int32)
+        block = {
+            'days': new_days.astype(str),
+            'codes': codes,
+            'row_day': block_row_day,
+            'row_code': np.searchsorted(codes, new_codes).astype(np.int32),
+            'day_offsets': np.searchsorted(block_row_day, np.arange(len(new_days) + 1)),
+            'values': merged[self.columns].to_numpy(dtype=self.dtype),
+        }
+        arrays = {
+            'days': np.concatenate((self.arrays['days'], block['days'])),
+            'codes': codes,
+            'row_day': np.concatenate((self.row_day, (block_row_day + n_days).astype(np.int32))),
+            'row_code': np.concatenate((columns[self.row_code].astype(np.int32) if widened else self.row_code,
+                                        block['row_code'])),
+            'day_offsets': np.concatenate((self.day_offsets[:-1], block['day_offsets'] + n_rows)),
+            'values': np.concatenate((self.arrays['values'], block['values'])),
+        }
+
+        def extend(name, new_rows, fill):
+            old = self.arrays[name]
+            if widened:
+                wide = np.full((len(old), len(codes)), fill, dtype=old.dtype)
+                wide[:, columns] = old
+                old = wide
+            return np.concatenate((old, new_rows.astype(old.dtype, copy=False)))
+
+        # 价格矩阵只构建新交易日的行，前向填充从已有的最后一行接续
+        matrices = self._build_price_matrix(block)
+        local_last = matrices['last_valid_day']
+        prev_last = np.full(len(codes), -1, dtype=np.int32)
+        prev_open = np.full(len(codes), np.nan, dtype=self.dtype)
+        prev_close = np.full(len(codes), np.nan, dtype=self.dtype)
+        if n_days:
+            prev_last[columns] = self.last_valid_day[-1]
+            prev_open[columns] = self.ffill_open[-1]
+            prev_close[columns] = self.ffill_close[-1]
+        has_data = local_last >= 0
+        arrays['open_matrix'] = extend('open_matrix', matrices['open_matrix'], np.nan)
+        arrays['close_matrix'] = extend('close_matrix', matrices['close_matrix'], np.nan)
+        arrays['last_valid_day'] = extend('last_valid_day', np.where(has_data, local_last + n_days, prev_last), -1)
+        arrays['ffill_open'] = extend('ffill_open', np.where(has_data, matrices['ffill_open'], prev_open), np.nan)
+        arrays['ffill_close'] = extend('ffill_close', np.where(has_data, matrices['ffill_close'], prev_close), np.nan)
+
+        # 已构建排名表时只对新交易日排名
+        if self.day_order is not None:
+            order, rank = build_rank_table(block['values'][:, 2], block_row_day, block['day_offsets'])
+            rank_matrix = np.full((len(new_days), len(codes)), -1, dtype=np.int32)
+            rank_matrix[block_row_day, block['row_code']] = rank
+            arrays.update({
+                'day_order': np.concatenate((self.day_order, order)),
+                'row_rank': np.concatenate((self.row_rank, rank)),
+                'sorted_codes': np.concatenate((
+                    self.sorted_codes, codes[block['row_code'][block['day_offsets'][block_row_day] + order]])),
+                'rank_matrix': extend('rank_matrix', rank_matrix, -1),
+            })
+        return type(self).from_arrays(arrays)
+
+    def _get_stock_data(self, filters=None):
+        """
+        只读取 code/day/open/close 列。过滤条件交给 parquet 读取器，借助 row group 统计信息跳过无关的数据块，
+        交易日列不是整数类型时交易日的过滤在读取后进行
+        """
+        filters = filters or {}
+        day_is_int = pa.types.is_integer(pq.read_schema(stock_data_path).field('day').type)
+        predicates = []
+        if day_is_int and filters.get('start_day') is not None:
+            predicates.append(('day', '>=', filters['start_day']))
+        if day_is_int and filters.get('end_day') is not None:
+            predicates.append(('day', '<=', filters['end_day']))
+        if filters.get('codes') is not None:
+            predicates.append(('code', 'in', filters['codes']))
+        if filters.get('exclude_codes'):
+            predicates.append(('code', 'not in', filters['exclude_codes']))
+        df = pd.read_parquet(stock_data_path, columns=['code', 'day', 'open', 'close'], filters=predicates or None)
+        return self._filter_index(self._prepare_stock_data(df), filters)
+
+    @staticmethod
+    def _filter_index(df, filters):
+        """按过滤条件筛选索引为 (code, day) 的数据，day 为整数"""
+        if not filters:
+            return df
+        keep = np.ones(len(df), dtype=bool)
+        code = df.index.get_level_values(0)
+        day = df.index.get_level_values(1)
+        if filters.get('start_day') is not None:
+            keep &= day >= filters['start_day']
+        if filters.get('end_day') is not None:
+            keep &= day <= filters['end_day']
+        if filters.get('codes') is not None:
+            keep &= code.isin(filters['codes'])
+        if filters.get('exclude_codes'):
+            keep &= ~code.isin(filters['exclude_codes'])
+        return df if keep.all() else df[keep]
+
+    @staticmethod
+    def _encode_days(days):
+        """
+        交易日编码为 YYYYMMDD 形式的 int32。读取、合并和排序都使用整数，
+        交易日字符串只在构建交易日表（每个交易日一次）时生成
+
+        :param days: Series，整数或 'YYYYMMDD'/'YYYY-MM-DD' 形式的字符串
+        """
+        if pd.api.types.is_numeric_dtype(days):
+            return days.astype(np.int32)
+        return pd.to_numeric(days.astype(str).str.replace('-', '', regex=False)).astype(np.int32)
+
+    @staticmethod
+    def _prepare_stock_data(df):
+        df['day'] = Fetcher._encode_days(df['day'])
         df.set_index(['code', 'day'], inplace=True)
         return df[['open', 'close']]
 
-    def _get_pred_result(self, result_file_path):
-        pred_df = pd.read_csv(result_file_path)
+    def _get_pred_result(self, result_file_path, filters=None, csv_chunksize=1_000_000):
+        """
+        只读取 SecurityID/time/pred 列。指定了过滤条件时分块读取并逐块过滤，内存只与保留的数据量有关
+        """
+        usecols = ['SecurityID', 'time', 'pred']
+        if not filters:
+            return self._prepare_pred_result(pd.read_csv(result_file_path, usecols=usecols))
+        chunks = [self._filter_index(self._prepare_pred_result(chunk), filters)
+                  for chunk in pd.read_csv(result_file_path, usecols=usecols, chunksize=csv_chunksize)]
+        if not chunks:
+            return self._prepare_pred_result(pd.read_csv(result_file_path, usecols=usecols, nrows=0))
+        return pd.concat(chunks)
+
+    @staticmethod
+    def _prepare_pred_result(pred_df):
         try:
-            pred_df['time'] = pd.to_datetime(pred_df['time'], format='%Y%m%d').dt.strftime('%Y%m%d')
+            time = pd.to_datetime(pred_df['time'], format='%Y%m%d')
         except ValueError:
-            pred_df['time'] = pd.to_datetime(pred_df['time'], unit='s').dt.strftime('%Y%m%d')
+            time = pd.to_datetime(pred_df['time'], unit='s')
+        pred_df['time'] = (time.dt.year * 10000 + time.dt.month * 100 + time.dt.day).astype(np.int32)
         pred_df['SecurityID'] = pred_df['SecurityID'].astype(int)
         pred_df.set_index(['SecurityID', 'time'], inplace=True)
         return pred_df[['pred']]
 
-    def _merge_data(self):
+    def _merge_data(self, stock_data, pred_result):
         # 重命名索引以匹配
-        self.pred_result.index.names = ['code', 'day']
-        merged_df = self.stock_data.join(self.pred_result[['pred']], how='inner')
+        pred_result.index.names = ['code', 'day']
+        merged_df = stock_data.join(pred_result[['pred']], how='inner')
         merged_df = merged_df[~merged_df.index.duplicated(keep='first')]
+        # 按 (day, code) 排序，使每个交易日的数据在表中连续存放
+        merged_df = merged_df.sort_index(level=['day', 'code'])
         return merged_df
 
+    def _build_arrays(self, merged_df):
+        """
+        将合并后的数据转换为数组：
+        days/codes 为交易日表和股票代码表，row_day/row_code 为每行数据的交易日序号和股票序号（int32），
+        第 d 个交易日的数据位于 [day_offsets[d], day_offsets[d + 1]) 行，values 为按 columns 排列的数值
+        """
+        index = merged_df.index
+        day_numbers = index.get_level_values('day').to_numpy()
+        code_values = index.get_level_values('code').to_numpy()
+        days = np.unique(day_numbers)
+        codes = np.unique(code_values)
+        row_day = np.searchsorted(days, day_numbers).astype(np.int32)
+        row_code = np.searchsorted(codes, code_values).astype(np.int32)
+        return self._assemble_arrays(days.astype(str), codes, row_day, row_code,
+                                     merged_df[self.columns].to_numpy(dtype=self.dtype))
+
+    @classmethod
+    def _assemble_arrays(cls, days, codes, row_day, row_code, values):
+        """由交易日表、股票代码表、按 (day, code) 排序的行序号和数值构建 Fetcher 的数组字典"""
+        arrays = {
+            'days': days,
+            'codes': codes,
+            'row_day': row_day,
+            'row_code': row_code,
+            'day_offsets': np.searchsorted(row_day, np.arange(len(days) + 1)),
+            'values': values,
+        }
+        arrays.update(cls._build_price_matrix(arrays))
+        return arrays
+
+    @staticmethod
+    def _build_price_matrix(arrays):
+        """
+        构建以 (交易日序号, 股票序号) 为下标的稠密开盘价/收盘价矩阵，无数据的位置为 NaN。
+        同时构建前向填充矩阵：last_valid_day[d, c] 为股票 c 在第 d 个交易日及之前最近一个有数据的交易日序号（无则为 -1），
+        ffill_open/ffill_close 为对应交易日的开盘价/收盘价，使停牌股票的价格查询也只需一次数组索引。
+        """
+        day_ord, code_ord, values = arrays['row_day'], arrays['row_code'], arrays['values']
+        shape = (len(arrays['days']), len(arrays['codes']))
+        open_matrix = np.full(shape, np.nan, dtype=values.dtype)
+        open_matrix[day_ord, code_ord] = values[:, 0]
+        close_matrix = np.full(shape, np.nan, dtype=values.dtype)
+        close_matrix[day_ord, code_ord] = values[:, 1]
+
+        last_valid_day = np.full(shape, -1, dtype=np.int32)
+        last_valid_day[day_ord, code_ord] = day_ord
+        np.maximum.accumulate(last_valid_day, axis=0, out=last_valid_day)
+        rows = np.maximum(last_valid_day, 0)
+        cols = np.arange(shape[1])
+        return {
+            'open_matrix': open_matrix,
+            'close_matrix': close_matrix,
+            'last_valid_day': last_valid_day,
+            'ffill_open': np.where(last_valid_day >= 0, open_matrix[rows, cols], np.nan),
+            'ffill_close': np.where(last_valid_day >= 0, close_matrix[rows, cols], np.nan),
+        }
+
+    def require_dense(self, usage):
+        """usage 需要全部交易日的 (交易日, 股票) 矩阵，流式读取时抛出 NotImplementedError"""
+        if not self.dense:
+            raise NotImplementedError(f'{type(self).__name__} 为流式读取，不保存全部交易日的数据，不支持{usage}')
+
+    def _set_arrays(self, arrays):
+        self.arrays = arrays
+        self._fingerprint = None
+        self.dtype = arrays['values'].dtype
+        self.date_list = arrays['days'].tolist()
+        self.day_index = {day: i for i, day in enumerate(self.date_list)}
+        self.codes = arrays['codes']
+        self.code_index = {code: i for i, code in enumerate(self.codes.tolist())}
+        self._code_table = pd.Index(self.codes)
+        self.row_day = arrays['row_day']
+        self.row_code = arrays['row_code']
+        self.day_offsets = arrays['day_offsets']
+        self.open_matrix = arrays['open_matrix']
+        self.close_matrix = arrays['close_matrix']
+        self.last_valid_day = arrays['last_valid_day']
+        self.ffill_open = arrays['ffill_open']
+        self.ffill_close = arrays['ffill_close']
+        self._set_rank_table(arrays)
+        index = pd.MultiIndex(levels=[self.codes, arrays['days']], codes=[self.row_code, self.row_day],
+                              names=['code', 'day'], verify_integrity=False)
+        self.combined_data = pd.DataFrame(arrays['values'], index=index, columns=self.columns, copy=False)
+
+    def get_day_arrays(self, day):
+        """
+        获取指定交易日的数据数组（combined_data 中连续一段的切片，不复制）
+
+        :param day: 交易日，格式为 'YYYYMMDD'
+        :return: (股票序号数组, open 数组, close 数组, pred 数组)，按股票代码升序排列
+        """
+        d = self.day_index[day]
+        lo, hi = self.day_offsets[d], self.day_offsets[d + 1]
+        values = self.arrays['values'][lo:hi]
+        return self.row_code[lo:hi], values[:, 0], values[:, 1], values[:, 2]
+
+    def get_day_ordinal(self, day):
+        """
+        获取交易日序号。若指定日期不是交易日，则返回其之前最近一个交易日的序号，没有则返回 -1
+
+        :param day: 指定日期，格式为 'YYYYMMDD'
+        """
+        d = self.day_index.get(day)
+        if d is None:
+            d = bisect.bisect_left(self.date_list, day) - 1
+        return d
+
+    def get_code_ordinals(self, codes):
+        """股票代码转换为股票序号数组，未知代码为 -1"""
+        return self._code_table.get_indexer(np.asarray(codes))
+
     def get_data_by_date(self, date, window=1):
         """
         指定日期，获取自该日期开始往前 window 天的所有股票的数据
@@ -42,11 +370,121 @@ class Fetcher:
         :return: 包含指定日期范围内所有股票数据的 DataFrame
         """
         date = date.replace('-', '')
-        end_index = self.date_list.index(date)
+        end_index = self.day_index[date]
         start_index = max(0, end_index - window + 1)
-        # 获取对应的交易日列表
-        trading_days_range = self.date_list[start_index:end_index + 1]
-        return self.combined_data[self.combined_data.index.get_level_values('day').isin(trading_days_range)]
+        # 数据按交易日连续存放，直接按行偏移切片
+        return self.combined_data.iloc[self.day_offsets[start_index]:self.day_offsets[end_index + 1]]
+
+    def get_day_range(self, start_day=None, end_day=None):
+        """
+        获取 [start_day, end_day] 内交易日的序号范围
+
+        :param start_day: 起始日期（含），格式为 'YYYYMMDD'，默认为第一个交易日
+        :param end_day: 结束日期（含），格式为 'YYYYMMDD'，默认为最后一个交易日
+        :return: (lo, hi)，date_list[lo:hi] 为范围内的交易日
+        """
+        lo = 0 if start_day is None else bisect.bisect_left(self.date_list, start_day)
+        hi = len(self.date_list) if end_day is None else bisect.bisect_right(self.date_list, end_day)
+        return lo, max(lo, hi)
+
+    def iter_days(self, window=20, start_day=None, end_day=None):
+        """
+        按交易日顺序遍历数据
+
+        :param window: 回看窗口的天数，默认为 20，窗口可以包含 start_day 之前的数据
+        :param start_day: 起始日期（含），格式为 'YYYYMMDD'
+        :param end_day: 结束日期（含），格式为 'YYYYMMDD'
+        :return: 生成器，依次产出 (day, 当天数据, 最近 window 天数据)
+        """
+        offsets = self.day_offsets
+        lo, hi = self.get_day_range(start_day, end_day)
+        for i in range(lo, hi):
+            end = offsets[i + 1]
+            day_data = self.combined_data.iloc[offsets[i]:end]
+            day_data_window = self.combined_data.iloc[offsets[max(0, i - window + 1)]:end]
+            yield self.date_list[i], day_data, day_data_window
+
+    def build_rank_table(self):
+        """
+        一次计算全部交易日的截面排名表，保存在 arrays 中，随 to_arrays 一起导出，
+        多次回测（或多个进程通过共享内存）可复用同一份排名：
+        day_order 为每天按 pred 从大到小排序的日内下标，row_rank 为每行在当天的排名（从 0 开始），
+        sorted_codes 为每天按排名排列的股票代码，rank_matrix[d, c] 为股票 c 在第 d 个交易日的排名（无数据为 -1）。
+        排名相关的查询方法在第一次调用时自动构建
+        """
+        if self.arrays.get('day_order') is None:
+            order, rank = build_rank_table(self.arrays['values'][:, 2], self.row_day, self.day_offsets)
+            rank_matrix = np.full((len(self.date_list), len(self.codes)), -1, dtype=np.int32)
+            rank_matrix[self.row_day, self.row_code] = rank
+            self.arrays.update({
+                'day_order': order,
+                'row_rank': rank,
+                'sorted_codes': self.codes[self.row_code[self.day_offsets[self.row_day] + order]],
+                'rank_matrix': rank_matrix,
+            })
+            self._set_rank_table(self.arrays)
+        return self
+
+    def _set_rank_table(self, arrays):
+        self.day_order = arrays.get('day_order')
+        self.row_rank = arrays.get('row_rank')
+        self.sorted_codes = arrays.get('sorted_codes')
+        self.rank_matrix = arrays.get('rank_matrix')
+
+    def get_day_order(self, day):
+        """获取指定交易日按 pred 从大到小排序的日内下标，与 get_day_arrays 返回的数组对齐"""
+        return self._rank_slice('day_order', day)
+
+    def get_day_ranks(self, day):
+        """获取指定交易日每只股票的排名（从 0 开始），与 get_day_arrays 返回的数组对齐"""
+        return self._rank_slice('row_rank', day)
+
+    def get_top_codes(self, day, k=None):
+        """获取指定交易日预测排名前 k 的股票代码，k 为 None 时返回全部股票按排名排列的代码"""
+        return self._rank_slice('sorted_codes', day)[:k]
+
+    def get_ranks(self, codes, day):
+        """
+        获取一组股票在指定交易日的排名
+
+        :return: 与 codes 对齐的排名数组，当天无数据（如停牌）或未知的股票为 -1
+        """
+        self.build_rank_table()
+        ords = self.get_code_ordinals(codes)
+        ranks = self.rank_matrix[self.day_index[day], ords]
+        ranks[ords < 0] = -1
+        return ranks
+
+    def get_percentiles(self, codes, day):
+        """
+        获取一组股票在指定交易日的排名百分位，排名第一为 1，最后一名为 0
+
+        :return: 与 codes 对齐的数组，当天无数据的股票为 NaN
+        """
+        d = self.day_index[day]
+        n = self.day_offsets[d + 1] - self.day_offsets[d]
+        ranks = self.get_ranks(codes, day)
+        return np.where(ranks >= 0, 1 - ranks / max(n - 1, 1), np.nan)
+
+    def get_rank_history(self, codes, day, window=20):
+        """
+        获取一组股票截至指定交易日最近 window 个交易日的排名，如"持仓股票最近 20 天的排名"
+
+        :return: DataFrame，索引为交易日，列为股票代码，当天无数据的位置为 -1
+        """
+        self.build_rank_table()
+        codes = np.asarray(codes)
+        ords = self.get_code_ordinals(codes)
+        end = self.day_index[day] + 1
+        start = max(0, end - window)
+        ranks = self.rank_matrix[start:end][:, ords]
+        ranks[:, ords < 0] = -1
+        return pd.DataFrame(ranks, index=self.date_list[start:end], columns=codes)
+
+    def _rank_slice(self, name, day):
+        self.build_rank_table()
+        d = self.day_index[day]
+        return self.arrays[name][self.day_offsets[d]:self.day_offsets[d + 1]]
 
     def get_close_by_code(self, code, day):
         """
@@ -56,18 +494,7 @@ class Fetcher:
         :param day: 指定日期，格式为 'YYYYMMDD'
         :return: 对应股票在指定日期或最近上一个交易日的收盘价，如果都未找到则返回 None
         """
-        try:
-            return self.combined_data.loc[(code, day), 'close'].item()
-        except KeyError:
-            # 找到最近的上一个交易日
-            trading_days = self.date_list
-            index = trading_days.index(day) if day in trading_days else next((i for i, d in enumerate(trading_days) if d > day), 0)
-            for prev_day in reversed(trading_days[:index]):
-                try:
-                    return self.combined_data.loc[(code, prev_day), 'close'].item()
-                except KeyError:
-                    continue
-            return None
+        return self._lookup(self.ffill_close, code, day)
 
     def get_open_by_code(self, code, day):
         """
@@ -77,15 +504,50 @@ class Fetcher:
         :param day: 指定日期，格式为 'YYYYMMDD'
         :return: 对应股票在指定日期或最近上一个交易日的开盘价，如果都未找到则返回 None
         """
-        try:
-            return self.combined_data.loc[(code, day), 'open'].item()
-        except KeyError:
-            # 找到最近的上一个交易日
-            trading_days = self.date_list
-            index = trading_days.index(day) if day in trading_days else next((i for i, d in enumerate(trading_days) if d > day), 0)
-            for prev_day in reversed(trading_days[:index]):
-                try:
-                    return self.combined_data.loc[(code, prev_day), 'open'].item()
-                except KeyError:
-                    continue
+        return self._lookup(self.ffill_open, code, day)
+
+    def get_close_by_codes(self, codes, day):
+        """
+        批量获取一组股票在指定日期（或最近上一个交易日）的收盘价
+
+        :param codes: 股票代码序列
+        :param day: 指定日期，格式为 'YYYYMMDD'
+        :return: 与 codes 对齐的收盘价数组，未找到的位置为 NaN
+        """
+        return self._lookup_many(self.ffill_close, codes, day)
+
+    def get_open_by_codes(self, codes, day):
+        """
+        批量获取一组股票在指定日期（或最近上一个交易日）的开盘价
+
+        :param codes: 股票代码序列
+        :param day: 指定日期，格式为 'YYYYMMDD'
+        :return: 与 codes 对齐的开盘价数组，未找到的位置为 NaN
+        """
+        return self._lookup_many(self.ffill_open, codes, day)
+
+    def get_close_by_ordinals(self, ords, day):
+        """同 get_close_by_codes，以股票序号代替股票代码"""
+        return self._take(self.ffill_close, np.asarray(ords), day)
+
+    def get_open_by_ordinals(self, ords, day):
+        """同 get_open_by_codes，以股票序号代替股票代码"""
+        return self._take(self.ffill_open, np.asarray(ords), day)
+
+    def _lookup(self, matrix, code, day):
+        c = self.code_index.get(code)
+        d = self.get_day_ordinal(day)
+        if c is None or d < 0 or self.last_valid_day[d, c] < 0:
             return None
+        return matrix[d, c].item()
+
+    def _lookup_many(self, matrix, codes, day):
+        return self._take(matrix, self.get_code_ordinals(codes), day)
+
+    def _take(self, matrix, ords, day):
+        d = self.get_day_ordinal(day)
+        if d < 0:
+            return np.full(len(ords), np.nan)
+        prices = matrix[d, ords]
+        prices[ords < 0] = np.nan
+        return prices
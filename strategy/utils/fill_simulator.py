@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+from . import fetcher as fetcher_module
+
+LOT_SIZE = 100  # 一手的股数
+
+# 拒绝原因
+REJECT_REASONS = np.array(['', 'unknown', 'suspended', 'limit_up', 'limit_down', 'lot', 'volume', 'position', 'cash'])
+OK, UNKNOWN, SUSPENDED, LIMIT_UP, LIMIT_DOWN, LOT, VOLUME, POSITION, CASH = range(len(REJECT_REASONS))
+
+
+def get_limit_pct(codes, st=()):
+    """
+    各股票的涨跌幅限制：创业板（300、301 开头）和科创板（688、689 开头）为 20%，ST 股票为 5%，其余为 10%
+
+    :param codes: 股票代码数组
+    :param st: ST 股票代码集合
+    """
+    codes = np.asarray(codes)
+    board = codes // 1000
+    pct = np.where(np.isin(codes, list(st)), 0.05, 0.1)
+    return np.where(np.isin(board, [300, 301, 688, 689]), 0.2, pct)
+
+
+def load_volume_matrix(fetcher, path=None):
+    """
+    读取行情文件中的成交量，构建与 fetcher 的价格矩阵对齐的 (交易日序号, 股票序号) 成交量矩阵，无数据的位置为 0
+
+    :param path: 行情文件，默认为 utils.fetcher.stock_data_path
+    """
+    fetcher.require_dense('成交模拟')
+    df = pd.read_parquet(path or fetcher_module.stock_data_path, columns=['code', 'day', 'volume'])
+    days = pd.Index(fetcher.arrays['days'].astype(np.int32)).get_indexer(fetcher._encode_days(df['day']))
+    ords = fetcher.get_code_ordinals(df['code'].to_numpy())
+    keep = (days >= 0) & (ords >= 0)
+    volume = np.zeros(fetcher.open_matrix.shape)
+    volume[days[keep], ords[keep]] = df['volume'].to_numpy(dtype=np.float64)[keep]
+    return volume
+
+
+class FillSimulator:
+    """
+    按 A 股交易规则模拟一天全部订单的成交，所有检查都是对整批订单的数组运算：
+
+    - 停牌（当天无开盘价）的股票不能交易
+    - 开盘价达到涨停价不能买入，达到跌停价不能卖出，涨跌停价由前收盘价和涨跌幅限制预先计算
+    - 买入数量向下取整到整手；卖出也按整手，一次卖出全部持仓时允许零股
+    - 可选的成交量限制：单笔成交数量不超过当天成交量的 volume_cap 倍，超出部分不成交
+
+    资金和持仓的检查以及费用计算由 Agent.execute 完成。
+    """
+
+    def __init__(self, fetcher, st=(), volume=None, volume_cap=None):
+        """
+        :param fetcher: Fetcher
+        :param st: ST 股票代码集合，如 APP.st
+        :param volume: 成交量矩阵，见 load_volume_matrix，volume_cap 不为 None 时必须提供
+        :param volume_cap: 单笔成交数量占当天成交量的比例上限，为 None 时不限制
+        """
+        fetcher.require_dense('成交模拟')
+        if volume_cap is not None and volume is None:
+            raise ValueError('使用 volume_cap 时需要提供成交量矩阵 volume')
+        self.fetcher = fetcher
+        self.volume = volume
+        self.volume_cap = volume_cap
+        # 前收盘价：上一个交易日或之前最近一个有数据的交易日（停牌前）的收盘价
+        prev_close = np.full(fetcher.ffill_close.shape, np.nan)
+        prev_close[1:] = fetcher.ffill_close[:-1]
+        pct = get_limit_pct(fetcher.codes, st)
+        self.prev_close = prev_close
+        self.limit_up = np.round(prev_close * (1 + pct), 2)
+        self.limit_down = np.round(prev_close * (1 - pct), 2)
+
+    def simulate(self, ords, amounts, day, held):
+        """
+        :param ords: 订单的股票序号数组，未知股票为 -1
+        :param amounts: 订单数量数组，大于 0 为买入，小于 0 为卖出
+        :param day: 交易日，格式为 'YYYYMMDD'
+        :param held: 订单股票的当前持仓数量，与 ords 对齐
+        :return: (可成交数量数组, 成交价数组, 原因数组)，原因为 REJECT_REASONS 的下标，
+                 可成交数量小于订单数量时为未成交部分的原因，全部成交时为 OK
+        """
+        d = self.fetcher.day_index[day]
+        known = ords >= 0
+        c = np.where(known, ords, 0)
+        prices = np.where(known, self.fetcher.open_matrix[d, c], np.nan)
+        reasons = np.full(len(ords), OK, dtype=np.int8)
+
+        sell = amounts < 0
+        quantity = np.abs(amounts)
+        # 整手：卖出全部持仓时允许零股
+        lots = quantity // LOT_SIZE * LOT_SIZE
+        whole = sell & (quantity == held)
+        filled = np.where(whole, quantity, lots)
+        reasons[filled < quantity] = LOT
+
+        if self.volume_cap is not None:
+            cap = np.where(known, self.volume[d, c], 0) * self.volume_cap // LOT_SIZE * LOT_SIZE
+            capped = filled > cap
+            filled = np.where(capped, cap, filled).astype(np.int64)
+            reasons[capped] = VOLUME
+
+        # 以下原因使整笔订单不能成交，后面的检查优先级更高
+        with np.errstate(invalid='ignore'):
+            reasons[~sell & (prices >= self.limit_up[d, c] - 1e-6)] = LIMIT_UP
+            reasons[sell & (prices <= self.limit_down[d, c] + 1e-6)] = LIMIT_DOWN
+        reasons[np.isnan(prices)] = SUSPENDED
+        reasons[~known] = UNKNOWN
+        filled[(reasons >= UNKNOWN) & (reasons <= LIMIT_DOWN)] = 0
+        return np.where(sell, -filled, filled), prices, reasons
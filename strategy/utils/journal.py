@@ -0,0 +1,189 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import os
+import queue
+import shutil
+import threading
+
+POSITION_SCHEMA = pa.schema([
+    ('day', pa.int32()),
+    ('code', pa.int64()),
+    ('amount', pa.int64()),
+    ('open', pa.float64()),
+    ('close', pa.float64()),
+])
+FILL_SCHEMA = pa.schema([
+    ('day', pa.int32()),
+    ('code', pa.int64()),
+    ('amount', pa.int64()),
+    ('price', pa.float64()),
+    ('cost', pa.float64()),
+    ('fee', pa.float64()),
+])
+SCHEMAS = {'positions': POSITION_SCHEMA, 'fills': FILL_SCHEMA}
+
+
+class Journal:
+    """
+    按交易日记录持仓和成交的列式日志。
+
+    每天的数据先追加到内存中的列缓冲区，累计 chunk_days 天后交给后台线程写入压缩的 parquet 文件，
+    每批数据为一个 row group。数据按交易日顺序写入（同一天内为记录时的顺序，如持仓的建仓顺序），
+    读取时可借助 row group 统计信息跳过无关数据。
+    每个表每次运行只生成一个文件：{dirname}/{表名}/part-{起始日期}.parquet
+    """
+
+    def __init__(self, dirname='result/journal', chunk_days=250, compression='zstd', append=False):
+        """
+        :param dirname: 日志目录
+        :param chunk_days: 每批写入的交易日数
+        :param compression: parquet 压缩算法
+        :param append: 为 False 时清空已有日志，为 True 时保留已有文件（用于续跑）
+        """
+        self.dirname = dirname
+        self.chunk_days = chunk_days
+        self.compression = compression
+        if not append:
+            shutil.rmtree(dirname, ignore_errors=True)
+        for table in SCHEMAS:
+            os.makedirs(os.path.join(dirname, table), exist_ok=True)
+        self._buffers = {table: [] for table in SCHEMAS}
+        self._buffered_days = 0
+        self._first_day = None
+        self._queue = queue.Queue(maxsize=4)
+        self._error = None
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def record(self, day, positions, fills):
+        """
+        记录一个交易日的持仓和成交
+
+        :param day: 交易日，格式为 'YYYYMMDD'
+        :param positions: dict，包含 code、amount、open、close 数组
+        :param fills: dict，包含 code、amount、price、cost、fee 数组
+        """
+        if self._first_day is None:
+            self._first_day = day
+        for table, columns in (('positions', positions), ('fills', fills)):
+            n = len(columns['code'])
+            self._buffers[table].append({'day': np.full(n, int(day), dtype=np.int32), **columns})
+        self._buffered_days += 1
+        if self._buffered_days >= self.chunk_days:
+            self.flush()
+
+    def flush(self):
+        """将缓冲区的数据交给后台线程写入"""
+        if self._error is not None:
+            raise self._error
+        if not self._buffered_days:
+            return
+        for table, schema in SCHEMAS.items():
+            chunks = self._buffers[table]
+            columns = {name: np.concatenate([chunk[name] for chunk in chunks]) for name in schema.names}
+            self._queue.put((table, pa.Table.from_pydict(columns, schema=schema)))
+            self._buffers[table] = []
+        self._buffered_days = 0
+
+    def close(self):
+        """写入剩余数据并等待后台线程结束"""
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def _write_loop(self):
+        writers = {}
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                table, data = item
+                if table not in writers:
+                    path = os.path.join(self.dirname, table, f'part-{self._first_day}.parquet')
+                    writers[table] = pq.ParquetWriter(path, SCHEMAS[table], compression=self.compression)
+                writers[table].write_table(data)
+        except Exception as e:
+            self._error = e
+            # 继续取出队列中的数据，避免主线程阻塞
+            while self._queue.get() is not None:
+                pass
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def truncate_journal(dirname='result/journal', after_day=None):
+    """
+    删除起始日期晚于 after_day 的日志文件，用于从检查点续跑前丢弃检查点之后写入的日志。
+    续跑的回测在每个检查点重新开始一个日志文件，因此检查点之后的数据都位于起始日期晚于检查点的文件中
+    """
+    for table in SCHEMAS:
+        path = os.path.join(dirname, table)
+        if not os.path.isdir(path):
+            continue
+        for name in os.listdir(path):
+            if name.startswith('part-') and name[5:-8] > after_day:
+                os.remove(os.path.join(path, name))
+
+
+def read_journal(dirname='result/journal', table='positions', start_day=None, end_day=None, codes=None):
+    """
+    读取日志，按日期范围和股票代码过滤，过滤条件下推到 parquet 读取器，不读取无关的 row group
+
+    :param dirname: 日志目录
+    :param table: 'positions' 或 'fills'
+    :param start_day: 起始日期（含），格式为 'YYYYMMDD'
+    :param end_day: 结束日期（含），格式为 'YYYYMMDD'
+    :param codes: 股票代码列表，或 (最小代码, 最大代码) 元组表示的代码区间（含）
+    :return: DataFrame，按交易日排序，同一天内为记录时的顺序，day 列为 'YYYYMMDD' 字符串
+    """
+    filters = []
+    if start_day is not None:
+        filters.append(('day', '>=', int(start_day)))
+    if end_day is not None:
+        filters.append(('day', '<=', int(end_day)))
+    if isinstance(codes, tuple):
+        filters += [('code', '>=', codes[0]), ('code', '<=', codes[1])]
+    elif codes is not None:
+        filters.append(('code', 'in', list(codes)))
+    path = os.path.join(dirname, table)
+    df = pq.read_table(path, filters=filters or None, schema=SCHEMAS[table]).to_pandas()
+    df = df.sort_values('day', kind='stable', ignore_index=True)
+    df['day'] = df['day'].astype(str)
+    return df
+
+
+def export_position_csv(dirname='result/journal', out_dir='result/position', start_day=None, end_day=None,
+                        day_list=None):
+    """
+    将持仓日志导出为每个交易日一个的 CSV 文件，格式（包括行的顺序）与旧版 result/position/{day}.csv 相同
+
+    :param day_list: 回测的交易日列表，给出时没有持仓的交易日也生成只有表头的文件（与旧版相同），
+                     否则只导出有持仓的交易日
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    df = read_journal(dirname, 'positions', start_day, end_day)
+    groups = dict(list(df.groupby('day', sort=True)))
+    if day_list is not None:
+        days = [day for day in day_list
+                if (start_day is None or day >= start_day) and (end_day is None or day <= end_day)]
+    else:
+        days = list(groups)
+    for day in days:
+        group = groups.get(day, df.iloc[:0])
+        with open(os.path.join(out_dir, f'{day}.csv'), 'w') as f:
+            txt = '股票代码,当前仓位,开盘价,收盘价,市值\n'
+            for code, amount, open_, close in zip(group['code'].tolist(), group['amount'].tolist(),
+                                                  group['open'].tolist(), group['close'].tolist()):
+                txt += f'{code},{amount},{round(open_, 2)},{round(close, 2)},{round(amount * open_)}\n'
+            f.write(txt)
@@ -0,0 +1,120 @@
+import pandas as pd
+import numpy as np
+import os
+from . import fetcher as fetcher_module
+from .fetcher import Fetcher
+from .data_cache import DataCache
+
+
+class MultiFetcher:
+    """
+    将多个模型的预测结果对齐到同一份行情数据。
+
+    行情数据只读取一次，与全部预测结果合并为一张按 (day, code) 排序的表：行为至少一个模型有预测值的 (day, code)，
+    preds[:, k] 为第 k 个模型的预测值，has_pred[:, k] 表示第 k 个模型是否有这一行。
+    get_fetcher(model) 从这张表中取出该模型的行，得到与 Fetcher(该模型的预测文件) 完全相同的 Fetcher，
+    不再重复读取行情数据和合并。
+    """
+
+    def __init__(self, result_file_paths, use_cache=True, refresh_cache=False, cache_dir='cache'):
+        """
+        :param result_file_paths: dict，键为模型名称，值为预测结果文件路径；或路径列表，以文件名（不含扩展名）为模型名称
+        :param use_cache: 是否使用合并后数据的磁盘缓存
+        :param refresh_cache: 是否忽略已有缓存并重新构建
+        :param cache_dir: 缓存目录
+        """
+        if not isinstance(result_file_paths, dict):
+            result_file_paths = {os.path.splitext(os.path.basename(p))[0]: p for p in result_file_paths}
+        if len(set(result_file_paths)) != len(result_file_paths):
+            raise ValueError('模型名称不能重复')
+        names, paths = list(result_file_paths), list(result_file_paths.values())
+        arrays = None
+        if use_cache:
+            cache = DataCache(cache_dir, [fetcher_module.stock_data_path] + paths, extra={'models': names})
+            if not refresh_cache:
+                arrays = cache.load()
+        if arrays is None:
+            arrays = self._build_arrays(names, paths)
+            if use_cache:
+                cache.save(arrays)
+        self._set_arrays(arrays)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """由 to_arrays 导出的数组字典构建 MultiFetcher，数组不会被复制"""
+        multi = cls.__new__(cls)
+        multi._set_arrays(arrays)
+        return multi
+
+    def to_arrays(self):
+        return dict(self.arrays)
+
+    def _build_arrays(self, names, paths):
+        stock_data = Fetcher._prepare_stock_data(pd.read_parquet(fetcher_module.stock_data_path))
+        stock_data = stock_data[~stock_data.index.duplicated(keep='first')]
+        preds = []
+        for k, path in enumerate(paths):
+            pred = Fetcher._prepare_pred_result(pd.read_csv(path))
+            pred.index.names = ['code', 'day']
+            pred = pred[~pred.index.duplicated(keep='first')]
+            pred[f'has_{k}'] = True
+            preds.append(pred.rename(columns={'pred': f'pred_{k}'}))
+        merged = stock_data.join(pd.concat(preds, axis=1, join='outer'), how='inner')
+        merged = merged.sort_index(level=['day', 'code'])
+
+        index = merged.index
+        day_numbers = index.get_level_values('day').to_numpy()
+        code_values = index.get_level_values('code').to_numpy()
+        days = np.unique(day_numbers)
+        codes = np.unique(code_values)
+        has_columns = [f'has_{k}' for k in range(len(paths))]
+        return {
+            'models': np.array(names, dtype=str),
+            'days': days.astype(str),
+            'codes': codes,
+            'row_day': np.searchsorted(days, day_numbers).astype(np.int32),
+            'row_code': np.searchsorted(codes, code_values).astype(np.int32),
+            'prices': merged[['open', 'close']].to_numpy(dtype=np.float64),
+            'preds': merged[[f'pred_{k}' for k in range(len(paths))]].to_numpy(dtype=np.float64),
+            'has_pred': merged[has_columns].fillna(False).to_numpy(dtype=bool),
+        }
+
+    def _set_arrays(self, arrays):
+        self.arrays = arrays
+        self.models = arrays['models'].tolist()
+        self.model_index = {name: k for k, name in enumerate(self.models)}
+        self.date_list = arrays['days'].tolist()
+        self.codes = arrays['codes']
+        self._fetchers = {}
+
+    def get_fetcher(self, model):
+        """
+        获取单个模型的 Fetcher，结果与 Fetcher(该模型的预测文件) 相同
+
+        :param model: 模型名称或序号
+        """
+        k = self.model_index[model] if isinstance(model, str) else model
+        if k not in self._fetchers:
+            arrays = self.arrays
+            rows = np.flatnonzero(arrays['has_pred'][:, k])
+            row_day, row_code = arrays['row_day'][rows], arrays['row_code'][rows]
+            # 只保留该模型有数据的交易日和股票，重新编号
+            day_ords, row_day = np.unique(row_day, return_inverse=True)
+            code_ords, row_code = np.unique(row_code, return_inverse=True)
+            values = np.column_stack((arrays['prices'][rows], arrays['preds'][rows, k]))
+            self._fetchers[k] = Fetcher.from_arrays(Fetcher._assemble_arrays(
+                arrays['days'][day_ords], arrays['codes'][code_ords],
+                row_day.astype(np.int32), row_code.astype(np.int32), values))
+        return self._fetchers[k]
+
+    def get_pred_matrix(self):
+        """
+        全部模型的预测值矩阵
+
+        :return: (交易日数, 股票数, 模型数) 的数组，无预测值的位置为 NaN，下标对应 date_list 和 codes
+        """
+        arrays = self.arrays
+        matrix = np.full((len(self.date_list), len(self.codes), len(self.models)), np.nan)
+        preds = np.where(arrays['has_pred'], arrays['preds'], np.nan)
+        matrix[arrays['row_day'], arrays['row_code']] = preds
+        return matrix
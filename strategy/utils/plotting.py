@@ -0,0 +1,71 @@
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+# matplotlib 只在绘图时导入，不绘图的回测和命令行子命令不承担其导入开销
+
+
+def plot_total_money(day_list, total_money_list, path='result/fig.png', show=False):
+    """
+    绘制权益曲线并保存为图片
+
+    :param path: 图片路径
+    :param show: 是否弹出窗口显示（会阻塞直到窗口关闭）。为 False 时不使用 pyplot 和图形界面后端，直接用 Agg 渲染
+    """
+    import matplotlib.dates as mdates
+    if show:
+        import matplotlib.pyplot as plt
+        fig, ax = plt.subplots(figsize=(12, 6))
+    else:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        fig = Figure(figsize=(12, 6))
+        FigureCanvasAgg(fig)
+        ax = fig.subplots()
+    # 添加网格线
+    ax.grid(True)
+
+    ax.plot(day_list, total_money_list)
+
+    # 动态调整 x 轴刻度间隔
+    num_days = len(day_list)
+    interval = max(num_days // 15, 1)
+
+    ax.xaxis.set_major_locator(mdates.DayLocator(interval=interval))
+
+    # 自动旋转 x 轴标签以防止重叠
+    fig.autofmt_xdate()
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    fig.savefig(path)
+    if show:
+        plt.show()
+    return path
+
+
+class PlotBatch:
+    """
+    在后台进程中批量渲染权益曲线，提交后立即返回，适合脚本中连续运行大量回测的场景
+
+    with PlotBatch() as batch:
+        for ...:
+            app.backtest(..., plot_batch=batch)
+    """
+
+    def __init__(self, processes=1):
+        self._executor = ProcessPoolExecutor(processes)
+        self._futures = []
+
+    def submit(self, day_list, total_money_list, path='result/fig.png'):
+        self._futures.append(self._executor.submit(plot_total_money, list(day_list), list(total_money_list), path))
+
+    def close(self):
+        """等待全部图片渲染完成，返回图片路径列表"""
+        paths = [future.result() for future in self._futures]
+        self._executor.shutdown()
+        return paths
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
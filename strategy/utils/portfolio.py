@@ -0,0 +1,88 @@
+import numpy as np
+
+
+class Portfolio:
+    """
+    以股票序号为下标的数组化持仓。
+    另外按建仓顺序保存持仓股票序号（与逐笔交易时持仓 dict 的插入顺序相同），
+    持仓的遍历和估值都按这个顺序进行，结果与逐笔计算完全一致
+    """
+
+    def __init__(self, n_codes):
+        self.amount = np.zeros(n_codes, dtype=np.int64)  # 持仓数量
+        self.cost_basis = np.zeros(n_codes)  # 持仓平均买入价
+        self.last_price = np.full(n_codes, np.nan)  # 最近一个有效收盘价，用于停牌股票估值
+        self.order = np.zeros(0, dtype=np.int64)  # 持仓股票序号，按建仓顺序排列
+
+    def held(self):
+        """当前持仓的股票序号数组，按建仓顺序排列"""
+        return self.order
+
+    def clear(self):
+        self.amount[:] = 0
+        self.cost_basis[:] = 0
+        self.order = np.zeros(0, dtype=np.int64)
+
+    def set_amount(self, ords, amounts):
+        """
+        直接设置持仓数量（其余股票清零），ords 的顺序即建仓顺序
+
+        :param ords: 股票序号数组，不能重复
+        :param amounts: 持仓数量数组
+        """
+        ords = np.asarray(ords, dtype=np.int64)
+        amounts = np.asarray(amounts, dtype=np.int64)
+        self.clear()
+        self.amount[ords] = amounts
+        self.order = ords[amounts != 0]
+
+    def apply(self, ords, amounts, prices):
+        """
+        按成交结果更新持仓，买入时按成交价更新平均买入价，清仓时平均买入价归零
+
+        :param ords: 股票序号数组，不能重复
+        :param amounts: 成交数量数组，大于 0 为买入，小于 0 为卖出
+        :param prices: 成交价数组
+        """
+        old = self.amount[ords]
+        new = old + amounts
+        buy = amounts > 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            buy_basis = (old * self.cost_basis[ords] + amounts * prices) / new
+        self.cost_basis[ords] = np.where(new == 0, 0, np.where(buy, buy_basis, self.cost_basis[ords]))
+        self.amount[ords] = new
+        # 清仓的股票移出持仓顺序，新建仓的股票按成交顺序追加到末尾
+        order = self.order
+        if (new == 0).any():
+            order = order[self.amount[order] != 0]
+        opened = ords[(old == 0) & (new != 0)]
+        if len(opened):
+            order = np.concatenate((order, opened))
+        self.order = order
+
+    def value(self, prices, ords=None):
+        """
+        计算持仓市值。收盘价无效（为 0 或 NaN）的股票使用最近一个有效收盘价。
+        按 ords 的顺序逐只累加（cumsum），与逐只相加的结果完全一致
+
+        :param prices: 持仓股票的收盘价，与 ords 对齐
+        :param ords: 持仓股票序号，默认为 held()
+        """
+        if ords is None:
+            ords = self.held()
+        valid = (prices != 0) & ~np.isnan(prices)
+        self.last_price[ords[valid]] = prices[valid]
+        prices = np.where(valid, prices, self.last_price[ords])
+        if not len(ords):
+            return 0.0
+        return np.cumsum(self.amount[ords] * prices)[-1].item()
+
+    def to_dict(self, codes):
+        """
+        转换为 {股票代码: {'amount': 持仓数量}} 形式的持仓，按建仓顺序排列
+
+        :param codes: 股票序号到股票代码的映射表
+        """
+        ords = self.held()
+        return {code: {'amount': amount}
+                for code, amount in zip(codes[ords].tolist(), self.amount[ords].tolist())}
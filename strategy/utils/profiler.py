@@ -0,0 +1,338 @@
+import json
+import os
+import time
+import tracemalloc
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# 统计调用次数的 Fetcher 查询方法
+LOOKUP_METHODS = [
+    'get_data_by_date', 'get_day_arrays',
+    'get_close_by_code', 'get_open_by_code',
+    'get_close_by_codes', 'get_open_by_codes',
+    'get_close_by_ordinals', 'get_open_by_ordinals',
+]
+
+
+class BacktestHook:
+    """
+    回测钩子基类，按需重写下列方法，通过 Profiler(hooks=[...]) 注册
+    """
+
+    def on_day_start(self, day):
+        """交易日开始，执行订单之前"""
+
+    def on_orders(self, day, orders):
+        """策略生成下一交易日的订单之后，orders 为 (股票代码数组, 交易数量数组)"""
+
+    def on_fills(self, day, fills):
+        """执行订单之后，fills 为当天成交记录 dict，包含 code、amount、price、cost、fee 数组"""
+
+    def on_day_end(self, day, total_money, money_left):
+        """交易日结束"""
+
+
+class _Phase:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._add(self.name, self.start, time.perf_counter())
+
+
+class Profiler:
+    """
+    回测的分阶段计时和埋点。
+
+    - 每个交易日及全程各阶段（读取数据、执行订单、估值、记录日志、策略等）的耗时
+    - Fetcher 查询方法的调用次数，以及价格查询中使用前向填充价格（当天无数据）的比例
+    - 峰值内存：进程 RSS 峰值，trace_memory=True 时另用 tracemalloc 统计 Python 分配的峰值（会明显拖慢回测）
+    - 钩子：on_day_start、on_orders、on_fills、on_day_end，见 BacktestHook
+    结果可导出为文本/JSON 汇总，以及可在 chrome://tracing 或 Perfetto 中查看的 trace 文件。
+
+    不需要埋点时 APP.backtest 使用 NullProfiler，各埋点为空操作。
+    """
+
+    enabled = True
+
+    def __init__(self, hooks=None, trace_memory=False):
+        """
+        :param hooks: BacktestHook 列表
+        :param trace_memory: 是否用 tracemalloc 统计 Python 内存分配
+        """
+        self.hooks = list(hooks or [])
+        self.trace_memory = trace_memory
+        self.totals = {}
+        self.counts = {}
+        self.days = []
+        self.events = []
+        self.lookups = {}
+        self.fallback = {'lookups': 0, 'hits': 0}
+        self.memory = {}
+        self._day = None
+        self._day_times = {}
+        self._origin = time.perf_counter()
+        self._instrumented = []
+        self._own_tracemalloc = False
+
+    # ---------- 计时 ----------
+    def phase(self, name):
+        """计时上下文：with profiler.phase('strategy'): ..."""
+        return _Phase(self, name)
+
+    def iter_phase(self, name, iterable):
+        """遍历 iterable，将每次取下一个元素的耗时计入阶段 name"""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self._add(name, start, time.perf_counter())
+            yield item
+
+    def _add(self, name, start, end):
+        elapsed = end - start
+        self.totals[name] = self.totals.get(name, 0.0) + elapsed
+        self.counts[name] = self.counts.get(name, 0) + 1
+        self._day_times[name] = self._day_times.get(name, 0.0) + elapsed
+        self.events.append((name, start, elapsed, self._day))
+
+    # ---------- 交易日与钩子 ----------
+    def start(self, fetcher=None):
+        """回测开始，对 fetcher 的查询方法埋点"""
+        self._origin = time.perf_counter()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._own_tracemalloc = True
+        if fetcher is not None:
+            self.instrument_fetcher(fetcher)
+
+    def stop(self):
+        """回测结束，记录内存峰值并撤销埋点"""
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            self.memory['tracemalloc_peak_mb'] = peak / 2 ** 20
+            if self._own_tracemalloc:
+                tracemalloc.stop()
+                self._own_tracemalloc = False
+        rss = peak_rss_mb()
+        if rss is not None:
+            self.memory['rss_peak_mb'] = rss
+        self.uninstrument()
+
+    def day_start(self, day):
+        self._day = day
+        for hook in self.hooks:
+            hook.on_day_start(day)
+
+    def orders(self, day, orders):
+        for hook in self.hooks:
+            hook.on_orders(day, orders)
+
+    def fills(self, day, fills):
+        for hook in self.hooks:
+            hook.on_fills(day, fills)
+
+    def day_end(self, day, total_money, money_left):
+        for hook in self.hooks:
+            hook.on_day_end(day, total_money, money_left)
+        record = {'day': day, 'total_money': total_money, **self._day_times}
+        if self.trace_memory and tracemalloc.is_tracing():
+            record['memory_mb'] = tracemalloc.get_traced_memory()[0] / 2 ** 20
+        self.days.append(record)
+        # 下一个交易日开始前的耗时（如读取下一天的数据）计入下一个交易日
+        self._day = None
+        self._day_times = {}
+
+    # ---------- Fetcher 埋点 ----------
+    def instrument_fetcher(self, fetcher):
+        """以实例属性覆盖 fetcher 的查询方法，统计调用次数和前向填充命中数，stop 时撤销"""
+        for name in LOOKUP_METHODS:
+            self._wrap(fetcher, name, self._counting(name, getattr(fetcher, name)))
+        if hasattr(fetcher, 'last_valid_day'):
+            self._wrap(fetcher, '_lookup', self._lookup_fallback(fetcher, fetcher._lookup))
+            self._wrap(fetcher, '_take', self._take_fallback(fetcher, fetcher._take))
+
+    def uninstrument(self):
+        for obj, name in self._instrumented:
+            obj.__dict__.pop(name, None)
+        self._instrumented = []
+
+    def _wrap(self, obj, name, func):
+        setattr(obj, name, func)
+        self._instrumented.append((obj, name))
+
+    def _counting(self, name, method):
+        lookups = self.lookups
+        lookups.setdefault(name, 0)
+
+        def wrapper(*args, **kwargs):
+            lookups[name] += 1
+            return method(*args, **kwargs)
+        return wrapper
+
+    def _lookup_fallback(self, fetcher, method):
+        fallback = self.fallback
+
+        def wrapper(matrix, code, day):
+            c = fetcher.code_index.get(code)
+            d = fetcher.get_day_ordinal(day)
+            if c is not None and d >= 0:
+                last = fetcher.last_valid_day[d, c]
+                fallback['lookups'] += 1
+                fallback['hits'] += int(0 <= last != d)
+            return method(matrix, code, day)
+        return wrapper
+
+    def _take_fallback(self, fetcher, method):
+        fallback = self.fallback
+
+        def wrapper(matrix, ords, day):
+            d = fetcher.get_day_ordinal(day)
+            if d >= 0:
+                last = fetcher.last_valid_day[d, ords[ords >= 0]]
+                fallback['lookups'] += len(last)
+                fallback['hits'] += int(((last >= 0) & (last != d)).sum())
+            return method(matrix, ords, day)
+        return wrapper
+
+    # ---------- 导出 ----------
+    def summary(self):
+        """汇总结果 dict"""
+        wall = sum(self.totals.values())
+        phases = {
+            name: {
+                'seconds': seconds,
+                'calls': self.counts[name],
+                'share': seconds / wall if wall else 0.0,
+                'per_day_max': max((day.get(name, 0.0) for day in self.days), default=0.0),
+            }
+            for name, seconds in sorted(self.totals.items(), key=lambda item: -item[1])
+        }
+        lookups = self.fallback['lookups']
+        return {
+            'n_days': len(self.days),
+            'phases': phases,
+            'lookups': dict(self.lookups),
+            'fallback_lookups': lookups,
+            'fallback_hits': self.fallback['hits'],
+            'fallback_hit_rate': self.fallback['hits'] / lookups if lookups else 0.0,
+            'memory': dict(self.memory),
+        }
+
+    def format_summary(self):
+        summary = self.summary()
+        txt = f'交易日数：{summary["n_days"]}\n'
+        txt += '{:<12}{:>12}{:>10}{:>8}{:>14}\n'.format('阶段', '耗时(秒)', '次数', '占比', '单日最大(毫秒)')
+        for name, phase in summary['phases'].items():
+            txt += '{:<12}{:>12.4f}{:>10}{:>8.1%}{:>14.3f}\n'.format(
+                name, phase['seconds'], phase['calls'], phase['share'], phase['per_day_max'] * 1000)
+        for name, n in summary['lookups'].items():
+            if n:
+                txt += f'查询 {name}：{n} 次\n'
+        txt += f'价格查询使用前向填充价格的比例：{summary["fallback_hit_rate"]:.2%}' \
+               f'（{summary["fallback_hits"]}/{summary["fallback_lookups"]}）\n'
+        for name, value in summary['memory'].items():
+            txt += f'{name}：{value:.1f}\n'
+        return txt
+
+    def to_trace(self):
+        """Chrome trace event 格式的 dict"""
+        events = []
+        for name, start, elapsed, day in self.events:
+            events.append({'name': name, 'cat': 'backtest', 'ph': 'X', 'pid': 0, 'tid': 0,
+                           'ts': (start - self._origin) * 1e6, 'dur': elapsed * 1e6, 'args': {'day': day}})
+        # 每日权益（及内存）以计数器形式显示
+        ends = {}
+        for name, start, elapsed, day in self.events:
+            ends[day] = start + elapsed
+        for record in self.days:
+            ts = (ends.get(record['day'], self._origin) - self._origin) * 1e6
+            events.append({'name': 'total_money', 'ph': 'C', 'pid': 0, 'ts': ts,
+                           'args': {'total_money': record['total_money']}})
+            if 'memory_mb' in record:
+                events.append({'name': 'memory_mb', 'ph': 'C', 'pid': 0, 'ts': ts,
+                               'args': {'memory_mb': record['memory_mb']}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save(self, dirname='result/profile'):
+        """保存 summary.txt、summary.json、days.json（每日各阶段耗时）和 trace.json"""
+        os.makedirs(dirname, exist_ok=True)
+        with open(os.path.join(dirname, 'summary.txt'), 'w') as f:
+            f.write(self.format_summary())
+        for filename, data in (('summary.json', self.summary()), ('days.json', self.days),
+                               ('trace.json', self.to_trace())):
+            with open(os.path.join(dirname, filename), 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, default=_to_builtin)
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class NullProfiler:
+    """关闭埋点时使用，与 Profiler 接口相同，全部为空操作"""
+
+    enabled = False
+    _phase = _NullPhase()
+
+    def phase(self, name):
+        return self._phase
+
+    def iter_phase(self, name, iterable):
+        return iterable
+
+    def start(self, fetcher=None):
+        pass
+
+    def stop(self):
+        pass
+
+    def day_start(self, day):
+        pass
+
+    def orders(self, day, orders):
+        pass
+
+    def fills(self, day, fills):
+        pass
+
+    def day_end(self, day, total_money, money_left):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+def peak_rss_mb():
+    """进程的 RSS 峰值（MB），不支持的平台返回 None"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位为 KB，macOS 上为字节
+    return rss / 2 ** 20 if os.uname().sysname == 'Darwin' else rss / 2 ** 10
+
+
+def _to_builtin(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f'无法序列化 {type(value).__name__}')
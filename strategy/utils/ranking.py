@@ -0,0 +1,37 @@
+import numpy as np
+
+
+def sort_by_pred(pred):
+    """按 pred 从大到小排序的下标，顺序与 DataFrame.sort_values(by='pred', ascending=False) 完全一致（NaN 排在最后）"""
+    idx = np.arange(len(pred))
+    nan = np.isnan(pred)
+    # 与 pandas 的 nargsort 相同：降序时先反转，再做快速排序，再反转
+    values = pred[~nan][::-1]
+    value_idx = idx[~nan][::-1]
+    return np.concatenate((value_idx[values.argsort(kind='quicksort')][::-1], idx[nan]))
+
+
+def build_rank_table(pred, row_day, day_offsets):
+    """
+    一次计算全部交易日的截面排序，每个交易日内的顺序与 sort_by_pred 完全一致
+
+    :param pred: 按 (day, code) 排序的预测值
+    :param row_day: 每行的交易日序号
+    :param day_offsets: 第 d 个交易日的数据位于 [day_offsets[d], day_offsets[d + 1])
+    :return: (order, rank)，均为与 pred 等长的 int32 数组。
+             order 的 [day_offsets[d], day_offsets[d + 1]) 段为第 d 个交易日内按 pred 从大到小排序的日内下标，
+             rank 为每行在当天的排名，从 0 开始
+    """
+    # 按 (交易日, pred 降序) 整体排序，NaN 排在每天的最后
+    perm = np.lexsort((-pred, row_day))
+    start = day_offsets[row_day[perm]]
+    # 存在相同 pred 的交易日，快速排序对相同值的顺序与稳定排序不同，逐日用 sort_by_pred 重排以保持一致
+    sorted_pred = pred[perm]
+    tie = np.flatnonzero((sorted_pred[1:] == sorted_pred[:-1]) & (row_day[perm[1:]] == row_day[perm[:-1]]))
+    for d in np.unique(row_day[perm[tie]]).tolist():
+        lo, hi = day_offsets[d], day_offsets[d + 1]
+        perm[lo:hi] = lo + sort_by_pred(pred[lo:hi])
+    order = (perm - start).astype(np.int32)
+    rank = np.empty(len(pred), dtype=np.int32)
+    rank[perm] = np.arange(len(pred)) - start
+    return order, rank
@@ -0,0 +1,185 @@
+import numpy as np
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import time
+
+# 项目根目录（strategy/），只有该目录下的源文件参与缓存的键
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 回测引擎及决定缓存内容的源文件（相对 ROOT），修改其中任一文件后已有的缓存结果全部失效：
+# 回测流程、数据加载（各种 Fetcher 及数据缓存）、成交与持仓、特征与排名、绩效指标（metrics）、持仓成交日志（journal）
+# 以及缓存条目本身的格式
+ENGINE_FILES = (
+    'app.py',
+    'utils/transaction.py',
+    'utils/portfolio.py',
+    'utils/fetcher.py',
+    'utils/data_cache.py',
+    'utils/streaming.py',
+    'utils/multi_fetcher.py',
+    'utils/shared_data.py',
+    'utils/fill_simulator.py',
+    'utils/features.py',
+    'utils/ranking.py',
+    'utils/analytics.py',
+    'utils/journal.py',
+    'utils/result_cache.py',
+)
+
+
+class ResultCache:
+    """
+    回测结果的磁盘缓存，以输入的哈希为键（见 make_key）。
+
+    每条结果保存为一个目录：{cache_dir}/{键}/result.pkl，保存了持仓成交日志时还有 journal 子目录。
+    读取命中时更新目录下 last_used 文件的修改时间，写入后按最近使用时间从旧到新删除，直到总大小不超过 max_bytes。
+    """
+    version = 2
+
+    def __init__(self, cache_dir='cache/results', max_bytes=1 << 30):
+        """
+        :param cache_dir: 缓存目录
+        :param max_bytes: 缓存总大小上限（字节）
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def make_key(self, fetcher, strategy, settings):
+        """
+        由数据指纹、策略类及参数、策略类和全部基类的源文件内容、回测引擎的源文件内容（见 ENGINE_FILES）、回测设置计算键
+
+        :param settings: 影响回测结果的其他设置，如初始资金、日期范围、费率、初始持仓
+        :return: 键，策略不确定（如未指定种子的 StrategyRandom）时返回 None，表示不缓存
+        """
+        if not strategy.is_deterministic():
+            return None
+        strategy_class = type(strategy)
+        content = json.dumps([
+            self.version,
+            fetcher.get_fingerprint(),
+            f'{strategy_class.__module__}.{strategy_class.__qualname__}',
+            get_source_hashes(strategy),
+            strategy.get_params(),
+            settings,
+        ], sort_keys=True, default=_to_json)
+        return hashlib.sha1(content.encode()).hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key):
+        """
+        :return: put 保存的 dict，未命中时返回 None
+        """
+        path = os.path.join(self._entry(key), 'result.pkl')
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        self._touch(key)
+        return entry
+
+    def get_journal(self, key):
+        """缓存中保存的持仓成交日志目录，没有时返回 None"""
+        path = os.path.join(self._entry(key), 'journal')
+        return path if os.path.isdir(path) else None
+
+    def put(self, key, entry, journal_dir=None):
+        """
+        保存一条结果，先写入临时目录再整体替换
+
+        :param entry: 可序列化的 dict
+        :param journal_dir: 需要一起保存的持仓成交日志目录
+        """
+        path = self._entry(key)
+        tmp_path = f'{path}.tmp{os.getpid()}'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        with open(os.path.join(tmp_path, 'result.pkl'), 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        if journal_dir is not None:
+            shutil.copytree(journal_dir, os.path.join(tmp_path, 'journal'))
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        self._touch(key)
+        self.evict()
+
+    def _touch(self, key):
+        with open(os.path.join(self._entry(key), 'last_used'), 'w') as f:
+            f.write(str(time.time()))
+
+    def list_entries(self):
+        """
+        :return: [(键, 大小, 最近使用时间)]，按最近使用时间从旧到新排列
+        """
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for key in os.listdir(self.cache_dir):
+            path = self._entry(key)
+            last_used = os.path.join(path, 'last_used')
+            if '.tmp' in key or not os.path.exists(last_used):
+                continue
+            size = sum(os.path.getsize(os.path.join(root, name))
+                       for root, _, names in os.walk(path) for name in names)
+            entries.append((key, size, os.path.getmtime(last_used)))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def evict(self):
+        """按最近最少使用的顺序删除结果，直到总大小不超过 max_bytes"""
+        entries = self.list_entries()
+        total = sum(size for _, size, _ in entries)
+        for key, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(self._entry(key), ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+def get_source_hashes(strategy):
+    """
+    策略类及其全部基类（LegacyStrategyAdapter 还包括被包装的策略类）所在源文件和回测引擎源文件的哈希，
+    只包括 ROOT 下的文件
+
+    :return: dict，相对 ROOT 的路径 -> 文件内容的 sha1
+    """
+    classes = list(type(strategy).__mro__)
+    wrapped = getattr(strategy, 'strategy', None)  # LegacyStrategyAdapter 包装的旧接口策略
+    if wrapped is not None:
+        classes += type(wrapped).__mro__
+    paths = {os.path.join(ROOT, path) for path in ENGINE_FILES}
+    for cls in classes:
+        try:
+            paths.add(os.path.abspath(inspect.getsourcefile(cls)))
+        except (TypeError, OSError):  # 内置类型
+            continue
+    hashes = {}
+    for path in sorted(paths):
+        relpath = os.path.relpath(path, ROOT)
+        if relpath.startswith('..'):
+            continue
+        relpath = relpath.replace(os.sep, '/')
+        try:
+            with open(path, 'rb') as f:
+                hashes[relpath] = hashlib.sha1(f.read()).hexdigest()
+        except OSError:
+            hashes[relpath] = None
+    return hashes
+
+
+def _to_json(value):
+    """make_key 中 json 不能直接序列化的参数"""
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if isinstance(value, np.ndarray):
+        return [str(value.dtype), value.shape, hashlib.sha1(np.ascontiguousarray(value).tobytes()).hexdigest()]
+    if isinstance(value, np.generic):
+        return value.item()
+    return repr(value)
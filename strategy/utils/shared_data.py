@@ -0,0 +1,72 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+_ALIGN = 64
+
+
+class SharedArrays:
+    """
+    把一组 numpy 数组放进同一块共享内存，供多个进程只读访问。
+
+    主进程调用 publish 创建共享内存并复制数据，将 spec 传给子进程；
+    子进程调用 attach 得到直接映射共享内存的数组，不产生额外副本，
+    因此每个子进程的内存占用不随子进程数量增长。
+    """
+
+    def __init__(self, shm, layout, owner):
+        self.shm = shm
+        self.layout = layout
+        self.owner = owner
+        self.arrays = {name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+                       for name, (offset, shape, dtype) in layout.items()}
+
+    @classmethod
+    def publish(cls, arrays):
+        """
+        :param arrays: 数组字典
+        :return: SharedArrays，由创建者负责调用 close 释放共享内存
+        """
+        layout = {}
+        offset = 0
+        for name, array in arrays.items():
+            array = np.asarray(array)
+            layout[name] = (offset, array.shape, array.dtype.str)
+            offset += (array.nbytes + _ALIGN - 1) // _ALIGN * _ALIGN
+        shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        shared = cls(shm, layout, owner=True)
+        for name, array in arrays.items():
+            shared.arrays[name][...] = array
+        return shared
+
+    @classmethod
+    def attach(cls, spec):
+        """
+        :param spec: 主进程 SharedArrays.spec 的返回值
+        :return: SharedArrays，数组为只读
+        """
+        name, layout = spec
+        shared = cls(shared_memory.SharedMemory(name=name), layout, owner=False)
+        for array in shared.arrays.values():
+            array.flags.writeable = False
+        return shared
+
+    @property
+    def spec(self):
+        """可序列化的共享内存描述，用于传给子进程"""
+        return self.shm.name, self.layout
+
+    def close(self):
+        """释放映射，创建者同时删除共享内存"""
+        self.arrays = None
+        try:
+            self.shm.close()
+        except BufferError:  # 仍有数组引用共享内存时无法解除映射，由进程退出时释放
+            pass
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
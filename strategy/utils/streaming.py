@@ -0,0 +1,301 @@
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import json
+import os
+import tempfile
+from . import fetcher as fetcher_module
+from .data_cache import get_file_fingerprint
+from .fetcher import Fetcher
+from .ranking import sort_by_pred
+
+
+class StreamingFetcher(Fetcher):
+    """
+    流式读取行情和预测数据的 Fetcher，用于内存放不下全部数据的回测。
+
+    初始化时只扫描 code/day 列得到交易日表、股票代码表和每个 row group 的交易日范围，并将预测文件分块转存为 parquet 临时文件；
+    row group 的交易日范围互相重叠时（如按股票排序的文件）按批转存为按交易日划分 row group 的临时文件。
+    回测时按 chunk_days 个交易日为一批，只读取与该批日期有交集的 row group，
+    合并后逐日产出。内存中只保留当前一批数据、上一批末尾的回看窗口，以及每只股票最近一个有效开盘价/收盘价，
+    峰值内存由批大小和回看窗口决定，与历史长度无关。
+
+    与 Fetcher 的区别：
+    - 交易日表为行情与预测数据交易日的交集，某天两者没有共同的股票时当天数据为空
+    - 价格查询只支持 iter_days 当前产出的交易日，get_data_by_date 只支持当前回看窗口内的交易日
+    - 没有全部交易日的价格矩阵和排名表，不支持成交模拟（FillSimulator）、滚动特征（FeatureStore）和快速回测，
+      使用时抛出 NotImplementedError
+    """
+    dense = False
+
+    def __init__(self, result_file_path, chunk_days=60, window=20, csv_chunksize=1_000_000, spill_dir=None):
+        """
+        :param result_file_path: 预测结果文件路径
+        :param chunk_days: 每批读取的交易日数
+        :param window: 回看窗口的天数，get_data_by_date 和 iter_days 的 window 不能超过该值
+        :param csv_chunksize: 分块读取预测文件的行数
+        :param spill_dir: 临时文件（转存的预测数据和按交易日重新划分的行情数据）目录，默认为系统临时目录
+        """
+        self.chunk_days = chunk_days
+        self.window = window
+        self.dtype = np.dtype(np.float64)
+        self._fingerprint = json.dumps([get_file_fingerprint([fetcher_module.stock_data_path, result_file_path]), 'streaming'])
+        self._spill_dir = spill_dir
+        self._spill_paths = []
+        pred_path, pred_groups, pred_days, pred_codes = self._spill_pred_result(result_file_path, csv_chunksize)
+        stock_groups, stock_days, stock_codes = self._scan_stock_data()
+
+        self.date_list = sorted(pred_days & stock_days)
+        self.day_index = {day: i for i, day in enumerate(self.date_list)}
+        self.codes = np.array(sorted(pred_codes & stock_codes), dtype=np.int64)
+        self.code_index = {code: i for i, code in enumerate(self.codes.tolist())}
+        self._code_table = pd.Index(self.codes)
+
+        # 前向填充状态：每只股票截至当前交易日最近一个有效开盘价/收盘价
+        self.ffill_open = np.full(len(self.codes), np.nan)
+        self.ffill_close = np.full(len(self.codes), np.nan)
+        self._has_data = np.zeros(len(self.codes), dtype=bool)
+        self._current_day = None
+        self._block = None
+        self._block_day_index = {}
+
+        # 每批只读取与该批交易日有交集的 row group。各 row group 的交易日范围互相重叠时（如按股票排序的行情文件，
+        # 每个 row group 都覆盖全部交易日），先按批转存为按交易日划分 row group 的临时文件，再流式读取
+        self._stock_source = self._day_partitioned(
+            fetcher_module.stock_data_path, stock_groups, ['code', 'day', 'open', 'close'])
+        self._pred_source = self._day_partitioned(pred_path, pred_groups, ['code', 'day', 'pred'])
+
+    def __del__(self):
+        for path in getattr(self, '_spill_paths', []):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _new_spill_path(self):
+        spill = tempfile.NamedTemporaryFile(suffix='.parquet', dir=self._spill_dir, delete=False)
+        spill.close()
+        self._spill_paths.append(spill.name)
+        return spill.name
+
+    def to_arrays(self):
+        raise NotImplementedError('StreamingFetcher 不保存完整数据')
+
+    def build_rank_table(self):
+        raise NotImplementedError('StreamingFetcher 不保存完整数据，只能查询当前回看窗口内交易日的排名')
+
+    def _spill_pred_result(self, result_file_path, csv_chunksize):
+        """
+        分块读取预测文件，转存为 parquet，每块为一个 row group
+
+        :return: (临时文件路径, row group 索引, 交易日集合, 股票代码集合)
+        """
+        days, codes, groups = set(), set(), []
+        path = self._new_spill_path()
+        writer = None
+        schema = pa.schema([('code', pa.int64()), ('day', pa.int32()), ('pred', pa.float64())])
+        try:
+            for chunk in pd.read_csv(result_file_path, usecols=['SecurityID', 'time', 'pred'], chunksize=csv_chunksize):
+                chunk = self._prepare_pred_result(chunk).reset_index()
+                chunk.columns = ['code', 'day', 'pred']
+                days.update(str(d) for d in chunk['day'].unique().tolist())
+                codes.update(chunk['code'].unique().tolist())
+                if writer is None:
+                    writer = pq.ParquetWriter(path, schema)
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False),
+                                   row_group_size=len(chunk))
+                groups.append((len(groups), chunk['day'].min(), chunk['day'].max()))
+        finally:
+            if writer is not None:
+                writer.close()
+        return path, np.array(groups, dtype=np.int64).reshape(-1, 3), days, codes
+
+    def _scan_stock_data(self):
+        """
+        逐个 row group 读取行情数据的 code/day 列，交易日按 Fetcher._encode_days 编码，支持整数和字符串/日期类型
+
+        :return: (row group 索引, 交易日集合, 股票代码集合)
+        """
+        days, codes, groups = set(), set(), []
+        parquet = pq.ParquetFile(fetcher_module.stock_data_path)
+        for i in range(parquet.num_row_groups):
+            table = parquet.read_row_group(i, columns=['code', 'day'])
+            if not table.num_rows:
+                continue
+            day_numbers = np.unique(self._encode_days(pc.unique(table['day']).to_pandas()).to_numpy())
+            days.update(str(d) for d in day_numbers.tolist())
+            codes.update(pc.unique(table['code']).to_pylist())
+            groups.append((i, day_numbers[0], day_numbers[-1]))
+        return np.array(groups, dtype=np.int64).reshape(-1, 3), days, codes
+
+    def _day_partitioned(self, path, groups, columns):
+        """
+        :param groups: row group 索引，每行为 (row group 序号, 最小交易日, 最大交易日)
+        :return: (path, groups)，row group 的交易日范围重叠时为按 iter_days 的批重新划分的临时文件及其索引
+        """
+        order = np.argsort(groups[:, 1], kind='stable')
+        # 只有边界上的一个交易日相同（按交易日排序的文件中一天跨两个 row group）不算重叠
+        if not np.any(groups[order[1:], 1] < groups[order[:-1], 2]):
+            return path, groups
+        starts = np.array(self.date_list[::self.chunk_days], dtype=np.int64)
+        spill_path = self._new_spill_path()
+        parquet = pq.ParquetFile(path)
+        spilled, writer = [], None
+        try:
+            for i in groups[:, 0].tolist():
+                df = parquet.read_row_group(i, columns=columns).to_pandas()
+                df['day'] = self._encode_days(df['day'])
+                df = df.sort_values('day', kind='stable')
+                batch = np.maximum(np.searchsorted(starts, df['day'].to_numpy(), side='right') - 1, 0)
+                bounds = np.concatenate(([0], np.flatnonzero(np.diff(batch)) + 1, [len(df)]))
+                for lo, hi in zip(bounds[:-1], bounds[1:]):
+                    table = pa.Table.from_pandas(df.iloc[lo:hi], preserve_index=False)
+                    if writer is None:
+                        writer = pq.ParquetWriter(spill_path, table.schema)
+                    writer.write_table(table.cast(writer.schema), row_group_size=hi - lo)
+                    spilled.append((len(spilled), df['day'].iat[lo], df['day'].iat[hi - 1]))
+        finally:
+            if writer is not None:
+                writer.close()
+        if path in self._spill_paths:
+            os.remove(path)
+            self._spill_paths.remove(path)
+        return spill_path, np.array(spilled, dtype=np.int64).reshape(-1, 3)
+
+    @staticmethod
+    def _read_days(source, columns, first, last):
+        """读取 day 在 [first, last] 内的数据，只读取索引中交易日范围与之有交集的 row group"""
+        path, groups = source
+        first, last = int(first), int(last)
+        selected = groups[(groups[:, 2] >= first) & (groups[:, 1] <= last), 0]
+        if not len(selected):
+            return pd.DataFrame(columns=columns)
+        df = pq.ParquetFile(path).read_row_groups(selected.tolist(), columns=columns).to_pandas()
+        df['day'] = Fetcher._encode_days(df['day'])
+        return df[(df['day'] >= first) & (df['day'] <= last)]
+
+    def _load_block(self, days, tail):
+        """读取一批交易日的数据并与上一批末尾的回看窗口拼接"""
+        stock_data = self._read_days(self._stock_source, ['code', 'day', 'open', 'close'], days[0], days[-1])
+        pred_result = self._read_days(self._pred_source, ['code', 'day', 'pred'], days[0], days[-1])
+        pred_result = pred_result.set_index(['code', 'day'])
+        merged = self._merge_data(self._prepare_stock_data(stock_data), pred_result)
+        # 合并使用整数交易日，对外的数据仍以交易日字符串为索引，只需转换索引中不重复的交易日
+        merged.index = merged.index.set_levels(merged.index.levels[1].astype(str), level='day')
+        if tail is not None:
+            merged = pd.concat([tail, merged])
+        return merged
+
+    def iter_days(self, window=20, start_day=None, end_day=None):
+        """
+        按交易日顺序流式遍历数据。指定 start_day 时仍从头读取，以得到正确的前向填充价格和回看窗口
+
+        :param window: 回看窗口的天数，不能超过初始化时的 window
+        :param start_day: 起始日期（含），格式为 'YYYYMMDD'
+        :param end_day: 结束日期（含），格式为 'YYYYMMDD'
+        :return: 生成器，依次产出 (day, 当天数据, 最近 window 天数据)
+        """
+        if window > self.window:
+            raise ValueError(f'window 不能超过 {self.window}')
+        self.ffill_open[:] = np.nan
+        self.ffill_close[:] = np.nan
+        self._has_data[:] = False
+        lo, hi = self.get_day_range(start_day, end_day)
+        tail = None
+        for start in range(0, hi, self.chunk_days):
+            end = min(start + self.chunk_days, hi)
+            days = self.date_list[start:end]
+            block_start = max(0, start - self.window + 1)
+            self._set_block(self.date_list[block_start:end], self._load_block(days, tail))
+            for day in days:
+                d = self._block_day_index[day]
+                row_lo, row_hi = self._block_offsets[d], self._block_offsets[d + 1]
+                self._current_day = day
+                ords = self._block_row_code[row_lo:row_hi]
+                self.ffill_open[ords] = self._block_values[row_lo:row_hi, 0]
+                self.ffill_close[ords] = self._block_values[row_lo:row_hi, 1]
+                self._has_data[ords] = True
+                if self.day_index[day] < lo:
+                    continue
+                day_data = self._block.iloc[row_lo:row_hi]
+                day_data_window = self._block.iloc[self._block_offsets[max(0, d - window + 1)]:row_hi]
+                yield day, day_data, day_data_window
+            # 保留最后 window - 1 天作为下一批的回看窗口
+            keep_from = self._block_offsets[max(0, len(self._block_days) - self.window + 1)]
+            tail = self._block.iloc[keep_from:]
+
+    def _set_block(self, block_days, merged):
+        """
+        :param block_days: 本批数据覆盖的交易日（含上一批保留的回看窗口）
+        :param merged: 本批合并后的数据，按 (day, code) 排序
+        """
+        index = merged.index
+        self._block_days = block_days
+        self._block_day_index = {day: i for i, day in enumerate(block_days)}
+        row_day = pd.Index(block_days).get_indexer(index.get_level_values('day'))
+        self._block_offsets = np.searchsorted(row_day, np.arange(len(block_days) + 1))
+        self._block_row_code = self._code_table.get_indexer(index.get_level_values('code')).astype(np.int32)
+        self._block_values = merged[self.columns].to_numpy(dtype=np.float64)
+        self._block = merged
+
+    def _check_day(self, day):
+        if day != self._current_day:
+            raise KeyError(f'StreamingFetcher 只能查询当前交易日 {self._current_day} 的价格，不能查询 {day}')
+
+    def get_day_arrays(self, day):
+        d = self._get_block_day(day)
+        lo, hi = self._block_offsets[d], self._block_offsets[d + 1]
+        values = self._block_values[lo:hi]
+        return self._block_row_code[lo:hi], values[:, 0], values[:, 1], values[:, 2]
+
+    def get_data_by_date(self, date, window=1):
+        date = date.replace('-', '')
+        if window > self.window:
+            raise ValueError(f'window 不能超过 {self.window}')
+        d = self._get_block_day(date)
+        return self._block.iloc[self._block_offsets[max(0, d - window + 1)]:self._block_offsets[d + 1]]
+
+    def get_day_order(self, day):
+        return sort_by_pred(self.get_day_arrays(day)[3])
+
+    def get_day_ranks(self, day):
+        order = self.get_day_order(day)
+        ranks = np.empty(len(order), dtype=np.int32)
+        ranks[order] = np.arange(len(order))
+        return ranks
+
+    def get_top_codes(self, day, k=None):
+        ords = self.get_day_arrays(day)[0]
+        return self.codes[ords[self.get_day_order(day)]][:k]
+
+    def get_ranks(self, codes, day):
+        ords = self.get_day_arrays(day)[0]
+        rank_by_ord = np.full(len(self.codes) + 1, -1, dtype=np.int32)  # 最后一个位置对应未知代码 -1
+        rank_by_ord[ords] = self.get_day_ranks(day)
+        return rank_by_ord[self.get_code_ordinals(codes)]
+
+    def get_percentiles(self, codes, day):
+        n = len(self.get_day_arrays(day)[0])
+        ranks = self.get_ranks(codes, day)
+        return np.where(ranks >= 0, 1 - ranks / max(n - 1, 1), np.nan)
+
+    def _get_block_day(self, day):
+        d = self._block_day_index.get(day) if self._block is not None else None
+        if d is None:
+            raise KeyError(f'{day} 不在当前读取的数据中')
+        return d
+
+    def _lookup(self, matrix, code, day):
+        self._check_day(day)
+        c = self.code_index.get(code)
+        if c is None or not self._has_data[c]:
+            return None
+        return matrix[c].item()
+
+    def _take(self, matrix, ords, day):
+        self._check_day(day)
+        prices = matrix[ords]
+        prices[(ords < 0) | ~self._has_data[ords]] = np.nan
+        return prices
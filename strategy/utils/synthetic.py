@@ -0,0 +1,59 @@
+import pandas as pd
+import numpy as np
+import os
+
+
+def generate_market(n_codes=500, n_days=250, suspend_rate=0.03, duplicate_rate=0.001, pred_missing_rate=0.02,
+                    start_day='2020-01-02', seed=0):
+    """
+    生成确定性的模拟行情和预测数据，格式与 stock_data.parquet 和预测结果文件相同
+
+    :param n_codes: 股票数量
+    :param n_days: 交易日数量
+    :param suspend_rate: 每只股票每天停牌（当天无行情）的概率
+    :param duplicate_rate: 行情数据中重复行的比例
+    :param pred_missing_rate: 有行情但没有预测值的比例
+    :param start_day: 起始日期
+    :param seed: 随机种子
+    :return: (行情 DataFrame，列为 code, day, open, close, volume；预测 DataFrame，列为 SecurityID, time, pred)
+    """
+    rng = np.random.default_rng(seed)
+    codes = np.sort(rng.choice(np.arange(1, 700000), n_codes, replace=False))
+    days = pd.bdate_range(start_day, periods=n_days).strftime('%Y%m%d').astype(np.int64).to_numpy()
+
+    close = rng.uniform(3, 60, n_codes) * np.exp(np.cumsum(rng.normal(0, 0.02, (n_days, n_codes)), axis=0))
+    open_ = close * np.exp(rng.normal(0, 0.01, (n_days, n_codes)))
+    volume = rng.integers(1_000, 1_000_000, (n_days, n_codes))
+    keep = rng.random((n_days, n_codes)) >= suspend_rate
+    day_idx, code_idx = np.nonzero(keep)
+    stock = pd.DataFrame({
+        'code': codes[code_idx],
+        'day': days[day_idx],
+        'open': open_[day_idx, code_idx],
+        'close': close[day_idx, code_idx],
+        'volume': volume[day_idx, code_idx],
+    })
+    n_dup = int(len(stock) * duplicate_rate)
+    if n_dup:
+        stock = pd.concat([stock, stock.iloc[rng.choice(len(stock), n_dup, replace=False)]], ignore_index=True)
+
+    pred = stock[['code', 'day']].drop_duplicates()
+    pred = pred[rng.random(len(pred)) >= pred_missing_rate]
+    pred = pd.DataFrame({'SecurityID': pred['code'].to_numpy(), 'time': pred['day'].to_numpy(),
+                         'pred': rng.normal(0, 1, len(pred))})
+    return stock, pred
+
+
+def write_dataset(dirname, seed=0, **kwargs):
+    """
+    生成模拟数据并写入 dirname
+
+    :return: (行情 parquet 文件路径, 预测结果 csv 文件路径)
+    """
+    os.makedirs(dirname, exist_ok=True)
+    stock, pred = generate_market(seed=seed, **kwargs)
+    stock_path = os.path.join(dirname, 'stock_data.parquet')
+    pred_path = os.path.join(dirname, 'result.csv')
+    stock.to_parquet(stock_path, index=False, row_group_size=100_000)
+    pred.to_csv(pred_path, index=False)
+    return stock_path, pred_path
@@ -1,4 +1,7 @@
 from .fetcher import Fetcher
+from .portfolio import Portfolio
+from .fill_simulator import REJECT_REASONS, OK, UNKNOWN, POSITION, CASH
+import numpy as np
 import os
 
 
@@ -7,10 +10,19 @@ class Agent:
     guohufei=0.00001
     yinhuashui=0.0005
 
-    def __init__(self, result_file_path):
-        self.fetcher = Fetcher(result_file_path)
-        self.cur_position = dict()
-        self.cache = dict()
+    def __init__(self, result_file_path, fetcher=None):
+        self.fetcher = fetcher if fetcher is not None else Fetcher(result_file_path)
+        self.portfolio = Portfolio(len(self.fetcher.codes))
+        # 为 None 时订单按开盘价全部成交（停牌股票使用之前最近的开盘价），见 utils.fill_simulator.FillSimulator
+        self.fill_simulator = None
+        # 最近一次 execute 的成交记录和未成交记录
+        self.fills = self._empty_fills()
+        self.rejections = self._empty_rejections()
+
+    @property
+    def cur_position(self):
+        """dict，当前仓位，键为股票代码，值为dict，包含amount"""
+        return self.portfolio.to_dict(self.fetcher.codes)
 
     def load_position(self, day, dirname='../data/position'):
         if '-' not in day:
@@ -27,41 +39,150 @@ class Agent:
         return cur_position
 
     def set_position(self, position):
-        self.cur_position = position
+        ords = self.fetcher.get_code_ordinals(list(position))
+        if (ords < 0).any():
+            unknown = [code for code, c in zip(position, ords) if c < 0]
+            raise KeyError(f'行情数据中没有以下股票: {unknown}')
+        self.portfolio.set_amount(ords, [position[code]['amount'] for code in position])
+
+    def get_state(self):
+        """
+        导出持仓状态，以股票代码而不是股票序号为键，数据更新后股票代码表发生变化也能恢复
+
+        :return: dict，包含 code、amount、cost_basis、last_price 数组，持仓股票按建仓顺序排在前面
+        """
+        portfolio = self.portfolio
+        held = portfolio.held()
+        others = np.flatnonzero((portfolio.amount == 0) & ~np.isnan(portfolio.last_price))
+        ords = np.concatenate((held, others))
+        return {
+            'code': self.fetcher.codes[ords].copy(),
+            'amount': portfolio.amount[ords].copy(),
+            'cost_basis': portfolio.cost_basis[ords].copy(),
+            'last_price': portfolio.last_price[ords].copy(),
+        }
+
+    def set_state(self, state):
+        """恢复 get_state 导出的持仓状态"""
+        ords = self.fetcher.get_code_ordinals(state['code'])
+        if (ords < 0).any():
+            raise KeyError(f'行情数据中没有以下股票: {state["code"][ords < 0].tolist()}')
+        self.portfolio.set_amount(ords, state['amount'])
+        self.portfolio.last_price[:] = np.nan
+        self.portfolio.cost_basis[ords] = state['cost_basis']
+        self.portfolio.last_price[ords] = state['last_price']
 
     def get_cur_capital(self, day):
-        capital = 0
-        for code in self.cur_position:
-            price = self.fetcher.get_close_by_code(code, day)
-            if code not in self.cache and price != 0:
-                self.cache[code] = price
-            elif price == 0:  # 若当前交易日停牌，使用上一个有效收盘价
-                price = self.cache[code]
-            
-            capital += self.cur_position[code]['amount'] * price
-        return capital
+        held = self.portfolio.held()
+        prices = self.fetcher.get_close_by_ordinals(held, day)
+        # 若当前交易日停牌，使用上一个有效收盘价
+        return self.portfolio.value(prices, held)
 
     def transaction(self, code, day, amount, money):
+        if amount == 0:  # 数量为 0 的订单不交易，也不收取佣金，与 execute 相同
+            return money
+        price = self.fetcher.get_open_by_code(code, day)
         # 计算含税实际交易金额
-        cost = self.cal_cost(code, day, amount)
+        cost = self._cal_cost(price, amount)
+        c = self.fetcher.code_index.get(code)
         # 判断能否完成交易
         if amount > 0:  # 买入
             if money - cost < 0:  # 余额不足
                 return money
         else:  # 卖出
-            if code not in self.cur_position or self.cur_position[code]['amount'] + amount < 0:  # 剩余仓位不足
+            if c is None or self.portfolio.amount[c] == 0 or self.portfolio.amount[c] + amount < 0:  # 剩余仓位不足
                 return money
         # 执行交易
-        if code not in self.cur_position:
-            self.cur_position[code] = {'amount': 0}
-        self.cur_position[code]['amount'] += amount
-        if self.cur_position[code]['amount'] == 0:
-            del self.cur_position[code]
+        self.portfolio.apply(np.array([c]), np.array([amount], dtype=np.int64), np.array([price]))
         money -= cost
         return money
-    
+
+    def execute(self, orders, day, money):
+        """
+        批量执行一天的订单：先按顺序执行卖出，再按顺序执行买入。未设置 fill_simulator 时结果与逐笔调用 transaction 相同
+
+        :param orders: dict，键为股票代码，值为交易数量；或 (股票代码数组, 交易数量数组)，股票代码不能重复
+        :param day: 交易日，格式为 'YYYYMMDD'
+        :param money: 可用资金
+        :return: 交易后的可用资金，成交记录保存在 self.fills；
+                 未成交（含部分成交）的记录保存在 self.rejections，包含 code、未成交数量 amount 和原因 reason
+        """
+        if isinstance(orders, dict):
+            codes = np.fromiter(orders.keys(), dtype=np.int64, count=len(orders))
+            amounts = np.fromiter(orders.values(), dtype=np.float64, count=len(orders))
+        else:
+            codes, amounts = (np.asarray(a) for a in orders)
+        amounts = amounts.astype(np.int64)
+        ords = self.fetcher.get_code_ordinals(codes)
+        held = np.where(ords >= 0, self.portfolio.amount[ords], 0)
+        if self.fill_simulator is not None:
+            fill_amounts, prices, reasons = self.fill_simulator.simulate(ords, amounts, day, held)
+        else:
+            fill_amounts, prices = amounts, self.fetcher.get_open_by_ordinals(ords, day)
+            reasons = np.where(np.isnan(prices), UNKNOWN, OK).astype(np.int8)
+        costs, fees = self._cal_costs(prices, fill_amounts)
+
+        # 卖出：持仓不足的订单不成交，资金按订单顺序逐笔累加
+        position_ok = (held > 0) & (held + amounts >= 0)
+        reasons[(amounts < 0) & (reasons == OK) & ~position_ok] = POSITION
+        sell = np.flatnonzero((fill_amounts < 0) & position_ok & ~np.isnan(costs))
+        money = np.cumsum(np.concatenate(([money], -costs[sell])))[-1].item()
+        self.portfolio.apply(ords[sell], fill_amounts[sell], prices[sell])
+
+        # 买入：余额不足的订单不成交，不影响后续订单
+        buy = np.flatnonzero(fill_amounts > 0)
+        accepted, money = self._accept_buys(money, costs[buy])
+        unaccepted = buy[~accepted]
+        reasons[unaccepted[reasons[unaccepted] != UNKNOWN]] = CASH
+        buy = buy[accepted]
+        self.portfolio.apply(ords[buy], fill_amounts[buy], prices[buy])
+
+        filled = np.concatenate((sell, buy))
+        self.fills = {
+            'code': codes[filled],
+            'amount': fill_amounts[filled],
+            'price': prices[filled],
+            'cost': costs[filled],
+            'fee': fees[filled],
+        }
+        executed = np.zeros(len(amounts), dtype=np.int64)
+        executed[filled] = fill_amounts[filled]
+        rejected = np.flatnonzero(executed != amounts)
+        self.rejections = {
+            'code': codes[rejected],
+            'amount': amounts[rejected] - executed[rejected],
+            'reason': REJECT_REASONS[reasons[rejected]],
+        }
+        return money
+
+    @staticmethod
+    def _accept_buys(money, costs):
+        """
+        逐笔检查余额的向量化实现：用累加和求出依次扣款后的余额，
+        第一笔余额不足的订单被拒绝后，从下一笔开始重新累加
+
+        :return: (是否成交的布尔数组, 剩余资金)
+        """
+        accepted = np.zeros(len(costs), dtype=bool)
+        start = 0
+        while start < len(costs):
+            balance = np.cumsum(np.concatenate(([money], -costs[start:])))[1:]
+            failed = np.flatnonzero(~(balance >= 0))
+            if not len(failed):
+                accepted[start:] = True
+                money = balance[-1].item()
+                break
+            k = failed[0]
+            accepted[start:start + k] = True
+            if k:
+                money = balance[k - 1].item()
+            start += k + 1
+        return accepted, money
+
     def cal_cost(self, code, day, amount):
-        price = self.fetcher.get_open_by_code(code, day)
+        return self._cal_cost(self.fetcher.get_open_by_code(code, day), amount)
+
+    def _cal_cost(self, price, amount):
         cost = price * abs(amount)
         # 计算佣金
         yongjin = cost * self.yongjin
@@ -76,3 +197,36 @@ class Agent:
         else:  # 买入
             cost += yongjin + guohufei
             return cost
+
+    def _cal_costs(self, prices, amounts):
+        """
+        _cal_cost 的向量化版本
+
+        :return: (含税实际交易金额数组, 费用数组)，卖出的交易金额为负
+        """
+        cost = prices * np.abs(amounts)
+        yongjin = np.maximum(cost * self.yongjin, 5)
+        guohufei = cost * self.guohufei
+        yinhuashui = np.where(amounts < 0, cost * self.yinhuashui, 0)
+        sell = amounts < 0
+        fees = np.where(sell, yongjin + guohufei + yinhuashui, yongjin + guohufei)
+        costs = np.where(sell, -(cost - fees), cost + fees)
+        return costs, fees
+
+    @staticmethod
+    def _empty_fills():
+        return {
+            'code': np.zeros(0, dtype=np.int64),
+            'amount': np.zeros(0, dtype=np.int64),
+            'price': np.zeros(0),
+            'cost': np.zeros(0),
+            'fee': np.zeros(0),
+        }
+
+    @staticmethod
+    def _empty_rejections():
+        return {
+            'code': np.zeros(0, dtype=np.int64),
+            'amount': np.zeros(0, dtype=np.int64),
+            'reason': REJECT_REASONS[:0],
+        }